@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Benchmark of StructureAnalyzer.extract_mappings_for_symops.
+
+Simple-cubic supercells with 64 to 4096 atoms are used. To keep the timing
+comparable among the sizes, only the first "nopr" symmetry operations are
+used. The former double loop is also timed for small cells.
+"""
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import argparse
+import time
+import numpy as np
+from phonopy.structure.atoms import Atoms
+from ph_analysis.structure.structure_analyzer import StructureAnalyzer
+
+__author__ = 'Yuji Ikeda'
+
+
+def create_sc_supercell(n):
+    positions_unit = np.array([[0.0, 0.0, 0.0]])
+    translations = np.array(
+        [[i, j, k] for i in range(n) for j in range(n) for k in range(n)])
+    scaled_positions = (
+        positions_unit[None, :, :] + translations[:, None, :]) / float(n)
+    scaled_positions = scaled_positions.reshape(-1, 3)
+    return Atoms(
+        cell=np.eye(3) * 2.5 * n,
+        symbols=['Cu'] * len(scaled_positions),
+        scaled_positions=scaled_positions,
+    )
+
+
+def extract_mapping_loop(atoms, rotation, translation, prec=1e-6):
+    """Former implementation with the double loop over atoms."""
+    natoms = atoms.get_number_of_atoms()
+    symbols = atoms.get_chemical_symbols()
+    positions_old = atoms.get_scaled_positions()
+    positions_new = np.dot(rotation, positions_old.T).T + translation
+    mapping = -1 * np.ones(natoms, dtype=int)
+    for iatoms, sp_trn in enumerate(positions_new):
+        for jatoms, sp_orig in enumerate(positions_old):
+            if symbols[iatoms] != symbols[jatoms]:
+                continue
+            diff = sp_trn - sp_orig
+            wrapped_dpos = diff - np.rint(diff)
+            if (np.abs(wrapped_dpos) < prec).all():
+                mapping[iatoms] = jatoms
+                break
+    return mapping
+
+
+def run(n, nopr, natoms_loop_max):
+    atoms = create_sc_supercell(n)
+    natoms = atoms.get_number_of_atoms()
+    sa = StructureAnalyzer(atoms)
+    dataset = sa.get_symmetry_dataset()
+    rotations = dataset['rotations'][:nopr]
+    translations = dataset['translations'][:nopr]
+    nopr = len(rotations)
+
+    t0 = time.time()
+    mappings = sa.extract_mappings_for_symops(rotations, translations)[0]
+    t_tree = time.time() - t0
+    assert -1 not in mappings
+
+    t_loop = np.nan
+    if natoms <= natoms_loop_max:
+        t0 = time.time()
+        for r, t, m in zip(rotations, translations, mappings):
+            np.testing.assert_array_equal(
+                extract_mapping_loop(atoms, r, t), m)
+        t_loop = time.time() - t0
+
+    return natoms, nopr, t_tree, t_loop
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nopr",
+                        default=48,
+                        type=int,
+                        help="Number of symmetry operations used.")
+    parser.add_argument("--natoms_loop_max",
+                        default=256,
+                        type=int,
+                        help="Maximum number of atoms for the former loop.")
+    args = parser.parse_args()
+
+    print('{:>8s}{:>8s}{:>12s}{:>16s}{:>12s}{:>16s}'.format(
+        'natoms', 'nopr', 'tree_(s)', 'tree_(atoms/s)',
+        'loop_(s)', 'loop_(atoms/s)'))
+    for n in [4, 6, 8, 10, 13, 16]:  # 64 to 4096 atoms
+        natoms, nopr, t_tree, t_loop = run(n, args.nopr, args.natoms_loop_max)
+        print('{:8d}{:8d}{:12.4f}{:16.3e}{:12.4f}{:16.3e}'.format(
+            natoms, nopr,
+            t_tree, natoms * nopr / t_tree,
+            t_loop, natoms * nopr / t_loop))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,12 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-# TODO(ikeda): The function "get_rotations_cart" is not appropriate for this
-#     module.
 from __future__ import absolute_import, division, print_function
 
 import numpy as np
 
 from ph_analysis.fc.fc_analyzer_base import FCAnalyzerBase
-from .mappings_modifier import MappingsModifier
-from ..structure.structure_analyzer import StructureAnalyzer
-from ..structure.symtools import get_rotations_cart
+from ..structure.neighbor_list import get_minimum_image_vectors
+from ..structure.symmetry_cache import get_symmetry_data
 
 
 class FCDistributionAnalyzer(FCAnalyzerBase):
@@ -23,40 +20,29 @@ class FCDistributionAnalyzer(FCAnalyzerBase):
 
         self.set_symprec(symprec)
 
-        self._create_distance_matrix()
         self._create_symbol_numbers()
-        self._create_rotations_cart()
-        self._create_mappings()
+        self._create_symmetry_data()
 
     def set_symprec(self, symprec):
         self._symprec = symprec
 
-    def _create_distance_matrix(self):
-        sa = StructureAnalyzer(self._atoms)
-        sa.generate_distance_matrix()
-        self._distance_matrix = sa.get_distance_matrix()
-
     def _create_symbol_numbers(self):
         symbols = self._atoms.get_chemical_symbols()
         self._symbol_types, self._symbol_numbers = (
             SymbolNumbersGenerator().generate_symbol_numbers(symbols)
         )
 
-    def _create_rotations_cart(self):
-        self._rotations_cart = get_rotations_cart(self._atoms_ideal)
-
-    def _create_mappings(self):
+    def _create_symmetry_data(self):
         # mappings: each index is for the "after" symmetry operations, and
         #     each element is for the "original" positions. 
         #     mappings[k][i] = j means the atom j moves to the positions of
         #     the atom i for the k-th symmetry operations.
-        sa = StructureAnalyzer(self._atoms_ideal)
-        mappings = sa.get_mappings_for_symops(prec=self._symprec)
+        symmetry_data = get_symmetry_data(self._atoms_ideal, self._symprec)
         print("mappings: Finished.")
-        mappings_inverse = MappingsModifier(mappings).invert_mappings()
 
-        self._mappings = mappings
-        self._mappings_inverse = mappings_inverse
+        self._rotations_cart = symmetry_data['rotations_cart']
+        self._mappings = symmetry_data['mappings']
+        self._mappings_inverse = symmetry_data['mappings_inverse']
 
     def analyze_fc_distribution(self,
                                 a1,
@@ -75,9 +61,11 @@ class FCDistributionAnalyzer(FCAnalyzerBase):
         s0s = np.array([symbols[x] for x in i0s])
         s1s = np.array([symbols[x] for x in i1s])
         fc_symbols = np.array([[s0, s1] for s0, s1 in zip(s0s, s1s)])
-        distances = np.fromiter(
-            [self._distance_matrix[i0, i1] for i0, i1 in zip(i0s, i1s)], float
-        )
+        # Only the distances of the pairs considered are calculated.
+        scaled_positions = self._atoms.get_scaled_positions()
+        distances = get_minimum_image_vectors(
+            self._atoms.get_cell(),
+            scaled_positions[i1s] - scaled_positions[i0s])[0]
         rotate = lambda m, r: np.dot(np.dot(r, m), r.T)
         fc_values = np.array(
             [rotate(fcs[i0, i1], r) for i0, i1, r in zip(i0s, i1s, rotations)]
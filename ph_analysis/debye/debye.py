@@ -4,6 +4,7 @@ from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
 import numpy as np
 from scipy.constants import Boltzmann, atomic_mass, hbar, electron_volt
+from .td_props import calculate_thermodynamic_properties
 
 
 def f_nu(nu):
@@ -14,27 +15,82 @@ def f_nu(nu):
     return tmp2 ** (-1.0 / 3.0)
 
 
-def inv_f_nu(f):
-    from scipy.optimize import brentq
-    return brentq(
-        lambda x: f_nu(x) - f,
-        a=-0.999, b=0.499,
-        xtol=np.finfo(float).eps,
-    )
+def _df_nu(nu):
+    """Derivative of f_nu."""
+    tmp0 = (2.0 / 3.0) * ((1.0 + nu) / (1.0 - 2.0 * nu))
+    tmp1 = (1.0 / 3.0) * ((1.0 + nu) / (1.0 - nu))
+    tmp2 = (1.0 / 3.0 * (2.0 * tmp0 ** (3.0 / 2.0) + tmp1 ** (3.0 / 2.0)))
+    dtmp0 = 2.0 / (1.0 - 2.0 * nu) ** 2
+    dtmp1 = (2.0 / 3.0) / (1.0 - nu) ** 2
+    dtmp2 = tmp0 ** 0.5 * dtmp0 + 0.5 * tmp1 ** 0.5 * dtmp1
+    return (-1.0 / 3.0) * tmp2 ** (-4.0 / 3.0) * dtmp2
+
+
+_table_inv_f_nu = {}
+
+
+def _get_table_inv_f_nu():
+    """Table of (log f, nu) in the increasing order of f.
+
+    The points are dense near the both ends, where f_nu is steep.
+    """
+    if not _table_inv_f_nu:
+        nus = -0.25 + 0.749 * np.cos(np.linspace(0.0, np.pi, 1001))
+        _table_inv_f_nu['log_f'] = np.log(f_nu(nus))
+        _table_inv_f_nu['nu'] = nus
+    return _table_inv_f_nu['log_f'], _table_inv_f_nu['nu']
+
+
+def inv_f_nu(f, niterations=2):
+    """Inverse of f_nu for Poisson's ratios in [-0.999, 0.499].
+
+    The initial values are interpolated from the table of log f, and they
+    are refined by Newton's method for log f.
+
+    Parameters
+    ----------
+    f: Float or array
+    """
+    log_f = np.log(np.asarray(f, dtype=float))
+    log_fs, nus = _get_table_inv_f_nu()
+    if np.any((log_f < log_fs[0]) | (log_f > log_fs[-1])):
+        print("ERROR: {}".format(__name__))
+        print("f is out of the range [{}, {}].".format(
+            np.exp(log_fs[0]), np.exp(log_fs[-1])))
+        raise ValueError
+    nu = np.interp(log_f, log_fs, nus)
+    for _ in range(niterations):
+        f_tmp = f_nu(nu)
+        nu = nu - (np.log(f_tmp) - log_f) * f_tmp / _df_nu(nu)
+    return nu[()] if nu.ndim == 0 else nu
 
 
 class Debye(object):
     def __init__(self, poisson=0.25):
-        self._poisson = poisson
+        """
+
+        Parameters
+        ----------
+        poisson: Float or array
+            Poisson's ratio(s), broadcast with the arguments of "run".
+        """
+        self._poisson = np.asarray(poisson, dtype=float)
         self._f_nu = f_nu(self._poisson)
 
     def run(self, volume, bulk_modulus, mass_in_da):
         """Calculate Debye temperature
 
+        The arguments may be arrays and are broadcast against each other and
+        Poisson's ratio(s).
+
         volume: Must be in A^{3}
         bulk_modulus: Must be in eV/A^{3}
         mass: Must be in Da
         """
+        volume = np.asarray(volume, dtype=float)
+        bulk_modulus = np.asarray(bulk_modulus, dtype=float)
+        mass_in_da = np.asarray(mass_in_da, dtype=float)
+
         tmp0 = (6.0 * np.pi ** 2) ** (1.0 / 3.0)
 
         v_in_m3 = (volume * 1e-10 ** 3)  # m^{-3}
@@ -54,7 +110,78 @@ class Debye(object):
         return self._poisson
 
 
-@np.vectorize
 def calculate_debye_from_gruneisen(volume, v0, d0, gruneisen):
+    """Debye temperature(s) with a constant Gruneisen parameter.
+
+    All the arguments may be arrays and are broadcast.
+    """
+    volume = np.asarray(volume, dtype=float)
     debye = d0 * (v0 / volume) ** gruneisen
     return debye
+
+
+class DebyeGruneisen(object):
+    def __init__(self, v0, debye0, gruneisen):
+        """Debye model with the Gruneisen volume dependence.
+
+        Theta_D(V) = Theta_D(V_0) (V_0 / V)^gamma
+
+        The parameters may be arrays, e.g., for compositions, of the shape
+        (..., 1) to be broadcast with volumes.
+
+        Parameters
+        ----------
+        v0: Float or array
+            Reference volume(s) in A^3.
+        debye0: Float or array
+            Debye temperature(s) at v0 in K.
+        gruneisen: Float or array
+        """
+        self._v0 = np.asarray(v0, dtype=float)
+        self._debye0 = np.asarray(debye0, dtype=float)
+        self._gruneisen = np.asarray(gruneisen, dtype=float)
+
+    @classmethod
+    def from_bulk_modulus(cls, v0, bulk_modulus, mass_in_da, gruneisen,
+                          poisson=0.25):
+        """Create the model from the bulk modulus(i) at v0.
+
+        The units are the same as "Debye.run".
+        """
+        debye0 = Debye(poisson).run(v0, bulk_modulus, mass_in_da)
+        return cls(v0, debye0, gruneisen)
+
+    def calculate_debye_temperatures(self, volumes):
+        """
+        Parameters
+        ----------
+        volumes: Array
+
+        Returns
+        -------
+        debye_temperatures: Array
+            Broadcast from "volumes" and the parameters.
+        """
+        return calculate_debye_from_gruneisen(
+            volumes, self._v0, self._debye0, self._gruneisen)
+
+    def calculate_thermodynamic_properties(self, volumes, temperatures):
+        """Calculate the surfaces on the grid of volumes and temperatures.
+
+        Parameters
+        ----------
+        volumes: (..., NV) array
+        temperatures: (NT) array
+
+        Returns
+        -------
+        properties: Dictionary of arrays
+            'debye': (..., NV) Debye temperatures.
+            'free_energy', 'internal_energy', 'entropy', and 'heat_capacity'
+            (isochoric): (..., NV, NT) per atom in eV and K.
+        """
+        debye_temperatures = self.calculate_debye_temperatures(volumes)
+        properties = calculate_thermodynamic_properties(
+            np.asarray(temperatures, dtype=float), debye_temperatures[..., None])
+        properties['debye'] = debye_temperatures
+        return properties
@@ -1,56 +1,171 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+"""Thermodynamic properties of the Debye model.
+
+All the functions accept arrays and broadcast temperatures and Debye
+temperatures against each other.
+"""
 from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
 from functools import partial
+import math
 import numpy as np
 from scipy.constants import physical_constants
-from scipy.integrate import quad
+from scipy.special import bernoulli, zeta
 
 k_b = physical_constants['Boltzmann constant in eV/K'][0]
 
+# Below this, the power series in x is used; otherwise the exponential
+# series. Both have relative errors smaller than 1e-15 with the numbers of
+# the terms below.
+X_SWITCH = 2.0
+NTERMS_POWER = 24  # ((X_SWITCH / 2 pi) ** 2) ** 24 < 1e-23
+NTERMS_EXP_MAX = 40  # exp(-40 * X_SWITCH) < 1e-34
+
+
+_coefficients_power_series = {}
+
+
+def _get_coefficients_power_series(n):
+    if n not in _coefficients_power_series:
+        ks = np.arange(2, 2 * NTERMS_POWER + 1, 2)
+        bs = bernoulli(2 * NTERMS_POWER)[ks]
+        factorials = np.array([math.factorial(k) for k in ks], dtype=float)
+        _coefficients_power_series[n] = n * bs / ((ks + n) * factorials)
+    return _coefficients_power_series[n]
+
+
+def _integrate_power_series(x, n):
+    """n / x^n int_0^x t^n / (e^t - 1) dt for |x| < 2 pi.
+
+    t / (e^t - 1) = sum_k B_k t^k / k!
+    """
+    x2 = x * x
+    # Horner's method
+    tmp = np.zeros_like(x)
+    for c in _get_coefficients_power_series(n)[::-1]:
+        tmp = tmp * x2 + c
+    return 1.0 - n * x / (2.0 * (n + 1)) + tmp * x2
+
+
+def _integrate_exponential_series(x, n):
+    """n / x^n int_0^x t^n / (e^t - 1) dt for large x.
+
+    int_x^inf t^n / (e^t - 1) dt
+        = sum_{m=0}^{n} n! / m! x^m sum_{k>=1} e^{-kx} / k^{n-m+1}
+    """
+    nterms = min(NTERMS_EXP_MAX, int(np.ceil(37.0 / np.min(x))) + 1)
+    coefficients = [
+        math.factorial(n) / math.factorial(m) for m in range(n + 1)]
+    exp_x = np.exp(-x)
+    exp_kx = np.ones_like(x)
+    tail = np.zeros_like(x)
+    for k in range(1, nterms + 1):
+        exp_kx *= exp_x
+        # Horner's method for the polynomial in x
+        tmp = np.zeros_like(x)
+        for m in range(n, -1, -1):
+            tmp = tmp * x + coefficients[m] / float(k) ** (n - m + 1)
+        tail += exp_kx * tmp
+    total = math.factorial(n) * zeta(n + 1)
+    return n / x ** n * (total - tail)
+
 
-@np.vectorize
 def function_debye(x, n):
-    """Debye function https://en.wikipedia.org/wiki/Debye_function"""
-    if x == 0.0:
-        return 1.0
-    else:
-        return n / (x ** n) * quad(lambda t: t ** n / np.expm1(t), 0.0, x)[0]
+    """Debye function https://en.wikipedia.org/wiki/Debye_function
+
+    D_n(x) = n / x^n int_0^x t^n / (e^t - 1) dt
+
+    Parameters
+    ----------
+    x: Array
+        Non-negative. D_n(0) = 1 and D_n(inf) = 0. NaN gives NaN.
+    n: Positive integer
+    """
+    x = np.asarray(x, dtype=float)
+    values = np.full_like(x, np.nan)
+    is_small = x < X_SWITCH
+    is_large = ~is_small & np.isfinite(x)
+    values[is_small] = _integrate_power_series(x[is_small], n)
+    if np.any(is_large):
+        values[is_large] = _integrate_exponential_series(x[is_large], n)
+    values[np.isposinf(x)] = 0.0
+    return values[()] if values.ndim == 0 else values
 
 function_debye3 = partial(function_debye, n=3)
 
 
-@np.vectorize
+def _create_x(temperature, debye):
+    """x = debye / temperature, which is np.inf for temperature == 0."""
+    temperature, debye = np.broadcast_arrays(
+        np.asarray(temperature, dtype=float),
+        np.asarray(debye, dtype=float))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = np.where(temperature == 0.0, np.inf, debye / temperature)
+    return temperature, debye, x
+
+
+def _log_one_minus_exp(x):
+    """log(1 - e^{-x}), which is 0 for x == inf."""
+    with np.errstate(divide='ignore'):
+        return np.log(-np.expm1(-x))
+
+
 def calculate_helmholtz_energy(temperature, debye):
+    temperature, debye, x = _create_x(temperature, debye)
     tmp0 = 9.0 * k_b * debye / 8.0
-    if temperature == 0.0:
-        tmp1 = 0.0
-    else:
-        x = debye / temperature
+    with np.errstate(invalid='ignore'):
         tmp1 = k_b * temperature * (
-            3.0 * np.log(-np.expm1(-x)) - function_debye3(x))
+            3.0 * _log_one_minus_exp(x) - function_debye3(x))
+    tmp1 = np.where(temperature == 0.0, 0.0, tmp1)
     free_energy = tmp0 + tmp1
     return free_energy
 
 
-@np.vectorize
 def calculate_internal_energy(temperature, debye):
+    temperature, debye, x = _create_x(temperature, debye)
     tmp0 = 9.0 * k_b * debye / 8.0
-    if temperature == 0.0:
-        tmp1 = 0.0
-    else:
-        x = debye / temperature
-        tmp1 = 3.0 * k_b * temperature * function_debye3(x)
+    tmp1 = 3.0 * k_b * temperature * function_debye3(x)
     internal_energy = tmp0 + tmp1
     return internal_energy
 
 
-@np.vectorize
 def calculate_entropy(temperature, debye):
-    if temperature == 0.0:
-        entropy = 0.0
-    else:
-        x = debye / temperature
-        entropy = k_b * (4.0 * function_debye3(x) - 3.0 * np.log(-np.expm1(-x)))
+    temperature, debye, x = _create_x(temperature, debye)
+    entropy = k_b * (4.0 * function_debye3(x) - 3.0 * _log_one_minus_exp(x))
+    entropy = np.where(temperature == 0.0, 0.0, entropy)
     return entropy
+
+
+def calculate_heat_capacity(temperature, debye):
+    """Isochoric heat capacity."""
+    temperature, debye, x = _create_x(temperature, debye)
+    with np.errstate(over='ignore', invalid='ignore'):
+        tmp = np.where(np.isinf(x), 0.0, x / np.expm1(x))
+    heat_capacity = 3.0 * k_b * (4.0 * function_debye3(x) - 3.0 * tmp)
+    return heat_capacity
+
+
+def calculate_thermodynamic_properties(temperature, debye):
+    """Calculate all the properties sharing the Debye function.
+
+    Returns
+    -------
+    properties: Dictionary
+        'free_energy', 'internal_energy', 'entropy', and 'heat_capacity'.
+    """
+    temperature, debye, x = _create_x(temperature, debye)
+    is_zero = (temperature == 0.0)
+    d3 = function_debye3(x)
+    log_term = _log_one_minus_exp(x)
+    with np.errstate(over='ignore', invalid='ignore'):
+        tmp = np.where(np.isinf(x), 0.0, x / np.expm1(x))
+        tmp1 = k_b * temperature * (3.0 * log_term - d3)
+    tmp0 = 9.0 * k_b * debye / 8.0
+    return {
+        'free_energy': tmp0 + np.where(is_zero, 0.0, tmp1),
+        'internal_energy': tmp0 + 3.0 * k_b * temperature * d3,
+        'entropy': np.where(
+            is_zero, 0.0, k_b * (4.0 * d3 - 3.0 * log_term)),
+        'heat_capacity': 3.0 * k_b * (4.0 * d3 - 3.0 * tmp),
+    }
@@ -2,8 +2,11 @@
 # -*- coding: utf-8 -*-
 from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
+import os
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
+import pandas as pd
 from .eos import EOSFactory
 from phonopy.qha.eos import EOSFit
 
@@ -69,3 +72,249 @@ class EOSFitting(object):
 
     def get_parameters(self):
         return self._parameters
+
+
+def create_initial_parameters(volumes, energies):
+    """The same initial guess as "EOSFitting"; (E_0, B_0, B'_0, V_0)."""
+    imin = np.argmin(energies)
+    return np.array([energies[imin], 1.0, 4.0, volumes[imin]])
+
+
+def create_jacobian(eos):
+    """Create the Jacobian of E(V) with respect to (E_0, B_0, B'_0, V_0).
+
+    All the EOS here are E(V) = E_0 + B_0 V_0 phi(V / V_0, B'_0), so that
+        dE / dB_0 = (E - E_0) / B_0,
+        dE / dV_0 = (E - E_0) / V_0 + V P(V) / V_0.
+    Only dE / dB'_0 is calculated by the central difference.
+    None if "pv" is not implemented for the EOS.
+    """
+    try:
+        eos.pv(np.ones(1), 0.0, 1.0, 4.0, 1.0)
+    except NotImplementedError:
+        return None
+
+    def jacobian(p, volumes, energies):
+        """p: (4, ...) array broadcast with volumes."""
+        de = eos.ev(volumes, *p) - p[0]
+        jac = np.empty(np.shape(de) + (4,))
+        jac[..., 0] = 1.0
+        jac[..., 1] = de / p[1]
+        h = 1e-6 * np.maximum(1.0, np.abs(p[2]))
+        pp = (p[0], p[1], p[2] + h, p[3])
+        pm = (p[0], p[1], p[2] - h, p[3])
+        jac[..., 2] = (eos.ev(volumes, *pp) - eos.ev(volumes, *pm)) / (2.0 * h)
+        jac[..., 3] = (de + volumes * eos.pv(volumes, *p)) / p[3]
+        return jac
+
+    return jacobian
+
+
+def fit_curves_lm(eos,
+                  volumes,
+                  energies,
+                  parameters_initial,
+                  max_iterations=200,
+                  ftol=1e-12,
+                  xtol=1e-12):
+    """Fit all the curves at once by the Levenberg-Marquardt method.
+
+    The normal equations of all the curves are solved at once by
+    "np.linalg.solve", and the damping parameters are updated separately
+    for each curve.
+
+    Parameters
+    ----------
+    eos: EOS
+    volumes: (M, NV) array
+    energies: (M, NV) array
+    parameters_initial: (M, 4) array
+
+    Returns
+    -------
+    parameters: (M, 4) array
+    is_converged: (M) bool array
+    """
+    jacobian = create_jacobian(eos)
+
+    def calculate_residuals(p, v, e):
+        return eos.ev(v, *p.T[:, :, None]) - e
+
+    def calculate_jacobian(p, v, e):
+        if jacobian is not None:
+            return jacobian(p.T[:, :, None], v, e)
+        # Forward differences for all the parameters.
+        r = calculate_residuals(p, v, e)
+        jac = np.empty(r.shape + (4,))
+        for k in range(4):
+            h = 1e-7 * np.maximum(1.0, np.abs(p[:, k]))
+            pk = p.copy()
+            pk[:, k] += h
+            jac[..., k] = (calculate_residuals(pk, v, e) - r) / h[:, None]
+        return jac
+
+    parameters = np.array(parameters_initial, dtype=float)
+    ncurves = len(parameters)
+    dampings = np.full(ncurves, 1e-3)
+    is_converged = np.zeros(ncurves, dtype=bool)
+    with np.errstate(all='ignore'):
+        costs = np.sum(
+            calculate_residuals(parameters, volumes, energies) ** 2, axis=1)
+        active = np.flatnonzero(np.isfinite(costs))
+        for _ in range(max_iterations):
+            if len(active) == 0:
+                break
+            p = parameters[active]
+            v = volumes[active]
+            e = energies[active]
+            r = calculate_residuals(p, v, e)
+            jac = calculate_jacobian(p, v, e)
+            a = np.einsum('mik,mil->mkl', jac, jac)
+            g = np.einsum('mik,mi->mk', jac, r)
+            # The floor is for parameters not in the EOS, e.g., B'_0 in BM2.
+            diagonals = np.einsum('mkk->mk', a)
+            diagonals = np.maximum(
+                diagonals, 1e-12 * np.max(diagonals, axis=1, keepdims=True))
+            a[:, np.arange(4), np.arange(4)] += (
+                dampings[active, None] * diagonals)
+            steps = -np.linalg.solve(a, g[:, :, None])[:, :, 0]
+
+            p_new = p + steps
+            costs_new = np.sum(calculate_residuals(p_new, v, e) ** 2, axis=1)
+            is_accepted = costs_new <= costs[active]  # False for np.nan
+
+            is_small = (
+                (np.abs(costs[active] - costs_new) <=
+                 ftol * costs[active]) |
+                np.all(np.abs(steps) <= xtol * (np.abs(p) + xtol), axis=1))
+
+            accepted = active[is_accepted]
+            parameters[accepted] = p_new[is_accepted]
+            costs[accepted] = costs_new[is_accepted]
+            dampings[accepted] *= 0.1
+            dampings[active[~is_accepted]] *= 10.0
+
+            is_done = (is_accepted & is_small) | (dampings[active] > 1e16)
+            is_converged[active[is_accepted & is_small]] = True
+            active = active[~is_done]
+    return parameters, is_converged
+
+
+def fit_curves(eos_name, volumes, energies, parameters_initial=None):
+    """Fit E(V) curves.
+
+    All the curves are first fitted at once from the initial guess of
+    "create_initial_parameters". The curves not converged are refitted with
+    warm starts from the parameters of the previous curves, e.g., those at
+    the previous temperatures, until no more curves are converged.
+
+    Parameters
+    ----------
+    eos_name: String
+    volumes: (M, NV) array
+    energies: (M, NV) array
+    parameters_initial: (M, 4) array, optional
+        Initial parameters (E_0, B_0, B'_0, V_0).
+
+    Returns
+    -------
+    parameters: (M, 4) array
+        (E_0, B_0, B'_0, V_0). np.nan if the fit fails.
+    rmses: (M) array
+    """
+    eos = EOSFactory(eos_name).create()
+    if parameters_initial is None:
+        parameters_initial = [
+            create_initial_parameters(v, e) for v, e in zip(volumes, energies)]
+    parameters, is_converged = fit_curves_lm(
+        eos, volumes, energies, parameters_initial)
+
+    while not np.all(is_converged):
+        # Curves whose previous curves are converged.
+        indices = np.flatnonzero(~is_converged[1:] & is_converged[:-1]) + 1
+        if len(indices) == 0:
+            break
+        parameters_tmp, is_converged_tmp = fit_curves_lm(
+            eos, volumes[indices], energies[indices], parameters[indices - 1])
+        if not np.any(is_converged_tmp):
+            break
+        indices = indices[is_converged_tmp]
+        parameters[indices] = parameters_tmp[is_converged_tmp]
+        is_converged[indices] = True
+
+    parameters[~is_converged] = np.nan
+    with np.errstate(invalid='ignore'):
+        rmses = np.sqrt(np.average(
+            (eos.ev(volumes, *parameters.T[:, :, None]) - energies) ** 2,
+            axis=1))
+    return parameters, rmses
+
+
+class BatchEOSFitting(object):
+    """Fitting of many E(V) curves, e.g., F(V) at many temperatures."""
+    def __init__(self, volumes, energies, eos_name, max_workers=1):
+        """
+
+        Parameters
+        ----------
+        volumes: (NV) or (M, NV) array
+        energies: (M, NV) array
+            Curves not converged are refitted with warm starts from the
+            previous curves, so neighboring curves should be similar.
+        eos_name: String
+        max_workers: Integer or None
+            Number of processes. The curves are divided into contiguous
+            blocks, and the warm starts are within each block. None uses the
+            number of the processors, and 1 runs without processes.
+        """
+        self._energies = np.atleast_2d(np.array(energies, dtype=float))
+        self._volumes = np.broadcast_to(
+            np.array(volumes, dtype=float), self._energies.shape)
+        self._eos_name = eos_name
+        self._max_workers = max_workers
+        self._data = None
+
+    def fit(self):
+        volumes = self._volumes
+        energies = self._energies
+        ncurves = len(energies)
+
+        if self._max_workers == 1:
+            parameters, rmses = fit_curves(self._eos_name, volumes, energies)
+        else:
+            max_workers = self._max_workers or os.cpu_count() or 1
+            nblocks = min(ncurves, max_workers)
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                blocks = np.array_split(np.arange(ncurves), nblocks)
+                results = list(executor.map(
+                    fit_curves,
+                    [self._eos_name] * nblocks,
+                    [volumes[b] for b in blocks],
+                    [energies[b] for b in blocks]))
+            parameters = np.concatenate([r[0] for r in results])
+            rmses = np.concatenate([r[1] for r in results])
+
+        data = pd.DataFrame()
+        data['F0'] = parameters[:, 0]
+        data['V0'] = parameters[:, 3]
+        data['B0'] = parameters[:, 1]
+        data['Bp0'] = parameters[:, 2]
+        data['F_RMSE'] = rmses
+        data['NV'] = volumes.shape[1]
+        self._data = data
+        return self
+
+    def write(self, fn):
+        """Write the parameters in the same format as "EOSFitting"."""
+        data = self._data
+        values = np.empty(data.shape, dtype=object)
+        values[:, :5] = data.values[:, :5]
+        values[:, 5] = data['NV'].values.tolist()
+        with open(fn, 'w') as f:
+            f.write(''.join('{:20s}'.format(k) for k in data.columns))
+            f.write('\n')
+            f.write(('%20.9f' * 5 + '%20d\n') * len(data) %
+                    tuple(values.ravel().tolist()))
+
+    def get_data(self):
+        return self._data
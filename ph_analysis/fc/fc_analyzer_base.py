@@ -3,9 +3,9 @@
 from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
 import numpy as np
-from phonopy.file_IO import write_FORCE_CONSTANTS
 from phonopy.structure.cells import Supercell
 from phonopy.harmonic.force_constants import symmetrize_force_constants
+from .fc_store import write_force_constants
 
 __author__ = "Yuji Ikeda"
 
@@ -56,6 +56,15 @@ class FCAnalyzerBase(object):
             raise ValueError("Atoms, Dim, and FC are not consistent.")
 
     def symmetrize_force_constants(self, iteration=3):
+        """Impose the translational and the permutation symmetries.
+
+        These couple the block (i, j) with (j, i) and with the sums over the
+        rows and the columns, so all the blocks are needed. Read-only force
+        constants (e.g. memory-mapped ones) are therefore copied into the
+        memory as a whole.
+        """
+        if not self._force_constants.flags.writeable:
+            self._force_constants = np.array(self._force_constants)
         symmetrize_force_constants(self._force_constants, iteration)
         return self
 
@@ -78,7 +87,7 @@ class FCAnalyzerBase(object):
         return self._atoms_ideal
 
     def write_force_constants(self, filename_write):
-        write_FORCE_CONSTANTS(self._force_constants, filename_write)
+        write_force_constants(self._force_constants, filename_write)
 
     def force_translational_invariance(self):
         # TODO(ikeda): Now only row blocks are considered.
@@ -4,9 +4,9 @@ from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
 import numpy as np
 from vasp.poscar_list import PoscarList
-from phonopy.file_IO import parse_FORCE_CONSTANTS, write_FORCE_CONSTANTS
 from phonopy.harmonic.force_constants import symmetrize_force_constants
 from .fc_reorderer import FCReorderer
+from .fc_store import read_force_constants, write_force_constants
 
 __author__ = 'Yuji Ikeda'
 
@@ -37,7 +37,9 @@ class FCAverager(object):
     def _extract_fc_list(self):
         fc_list = []
         for fc_filename in self._fc_filenames:
-            force_constants = parse_FORCE_CONSTANTS(fc_filename)
+            # Read into the memory since they are symmetrized in place.
+            force_constants = read_force_constants(
+                fc_filename, mmap_mode=None)
             symmetrize_force_constants(force_constants)
             fc_list.append(force_constants)
         return fc_list
@@ -46,7 +48,7 @@ class FCAverager(object):
     def _write_fcs(fc_list, fc_average):
         for i, fc in enumerate(fc_list):
             filename_write = "FORCE_CONSTANTS_{}".format(i)
-            write_FORCE_CONSTANTS(fc, filename_write)
+            write_force_constants(fc, filename_write)
 
         filename_write = "FORCE_CONSTANTS_AVERAGE"
-        write_FORCE_CONSTANTS(fc_average, filename_write)
+        write_force_constants(fc_average, filename_write)
@@ -2,18 +2,22 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, print_function
 
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from fractions import Fraction
 
 import numpy as np
-from phonopy.file_IO import parse_FORCE_CONSTANTS, write_FORCE_CONSTANTS
 from phonopy.harmonic.dynamical_matrix import get_smallest_vectors
 from phonopy.harmonic.force_constants import set_permutation_symmetry
 from phonopy.interface.vasp import read_vasp
 from phonopy.structure.cells import Supercell, Primitive
 from vasp.poscar import Poscar
+from .fc_store import read_force_constants, write_force_constants
 from .fc_symmetrizer_spg import FCSymmetrizerSPG
+from .sparse_force_constants import SparseForceConstants
 from ..structure.configuration_randomizer import ConfigurationRandomizer
+from ..structure.position_index import PositionIndex
 
 __author__ = 'Yuji Ikeda'
 
@@ -50,8 +54,13 @@ class FCEnlarger(object):
         self._supercell_matrix = dict_input["supercell_matrix"]
         self._enlargement_matrix = dict_input["enlargement_matrix"]
 
+        self._cutoff = dict_input["cutoff"]
+        self._is_sparse = dict_input["is_sparse"]
+
         self._fc_filename = dict_input["force_constants"]
-        self._force_constants = parse_FORCE_CONSTANTS(self._fc_filename)
+        # Memory-mapped for ".npy", but "FCSymmetrizerSPG" loads all the
+        # blocks to symmetrize them.
+        self._force_constants = read_force_constants(self._fc_filename)
 
         self._supercell_disordered = Supercell(
             self._atoms_disordered,
@@ -187,9 +196,9 @@ class FCEnlarger(object):
             map_s2s=self._map_s2s,
             random_seed=self._random_seed)
 
-        for i in range(self._num_configurations):
-            tmp = configuration_randomizer.create_randomized_configuration()
-        enlarged_cell = tmp
+        species = configuration_randomizer.create_species(
+            self._num_configurations)[-1]
+        enlarged_cell = configuration_randomizer.create_atoms(species)
 
         return enlarged_cell
 
@@ -199,28 +208,103 @@ class FCEnlarger(object):
         natoms: The number of atoms in the enlarged cell.
         """
         enlarged_cell = self._enlarged_cell
-        scaled_positions = enlarged_cell.get_scaled_positions()
-        symbols = enlarged_cell.get_chemical_symbols()
-        s2u_map = enlarged_cell.get_supercell_to_unitcell_map()
-        natoms = enlarged_cell.get_number_of_atoms()
-        enlarged_force_constants = np.zeros((natoms, natoms, 3, 3))
-        for i in range(natoms):
-            i_equivalent = s2u_map[i]
-            relative_positions = self._relative_positions_site[i_equivalent]
-            fc_tmp1 = self._force_constants_site[i_equivalent]
-            for relative_position, fc_tmp2 in zip(relative_positions, fc_tmp1):
-                j = get_index_at_relative_position(
-                    i,
-                    scaled_positions,
-                    relative_position,
-                    symprec=self._symprec)
-                s_i = symbols[i]
-                s_j = symbols[j]
-                enlarged_force_constants[i, j] += fc_tmp2[(s_i, s_j)]
-
-        set_permutation_symmetry(enlarged_force_constants)
-        set_translational_invariance_for_diagonal(enlarged_force_constants)
-        self._fc_enlarged = enlarged_force_constants
+        pair_types = list(self._force_constants_pair.keys())
+        symbol_types = create_symbol_types(pair_types)
+
+        neighbor_table = create_neighbor_table(
+            enlarged_cell,
+            self._relative_positions_site,
+            self._force_constants_site,
+            pair_types,
+            symprec=self._symprec,
+            cutoff=self._cutoff)
+
+        self._fc_enlarged = create_enlarged_force_constants(
+            enlarged_cell.get_number_of_atoms(),
+            neighbor_table,
+            create_symbol_numbers(
+                enlarged_cell.get_chemical_symbols(), symbol_types),
+            create_pair_numbers(symbol_types, pair_types),
+            is_sparse=self._is_sparse)
+
+    def run_ensemble(self,
+                     filename_cell="POSCAR_enlarged",
+                     filename_fc="FORCE_CONSTANTS_enlarged",
+                     max_workers=None):
+        """Create enlarged cells and FCs for all the configurations.
+
+        The symmetrized FCs and the neighbors in the enlarged cell are
+        created only once and shared by all the configurations, which are
+        distributed over processes. The i-th configuration (i >= 1) is
+        written to "{filename_cell}-{i}" and "{filename_fc}-{i}".
+
+        The random seed of each configuration is spawned from "random_seed"
+        by "np.random.SeedSequence", so the results do not depend on
+        "max_workers".
+
+        Parameters
+        ----------
+        max_workers: Integer or None
+            Number of processes. 1 runs all the configurations in this
+            process. None uses the number of CPUs.
+        """
+        if self._map_s2s is None:
+            print("ERROR: {}".format(__name__))
+            print("\"map_s2s\" is required for the ensemble.")
+            raise ValueError
+
+        self.check_atoms_correspondence()
+        self._generate_force_constants_pair()
+        self._generate_force_constants_site()
+
+        enlarged_cell_average = Supercell(
+            self._primitive_average,
+            self._enlargement_matrix,
+            symprec=self._symprec)
+        self._enlarged_cell_average = enlarged_cell_average
+
+        relative_positions_site = (
+            _convert_relative_positions_for_enlarged_cell(
+                self._relative_positions_site,
+                self._enlargement_matrix))
+
+        pair_types = list(self._force_constants_pair.keys())
+        symbol_types = create_symbol_types(pair_types)
+
+        print("Creating the neighbor table: ", end="")
+        neighbor_table = create_neighbor_table(
+            enlarged_cell_average,
+            relative_positions_site,
+            self._force_constants_site,
+            pair_types,
+            symprec=self._symprec,
+            cutoff=self._cutoff)
+        print("Finished.")
+
+        shared_state = {
+            "enlarged_cell_average": enlarged_cell_average,
+            "map_s2s": self._map_s2s,
+            "neighbor_table": neighbor_table,
+            "symbol_types": symbol_types,
+            "pair_numbers": create_pair_numbers(symbol_types, pair_types),
+            "is_sparse": self._is_sparse,
+            "filename_cell": filename_cell,
+            "filename_fc": filename_fc,
+        }
+
+        seeds = np.random.SeedSequence(self._random_seed).spawn(
+            self._num_configurations)
+        indices = range(1, self._num_configurations + 1)
+
+        if max_workers == 1:
+            _initialize_worker(shared_state)
+            for index, seed in zip(indices, seeds):
+                _run_configuration(index, seed)
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers,
+                                     initializer=_initialize_worker,
+                                     initargs=(shared_state,)) as executor:
+                list(executor.map(_run_configuration, indices, seeds))
 
     def write_cell_enlarged(self, filename):
         poscar = Poscar()
@@ -233,8 +317,7 @@ class FCEnlarger(object):
         poscar.write(filename)
 
     def write_fc_enlarged(self, filename):
-        fc = self._fc_enlarged
-        write_FORCE_CONSTANTS(fc, filename)
+        write_enlarged_force_constants(self._fc_enlarged, filename)
 
 
 def get_default_input():
@@ -245,8 +328,14 @@ def get_default_input():
         the force constant matrix. This matrix should be the same as that for
         the phonopy input.
     num_configurations : Integer
-        Number of considered configurations. Currently only the last one is
-        remained.
+        Number of considered configurations. For "run", only the last one
+        is remained. "run_ensemble" writes all of them.
+    cutoff : Float or None
+        Cutoff distance for the force constants in the enlarged cell.
+        Neighbors farther than this are ignored.
+    is_sparse : Bool
+        If True, the enlarged force constants are stored only for nonzero
+        3x3 blocks. Useful with "cutoff" for large enlarged cells.
     """
     default_input = {
         "force_constants": "FORCE_CONSTANTS_orig",
@@ -259,6 +348,8 @@ def get_default_input():
         "supercell_matrix": np.eye(3, dtype=int),
         "enlargement_matrix": np.eye(3, dtype=int),
         "symprec": 1.e-5,
+        "cutoff": None,
+        "is_sparse": False,
     }
     return default_input
 
@@ -286,15 +377,218 @@ def get_fc_tmp(i, j, force_constants_pair, nsites):
     return fc_tmp
 
 
-def get_index_at_relative_position(i,
-                                   scaled_positions,
-                                   relative_position,
-                                   symprec=1e-5):
-    for j, scaled_position in enumerate(scaled_positions):
-        diff = (relative_position + scaled_positions[i]) - scaled_position
-        diff -= np.rint(diff)
-        if np.all(np.abs(diff) < symprec):
-            return j
+def create_pair_numbers(symbol_types, pair_types):
+    """Create indices of pair types for pairs of symbol numbers.
+
+    Returns
+    -------
+    pair_numbers: (nsymbols, nsymbols) integer array
+        pair_types[pair_numbers[n1, n2]] is
+        (symbol_types[n1], symbol_types[n2]). -1 if the pair is missing.
+    """
+    nsymbols = len(symbol_types)
+    pair_numbers = np.full((nsymbols, nsymbols), -1, dtype=int)
+    for n1, s1 in enumerate(symbol_types):
+        for n2, s2 in enumerate(symbol_types):
+            if (s1, s2) in pair_types:
+                pair_numbers[n1, n2] = pair_types.index((s1, s2))
+    return pair_numbers
+
+
+def create_symbol_types(pair_types):
+    symbol_types = []
+    for pair_type in pair_types:
+        for symbol in pair_type:
+            if symbol not in symbol_types:
+                symbol_types.append(symbol)
+    return symbol_types
+
+
+def create_symbol_numbers(symbols, symbol_types):
+    for symbol in set(symbols):
+        if symbol not in symbol_types:
+            print("ERROR: {}".format(__name__))
+            print("{} is not in force_constants_pair.".format(symbol))
+            raise ValueError
+    return np.array([symbol_types.index(s) for s in symbols])
+
+
+def create_neighbor_table(cell,
+                          relative_positions_site,
+                          force_constants_site,
+                          pair_types,
+                          symprec=1e-5,
+                          cutoff=None):
+    """Find the neighbors of all the atoms in the cell.
+
+    The table depends only on the atomic positions and therefore can be
+    shared among configurations with different chemical symbols.
+
+    Returns
+    -------
+    neighbor_table: List of (atoms, neighbors, fc_site)
+        One element for each group of equivalent atoms.
+        atoms: (na) integer array
+        neighbors: (na, nneighbors) integer array
+            The atom at scaled_positions[i] + relative_positions[k].
+        fc_site: (nneighbors, npairs, 3, 3) array
+            The FCs for the pair types in the order of "pair_types".
+    """
+    scaled_positions = cell.get_scaled_positions()
+    s2u_map = cell.get_supercell_to_unitcell_map()
+    position_index = PositionIndex(scaled_positions, symprec)
+
+    neighbor_table = []
+    for i_equivalent in np.unique(s2u_map):
+        atoms = np.nonzero(s2u_map == i_equivalent)[0]
+        relative_positions = np.reshape(
+            relative_positions_site[i_equivalent], (-1, 3))
+        fc_site = np.array([
+            [fc_tmp[pair_type] for pair_type in pair_types]
+            for fc_tmp in force_constants_site[i_equivalent]
+        ]).reshape(-1, len(pair_types), 3, 3)
+        if cutoff is not None:
+            distances = np.linalg.norm(
+                np.dot(relative_positions, cell.get_cell()), axis=1)
+            is_within = (distances <= cutoff)
+            relative_positions = relative_positions[is_within]
+            fc_site = fc_site[is_within]
+
+        neighbors = position_index.get_indices(
+            scaled_positions[atoms, None, :] + relative_positions[None, :, :])
+        if (neighbors == -1).any():
+            print("ERROR: {}".format(__name__))
+            print("Some neighbors are not found in the enlarged cell.")
+            raise ValueError
+
+        neighbor_table.append((atoms, neighbors, fc_site))
+
+    return neighbor_table
+
+
+def create_enlarged_force_constants(natoms,
+                                    neighbor_table,
+                                    symbol_numbers,
+                                    pair_numbers,
+                                    is_sparse=False):
+    if is_sparse:
+        force_constants = SparseForceConstants(natoms)
+    else:
+        force_constants = np.zeros((natoms, natoms, 3, 3))
+
+    for atoms, neighbors, fc_site in neighbor_table:
+        add_force_constants_site(
+            force_constants,
+            atoms,
+            neighbors,
+            fc_site,
+            symbol_numbers,
+            pair_numbers)
+
+    if is_sparse:
+        force_constants.set_permutation_symmetry()
+    else:
+        set_permutation_symmetry(force_constants)
+    set_translational_invariance_for_diagonal(force_constants)
+    return force_constants
+
+
+def add_force_constants_site(force_constants,
+                             atoms,
+                             neighbors,
+                             fc_site,
+                             symbol_numbers,
+                             pair_numbers,
+                             max_elements=2 ** 20):
+    """Add force constants of the neighbors to equivalent atoms.
+
+    force_constants[i, j] += fc_site[k, p], where j is the k-th neighbor of
+    i and p is the pair type of the symbols of i and j.
+
+    Parameters
+    ----------
+    force_constants: (natoms, natoms, 3, 3) array or SparseForceConstants
+        Modified in place.
+    atoms: (na) integer array
+        Indices of the atoms equivalent to each other.
+    neighbors: (na, nneighbors) integer array
+    fc_site: (nneighbors, npairs, 3, 3) array
+    symbol_numbers: (natoms) integer array
+    pair_numbers: (nsymbols, nsymbols) integer array
+    max_elements: Integer
+        Approximate upper limit of the number of floats of the blocks
+        added at once.
+    """
+    nneighbors = neighbors.shape[1]
+    if nneighbors == 0:
+        return
+
+    chunk_size = max(1, max_elements // (nneighbors * 9))
+    for i0 in range(0, len(atoms), chunk_size):
+        i_s = atoms[i0:i0 + chunk_size]
+        j_s = neighbors[i0:i0 + chunk_size]
+
+        p_s = pair_numbers[symbol_numbers[i_s, None], symbol_numbers[j_s]]
+        if (p_s == -1).any():
+            print("ERROR: {}".format(__name__))
+            print("Some pairs of symbols are not in force_constants_pair.")
+            raise ValueError
+
+        k_s = np.broadcast_to(np.arange(nneighbors), j_s.shape)
+        i_s = np.broadcast_to(i_s[:, None], j_s.shape)
+        if isinstance(force_constants, SparseForceConstants):
+            force_constants.add_blocks(i_s, j_s, fc_site[k_s, p_s])
+        else:
+            # "np.add.at" accumulates the blocks also for duplicated (i, j).
+            np.add.at(force_constants, (i_s, j_s), fc_site[k_s, p_s])
+
+
+def write_enlarged_force_constants(force_constants, filename):
+    if isinstance(force_constants, SparseForceConstants):
+        # Written row by row without the dense array.
+        force_constants.write(filename)
+    else:
+        write_force_constants(force_constants, filename)
+
+
+def _create_indexed_filename(filename, index):
+    # The extension is kept at the end to keep the format.
+    root, ext = os.path.splitext(filename)
+    if ext != '.npy':
+        root, ext = filename, ''
+    return "{}-{}{}".format(root, index, ext)
+
+
+# State shared by the configurations in each worker process.
+_worker_state = {}
+
+
+def _initialize_worker(shared_state):
+    _worker_state.clear()
+    _worker_state.update(shared_state)
+
+
+def _run_configuration(index, seed):
+    state = _worker_state
+    enlarged_cell = ConfigurationRandomizer(
+        atoms=state["enlarged_cell_average"],
+        map_s2s=state["map_s2s"],
+        random_seed=seed).create_randomized_configuration()
+
+    force_constants = create_enlarged_force_constants(
+        enlarged_cell.get_number_of_atoms(),
+        state["neighbor_table"],
+        create_symbol_numbers(
+            enlarged_cell.get_chemical_symbols(), state["symbol_types"]),
+        state["pair_numbers"],
+        is_sparse=state["is_sparse"])
+
+    poscar = Poscar()
+    poscar.set_atoms(enlarged_cell)
+    poscar.write(_create_indexed_filename(state["filename_cell"], index))
+    write_enlarged_force_constants(
+        force_constants,
+        _create_indexed_filename(state["filename_fc"], index))
 
 
 def _convert_relative_positions_for_enlarged_cell(relative_positions_site,
@@ -308,6 +602,9 @@ def _convert_relative_positions_for_enlarged_cell(relative_positions_site,
 
 
 def set_translational_invariance_for_diagonal(force_constants):
+    if isinstance(force_constants, SparseForceConstants):
+        force_constants.set_translational_invariance_for_diagonal()
+        return
     for i in range(force_constants.shape[0]):
         force_constants[i, i] = -1.0 * np.sum(force_constants[i, :], axis=0)
 
@@ -4,9 +4,11 @@ from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
 import argparse
 import numpy as np
-from phonopy.file_IO import parse_FORCE_CONSTANTS, write_FORCE_CONSTANTS
 from vasp.poscar import Poscar
 from .fc_analyzer_base import FCAnalyzerBase
+from .fc_store import read_force_constants, write_force_constants
+from ..structure.position_index import PositionIndex
+from ..structure.symmetry_cache import get_symmetry_data
 
 __author__ = 'Yuji Ikeda'
 
@@ -16,27 +18,37 @@ class FCReducer(object):
                  poscar_filename="POSCAR",
                  fc_filename="FORCE_CONSTANTS"):
         self._poscar = Poscar(poscar_filename)
-        self._force_constants = parse_FORCE_CONSTANTS(fc_filename)
+        self._force_constants = read_force_constants(fc_filename)
         self._fc_reduced = None
 
-    def find_indices_from_positions(self, positions):
-        """Find atomic indices for removed FCs"""
+    def find_indices_from_positions(self, positions, symprec=1e-6):
+        """Find atomic indices for removed FCs
 
-        poscar = self._poscar
-
-        indices_all = []
-        for position_combination in positions:
-            indices_combination = []
-            for p in position_combination:
-                index = poscar.get_index_from_position(p)
-                indices_combination.append(index)
-            indices_all.append(indices_combination)
-        indices_all = np.array(indices_all)
+        Parameters
+        ----------
+        positions: (n, 2, 3) array
+            Scaled positions of the atomic pairs.
 
+        Returns
+        -------
+        indices_all: (n, 2) integer array
+        """
+        position_index = PositionIndex(
+            self._poscar.get_atoms().get_scaled_positions(), symprec)
+        indices_all = position_index.get_indices(positions)
+        if np.any(indices_all < 0):
+            print("ERROR: {}".format(__name__))
+            print("Indices cannot be found for the positions:")
+            print(np.asarray(positions)[indices_all < 0])
+            raise ValueError
         return indices_all
 
+    def _get_mappings(self):
+        # "prec" is the same as that of "get_mappings_for_symops" of Poscar.
+        return get_symmetry_data(self._poscar.get_atoms(), 1e-6)['mappings']
+
     def write(self, filename):
-        write_FORCE_CONSTANTS(self._fc_reduced, filename=filename)
+        write_force_constants(self._fc_reduced, filename)
 
     def do_postprocess(self):
         poscar = self._poscar
@@ -68,7 +80,7 @@ class FCReducer(object):
         indices_all = self.find_indices_from_positions(positions)
         print('indices_all:', indices_all)
 
-        mappings = poscar.get_mappings_for_symops()
+        mappings = self._get_mappings()
         for mapping in mappings:
             for indices_combination in indices_all:
                 indices_removed = mapping[indices_combination]
@@ -98,7 +110,7 @@ class FCReducer(object):
         indices_all = self.find_indices_from_positions(positions)
         print('indices_all:', indices_all)
     
-        mappings = poscar.get_mappings_for_symops()
+        mappings = self._get_mappings()
         for mapping in mappings:
             for indices_combination in indices_all:
                 indices_removed = mapping[indices_combination]
@@ -129,7 +141,7 @@ class FCReducer(object):
         indices_all = self.find_indices_from_positions(positions)
         print('indices_all:', indices_all)
 
-        mappings = poscar.get_mappings_for_symops()
+        mappings = self._get_mappings()
         for mapping in mappings:
             for indices_combination in indices_all:
                 indices_removed = mapping[indices_combination]
@@ -168,7 +180,7 @@ def main():
     parser.add_argument("--fc",
                         default="FORCE_CONSTANTS",
                         type=str,
-                        help="Filename of FORCE_CONSTANTS.")
+                        help="Filename of FORCE_CONSTANTS (text or .npy).")
     args = parser.parse_args()
     FCReducer(
         poscar_filename=args.poscar,
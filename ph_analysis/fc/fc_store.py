@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Reading and writing force constants in the text or the binary format.
+
+The format is judged from the extension of the filename.
+Files with ".npy" are in the NumPy binary format, where the header keeps the
+shape and the dtype of the (natoms, natoms, 3, 3) array. They are opened
+memory-mapped by default, so that only the accessed rows are read from the
+disk. Other files are in the text format of phonopy (FORCE_CONSTANTS).
+
+Operations needing all the blocks still load the whole array. In particular,
+"FCAnalyzerBase" with "is_symmetrized=True", which "FCEnlarger" uses, copies
+the memory-mapped array before symmetrizing it, so there the gain is only the
+faster reading of the binary format.
+"""
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import argparse
+import os
+import numpy as np
+from phonopy.file_IO import parse_FORCE_CONSTANTS, write_FORCE_CONSTANTS
+
+__author__ = 'Yuji Ikeda'
+
+
+def is_binary(filename):
+    return os.path.splitext(filename)[1] == '.npy'
+
+
+def read_force_constants(filename, mmap_mode='r'):
+    """Read force constants.
+
+    Parameters
+    ----------
+    filename: String
+    mmap_mode: {None, 'r', 'r+', 'c'}
+        Only for the binary format. Given to "np.load".
+        None reads the whole array into the memory, and 'c' gives a
+        writable array whose modifications are not saved to the file.
+
+    Returns
+    -------
+    force_constants: (natoms, natoms, 3, 3) array
+    """
+    if not is_binary(filename):
+        return parse_FORCE_CONSTANTS(filename)
+
+    force_constants = np.load(filename, mmap_mode=mmap_mode)
+    if force_constants.ndim != 4 or force_constants.shape[2:] != (3, 3):
+        print("ERROR: {}".format(__name__))
+        print("The shape of force constants in {} is {}.".format(
+            filename, force_constants.shape))
+        raise ValueError
+    return force_constants
+
+
+def write_force_constants(force_constants, filename):
+    if is_binary(filename):
+        np.save(filename, np.asarray(force_constants, dtype='double'))
+    else:
+        write_FORCE_CONSTANTS(force_constants, filename)
+
+
+def convert_force_constants(filename_read, filename_write):
+    write_force_constants(read_force_constants(filename_read), filename_write)
+
+
+def write_force_constants_pair_archive(filename,
+                                       force_constants_pair,
+                                       force_constants_pair_sd=None,
+                                       pair_counters=None):
+    """Write force constants for symbol pairs in one compressed ".npz" file.
+
+    Parameters
+    ----------
+    filename: String
+    force_constants_pair: Dictionary
+        Keys are pairs of chemical symbols, e.g., ('Cu', 'Au'), and values
+        are (natoms, natoms, 3, 3) arrays.
+    force_constants_pair_sd: Dictionary with the same keys, optional
+    pair_counters: Dictionary with the same keys, optional
+        Values are (natoms, natoms) integer arrays.
+    """
+    pairs = list(force_constants_pair.keys())
+    data = {
+        'pairs': np.array(pairs, dtype=str),
+        'force_constants_pair': np.array(
+            [force_constants_pair[k] for k in pairs], dtype='double'),
+    }
+    if force_constants_pair_sd is not None:
+        data['force_constants_pair_sd'] = np.array(
+            [force_constants_pair_sd[k] for k in pairs], dtype='double')
+    if pair_counters is not None:
+        data['pair_counters'] = np.array(
+            [pair_counters[k] for k in pairs], dtype=int)
+    np.savez_compressed(filename, **data)
+
+
+def read_force_constants_pair_archive(filename):
+    """Read the file written by "write_force_constants_pair_archive".
+
+    Returns
+    -------
+    data: Dictionary
+        "force_constants_pair", "force_constants_pair_sd" and
+        "pair_counters" are dictionaries whose keys are pairs of chemical
+        symbols. The last two are included only when they are stored.
+    """
+    data = {}
+    with np.load(filename) as npz:
+        pairs = [tuple(str(s) for s in pair) for pair in npz['pairs']]
+        for name in ['force_constants_pair',
+                     'force_constants_pair_sd',
+                     'pair_counters']:
+            if name in npz.files:
+                data[name] = dict(zip(pairs, npz[name]))
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert force constants between the text and the "
+                    "binary (.npy) formats.")
+    parser.add_argument("filename_read",
+                        type=str,
+                        help="Filename of force constants to be read.")
+    parser.add_argument("filename_write",
+                        type=str,
+                        help="Filename of force constants to be written.")
+    args = parser.parse_args()
+
+    convert_force_constants(args.filename_read, args.filename_write)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Array kernels for averaging force constants over symmetry operations.
+
+These functions do not depend on phonopy or spglib and only work on
+NumPy arrays, so that they can be shared by FCSymmetrizerSPG and tested
+independently.
+"""
+from __future__ import absolute_import, division, print_function
+import numpy as np
+
+__author__ = 'Yuji Ikeda'
+
+
+def rotate_force_constants(rotations, blocks):
+    """Rotate 3x3 force-constant blocks as R * fc * R^T.
+
+    Parameters
+    ----------
+    rotations: (nsym, 3, 3) array
+    blocks: (nsym, ..., 3, 3) array
+
+    Returns
+    -------
+    blocks_rotated: (nsym, ..., 3, 3) array
+    """
+    shape = blocks.shape
+    kron = _create_kronecker_rotations(rotations)
+    tmp = np.matmul(blocks.reshape(shape[0], -1, 9), kron.transpose(0, 2, 1))
+    return tmp.reshape(shape)
+
+
+def _create_kronecker_rotations(rotations):
+    """Create 9x9 matrices acting on flattened 3x3 blocks.
+
+    (R fc R^T)_{ad} = sum_{bc} R_{ab} R_{dc} fc_{bc}, i.e., the blocks
+    flattened to 9-vectors are transformed by the Kronecker product of R
+    and R. This turns the rotations of many blocks into matmul.
+    """
+    rotations = np.asarray(rotations, dtype=float)
+    kron = np.einsum('kab,kdc->kadbc', rotations, rotations)
+    return kron.reshape(-1, 9, 9)
+
+
+def average_force_constants_for_independent_atoms(force_constants,
+                                                  mappings_inverse,
+                                                  rotations_cart,
+                                                  independent_atoms,
+                                                  symbol_numbers,
+                                                  nsymbols,
+                                                  max_elements=2 ** 19):
+    """Accumulate rotated force constants for independent atoms.
+
+    For each symmetry operation k, the blocks
+    fc[minv[k, i1], minv[k, i2]] are rotated and accumulated on
+    (i1, i2), where i1 runs over the independent atoms.
+    The blocks are also accumulated separately for each pair of the
+    chemical symbols of (minv[k, i1], minv[k, i2]).
+
+    Parameters
+    ----------
+    force_constants: (natoms, natoms, 3, 3) array
+    mappings_inverse: (nsym, natoms) integer array
+    rotations_cart: (nsym, 3, 3) array
+    independent_atoms: (nind) integer array
+    symbol_numbers: (natoms) integer array
+        Indices of chemical symbols for the atoms.
+    nsymbols: Integer
+        Number of the chemical-symbol types.
+        The pair (n1, n2) is stored at the index n1 * nsymbols + n2.
+    max_elements: Integer
+        Approximate upper limit of the number of floats of the rotated
+        blocks processed at once.
+
+    Returns
+    -------
+    fc_sum: (nind, natoms, 3, 3) array
+    fc_square_sum: (nind, natoms, 3, 3) array
+    fc_pair_sum: (nsymbols ** 2, nind, natoms, 3, 3) array
+    fc_pair_square_sum: (nsymbols ** 2, nind, natoms, 3, 3) array
+    counters: (nsymbols ** 2, nind, natoms) integer array
+    """
+    mappings_inverse = np.asarray(mappings_inverse)
+    independent_atoms = np.asarray(independent_atoms, dtype=int)
+    symbol_numbers = np.asarray(symbol_numbers, dtype=int)
+
+    nsym, natoms = mappings_inverse.shape
+    nind = len(independent_atoms)
+    npairs = nsymbols ** 2
+    nblocks = nind * natoms
+
+    fc_flat = np.asarray(force_constants).reshape(natoms * natoms, 9)
+    kron = _create_kronecker_rotations(rotations_cart)
+
+    # The blocks and their squares are accumulated component by component
+    # using "np.bincount" on the indices (pair, i1, i2).
+    sums = np.zeros((18, npairs * nblocks))
+    counters = np.zeros(npairs * nblocks, dtype=int)
+
+    offsets = np.arange(nblocks)
+    chunk_size = max(1, max_elements // max(1, nblocks * 9))
+    for k0 in range(0, nsym, chunk_size):
+        k1 = min(k0 + chunk_size, nsym)
+        nk = k1 - k0
+        j1s = mappings_inverse[k0:k1, independent_atoms]  # (nk, nind)
+        j2s = mappings_inverse[k0:k1]  # (nk, natoms)
+
+        indices = (j1s[:, :, None] * natoms + j2s[:, None, :])
+        blocks = np.take(fc_flat, indices.reshape(nk, nblocks), axis=0)
+
+        values = np.empty((18, nk, nblocks))
+        for k in range(nk):
+            np.matmul(kron[k0 + k], blocks[k].T, out=values[:9, k])
+        np.square(values[:9], out=values[9:])
+
+        codes = (symbol_numbers[j1s][:, :, None] * nsymbols +
+                 symbol_numbers[j2s][:, None, :])
+        indices = (codes.reshape(nk, nblocks) * nblocks + offsets).ravel()
+
+        counters += np.bincount(indices, minlength=npairs * nblocks)
+        values = values.reshape(18, -1)
+        for ix in range(18):
+            sums[ix] += np.bincount(
+                indices, weights=values[ix], minlength=npairs * nblocks)
+
+    sums = sums.T.reshape(npairs, nind, natoms, 2, 3, 3)
+    fc_pair_sum = sums[..., 0, :, :]
+    fc_pair_square_sum = sums[..., 1, :, :]
+    return (
+        fc_pair_sum.sum(axis=0),
+        fc_pair_square_sum.sum(axis=0),
+        fc_pair_sum,
+        fc_pair_square_sum,
+        counters.reshape(npairs, nind, natoms),
+    )
+
+
+def distribute_force_constants(force_constants,
+                               map_atoms,
+                               map_operations,
+                               rotations_cart,
+                               mappings):
+    """Distribute force constants from independent atoms to all atoms.
+
+    fc_distributed[i, j] = R^T * fc[i_equiv, j_equiv] * R, where
+    i_equiv = map_atoms[i], R = rotations_cart[map_operations[i]], and
+    j_equiv = mappings[map_operations[i], j].
+
+    Parameters
+    ----------
+    force_constants: (natoms, natoms, 3, 3) array
+        Only the rows for the independent atoms are referred.
+    map_atoms: (natoms) integer array
+    map_operations: (natoms) integer array
+    rotations_cart: (nsym, 3, 3) array
+    mappings: (nsym, natoms) integer array
+
+    Returns
+    -------
+    fc_distributed: (natoms, natoms, 3, 3) array
+    """
+    map_atoms = np.asarray(map_atoms, dtype=int)
+    map_operations = np.asarray(map_operations, dtype=int)
+    rotations = np.asarray(rotations_cart)[map_operations]
+    j_equivs = np.asarray(mappings)[map_operations]
+
+    blocks = force_constants[map_atoms[:, None], j_equivs]
+    return rotate_force_constants(rotations.transpose(0, 2, 1), blocks)
+
+
+def average_force_constants_full(force_constants,
+                                 mappings,
+                                 rotations_cart,
+                                 symbol_numbers,
+                                 nsymbols,
+                                 dtype='double'):
+    """Average force constants over symmetry operations for all atom pairs.
+
+    For each symmetry operation k, the block fc[i1, i2] is rotated and
+    accumulated on (mappings[k, i1], mappings[k, i2]), i.e., one operation
+    is processed as one permutation of the rotated (natoms, natoms) array.
+    The blocks are also accumulated separately for each pair of the
+    chemical symbols of (i1, i2).
+
+    The statistics for the symbol pairs are stored in one stacked buffer,
+    and the means and the SDs are finalized in place to limit the memory
+    usage.
+
+    Parameters
+    ----------
+    force_constants: (natoms, natoms, 3, 3) array
+    mappings: (nsym, natoms) integer array
+    rotations_cart: (nsym, 3, 3) array
+    symbol_numbers: (natoms) integer array
+        Indices of chemical symbols for the atoms.
+    nsymbols: Integer
+        Number of the chemical-symbol types.
+        The pair (n1, n2) is stored at the index n1 * nsymbols + n2.
+    dtype: String or numpy.dtype
+        Data type of the buffers for the symbol pairs.
+        'single' halves the memory usage, while the SDs are then accurate
+        only to about 1e-3 of the means.
+
+    Returns
+    -------
+    fc_mean: (natoms, natoms, 3, 3) array
+    fc_sd: (natoms, natoms, 3, 3) array
+    fc_pair_mean: (nsymbols ** 2, natoms, natoms, 3, 3) array
+        np.nan for the blocks which no symmetry operation contributes to.
+    fc_pair_sd: (nsymbols ** 2, natoms, natoms, 3, 3) array
+    pair_counters: (nsymbols ** 2, natoms, natoms) integer array
+    """
+    mappings = np.asarray(mappings)
+    symbol_numbers = np.asarray(symbol_numbers, dtype=int)
+
+    nsym, natoms = mappings.shape
+    npairs = nsymbols ** 2
+    nblocks = natoms * natoms
+
+    fc_flat = np.asarray(force_constants).reshape(nblocks, 9)
+    kron = _create_kronecker_rotations(rotations_cart)
+    codes = (symbol_numbers[:, None] * nsymbols +
+             symbol_numbers[None, :]).ravel()
+
+    fc_sum = np.zeros((nblocks, 9))
+    fc_square_sum = np.zeros((nblocks, 9))
+    fc_pair_sum = np.zeros((npairs * nblocks, 9), dtype=dtype)
+    fc_pair_square_sum = np.zeros((npairs * nblocks, 9), dtype=dtype)
+    pair_counters = np.zeros(npairs * nblocks, dtype=int)
+
+    for m, k in zip(mappings, kron):
+        # (i1, i2) -> (m[i1], m[i2]). Since m is a permutation, the indices
+        # are unique and the fancy-indexed additions are safe.
+        indices = (m[:, None] * natoms + m[None, :]).ravel()
+        values = np.dot(fc_flat, k.T)
+        values_square = values ** 2
+
+        fc_sum[indices] += values
+        fc_square_sum[indices] += values_square
+
+        indices += codes * nblocks
+        fc_pair_sum[indices] += values
+        fc_pair_square_sum[indices] += values_square
+        pair_counters[indices] += 1
+
+    fc_mean = fc_sum / float(nsym)
+    fc_sd = fc_square_sum / float(nsym) - fc_mean ** 2
+    # Small negative values from rounding errors are removed.
+    np.maximum(fc_sd, 0.0, out=fc_sd)
+    np.sqrt(fc_sd, out=fc_sd)
+
+    shape = (npairs, natoms, natoms, 3, 3)
+    fc_pair_sum = fc_pair_sum.reshape(shape)
+    fc_pair_square_sum = fc_pair_square_sum.reshape(shape)
+    pair_counters = pair_counters.reshape(shape[:3])
+
+    # Finalized in place pair by pair to avoid large temporary arrays.
+    # The blocks with no contribution become 0 / 0 = np.nan.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for mean, sd, c in zip(fc_pair_sum, fc_pair_square_sum, pair_counters):
+            c = c[:, :, None, None]
+            mean /= c
+            sd /= c
+            sd -= mean ** 2
+            # Small negative values from rounding errors are removed.
+            np.maximum(sd, 0.0, out=sd)
+            np.sqrt(sd, out=sd)
+
+    return (
+        fc_mean.reshape(shape[1:]),
+        fc_sd.reshape(shape[1:]),
+        fc_pair_sum,
+        fc_pair_square_sum,
+        pair_counters,
+    )
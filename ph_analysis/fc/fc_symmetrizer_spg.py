@@ -2,13 +2,19 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, division, print_function
 import itertools
+import os
 import numpy as np
-from phonopy.file_IO import write_FORCE_CONSTANTS
-from phonopy.structure.symmetry import Symmetry
 from .fc_analyzer_base import FCAnalyzerBase
-from ..analysis.mappings_modifier import MappingsModifier
-from ..structure.structure_analyzer import StructureAnalyzer
-from ..structure.symtools import get_rotations_cart
+from .fc_symmetrizer_engine import (
+    average_force_constants_for_independent_atoms,
+    average_force_constants_full,
+    distribute_force_constants,
+)
+from .fc_store import (
+    write_force_constants,
+    write_force_constants_pair_archive,
+)
+from ..structure.symmetry_cache import get_symmetry_data
 
 # TODO(ikeda): The structure of the variable "force_constants_pair" should be
 #     modified. We want to use numpy functions.
@@ -21,58 +27,57 @@ class FCSymmetrizerSPG(FCAnalyzerBase):
 
         atoms_symmetry = self._atoms_ideal
 
-        symmetry = Symmetry(atoms_symmetry)
+        symmetry_data = get_symmetry_data(atoms_symmetry, symprec)
 
         symbols = atoms.get_chemical_symbols()
         symboltypes = sorted(set(symbols), key=symbols.index)
 
-        rotations_cart = get_rotations_cart(atoms_symmetry)
-        mappings = StructureAnalyzer(
-            atoms_symmetry).get_mappings_for_symops(prec=symprec)
-        mappings_inv = MappingsModifier(mappings).invert_mappings()
+        rotations_cart = symmetry_data['rotations_cart']
+        mappings = symmetry_data['mappings']
+        mappings_inv = symmetry_data['mappings_inverse']
 
         print("mappings: Finished.")
         (nsym, natoms) = mappings.shape
         print("nsym: {}".format(nsym))
         print("natoms: {}".format(natoms))
 
+        independent_atoms = symmetry_data['independent_atoms']
+        map_atoms = symmetry_data['map_atoms']
+        map_operations = symmetry_data['map_operations']
+        symbol_numbers = [symboltypes.index(s) for s in symbols]
+        nsymbols = len(symboltypes)
+
+        (fc_sum, fc_square_sum, fc_pair_sum, fc_pair_square_sum,
+         pair_counters) = average_force_constants_for_independent_atoms(
+            fc_orig,
+            mappings_inv,
+            rotations_cart,
+            independent_atoms,
+            symbol_numbers,
+            nsymbols)
+
         fc_mean = np.zeros_like(fc_orig)
         fc_mean_square = np.zeros_like(fc_orig)
+        fc_mean[independent_atoms] = fc_sum / float(nsym)
+        fc_mean_square[independent_atoms] = fc_square_sum / float(nsym)
 
         fc_mean_symbols, fc_mean_square_symbols, fc_std_symbols, counters = (
             self.initialize_fc_symbols(fc_orig, symboltypes)
         )
 
-        for (minv, r) in zip(mappings_inv, rotations_cart):
-            for i1 in symmetry.get_independent_atoms():
-                for i2 in range(natoms):
-                    j1 = minv[i1]
-                    j2 = minv[i2]
-                    s1 = symbols[j1]
-                    s2 = symbols[j2]
-
-                    tmp = np.dot(np.dot(r, fc_orig[j1, j2]), r.T)
-                    tmp2 = tmp ** 2
-                    fc_mean[i1, i2] += tmp
-                    fc_mean_square[i1, i2] += tmp2
-
-                    fc_mean_symbols[(s1, s2)][i1, i2] += tmp
-                    fc_mean_square_symbols[(s1, s2)][i1, i2] += tmp2
-
-                    counters[(s1, s2)][i1, i2] += 1
-
-        fc_mean        /= float(len(rotations_cart))
-        fc_mean_square /= float(len(rotations_cart))
-
-        for i1 in symmetry.get_independent_atoms():
-            for i2 in range(natoms):
-                for (key, c) in counters.items():
-                    if c[i1, i2] != 0:
-                        fc_mean_symbols       [key][i1, i2] /= c[i1, i2]
-                        fc_mean_square_symbols[key][i1, i2] /= c[i1, i2]
-                    else:
-                        fc_mean_symbols       [key][i1, i2] = np.nan
-                        fc_mean_square_symbols[key][i1, i2] = np.nan
+        # The pair (s1, s2) is stored at n1 * nsymbols + n2.
+        with np.errstate(divide='ignore', invalid='ignore'):
+            c = pair_counters[..., None, None]
+            fc_pair_sum = np.where(c != 0, fc_pair_sum / c, np.nan)
+            fc_pair_square_sum = np.where(
+                c != 0, fc_pair_square_sum / c, np.nan)
+
+        for ipair, key in enumerate(itertools.product(symboltypes, repeat=2)):
+            fc_mean_symbols[key][independent_atoms] = fc_pair_sum[ipair]
+            fc_mean_square_symbols[key][independent_atoms] = (
+                fc_pair_square_sum[ipair])
+            counters[key][independent_atoms] = pair_counters[ipair]
+        self._pair_counters = counters
 
         ########################################
         # STD
@@ -86,16 +91,18 @@ class FCSymmetrizerSPG(FCAnalyzerBase):
         ########################################
         # Distribution
         ########################################
-        fc_mean = self.distribute_force_constants_spg(
-            fc_mean, symmetry, rotations_cart, mappings)
-        fc_std = self.distribute_force_constants_spg(
-            fc_std, symmetry, rotations_cart, mappings)
+        fc_mean = distribute_force_constants(
+            fc_mean, map_atoms, map_operations, rotations_cart, mappings)
+        fc_std = distribute_force_constants(
+            fc_std, map_atoms, map_operations, rotations_cart, mappings)
 
         for key in counters.keys():
-            fc_mean_symbols[key] = self.distribute_force_constants_spg(
-                fc_mean_symbols[key], symmetry, rotations_cart, mappings)
-            fc_std_symbols[key] = self.distribute_force_constants_spg(
-                fc_std_symbols[key], symmetry, rotations_cart, mappings)
+            fc_mean_symbols[key] = distribute_force_constants(
+                fc_mean_symbols[key],
+                map_atoms, map_operations, rotations_cart, mappings)
+            fc_std_symbols[key] = distribute_force_constants(
+                fc_std_symbols[key],
+                map_atoms, map_operations, rotations_cart, mappings)
 
         # After the distributions, the signs of SDs can be changed.
         # However, the signs of SDs have no meaning.
@@ -127,27 +134,32 @@ class FCSymmetrizerSPG(FCAnalyzerBase):
 
         return fc_mean_symbols, fc_mean_square_symbols, fc_std_symbols, counters
 
-    def distribute_force_constants_spg(self, fc, symmetry, rotations_cart, mappings):
-        fc_distributed = np.zeros_like(fc)
-        natoms = fc_distributed.shape[0]
-        map_atoms = symmetry.get_map_atoms()
-        map_operations = symmetry.get_map_operations()
-        for i in range(natoms):
-            i_equiv = map_atoms[i]
-            iop = map_operations[i]
-            r = rotations_cart[iop]
-            for j in range(natoms):
-                j_equiv = mappings[iop, j]
-                fc_distributed[i, j] = np.dot(np.dot(r.T, fc[i_equiv, j_equiv]), r)
-
-        return fc_distributed
-
-    def average_force_constants_spg_full(self, symprec=1e-5):
+    def distribute_force_constants_spg(self, fc, symmetry, rotations_cart,
+                                       mappings):
+        """Distribute force constants using the phonopy "Symmetry" object.
+
+        Kept for the compatibility. "distribute_force_constants" in
+        "fc_symmetrizer_engine" takes the maps directly.
+        """
+        return distribute_force_constants(
+            fc,
+            symmetry.get_map_atoms(),
+            symmetry.get_map_operations(),
+            rotations_cart,
+            mappings)
+
+    def average_force_constants_spg_full(self, symprec=1e-5, dtype='double'):
         """Generate symmetrized force constants.
 
         If the structure for extracting symmetry operations are different from
         the structure for extracting chemical symbols, we must specify symbols
         explicitly.
+
+        Parameters
+        ----------
+        dtype: String or numpy.dtype
+            Data type of the force constants for the symbol pairs.
+            'single' halves the memory usage for large supercells.
         """
 
         atoms = self._atoms
@@ -161,74 +173,41 @@ class FCSymmetrizerSPG(FCAnalyzerBase):
         #     each element is for the "original" positions. 
         #     mappings[k][i] = j means the atom j moves to the positions of
         #     the atom i for the k-th symmetry operations.
-        rotations_cart = get_rotations_cart(atoms_symmetry)
-        mappings = StructureAnalyzer(
-            atoms_symmetry).get_mappings_for_symops(prec=symprec)
+        symmetry_data = get_symmetry_data(atoms_symmetry, symprec)
+        rotations_cart = symmetry_data['rotations_cart']
+        mappings = symmetry_data['mappings']
 
         print("mappings: Finished.")
         (nsym, natoms) = mappings.shape
         print("nsym: {}".format(nsym))
         print("natoms: {}".format(natoms))
 
-        shape = self._force_constants.shape
-
-        force_constants_symmetrized = np.zeros(shape)
-        force_constants_sd = np.zeros(shape)
-
+        symbol_numbers = [symboltypes.index(s) for s in symbols]
+
+        (force_constants_symmetrized,
+         force_constants_sd,
+         force_constants_pair_stacked,
+         force_constants_pair_sd_stacked,
+         pair_counters_stacked) = average_force_constants_full(
+            self._force_constants,
+            mappings,
+            rotations_cart,
+            symbol_numbers,
+            nsymbols,
+            dtype=dtype)
+
+        # The values of the dictionaries are views of the stacked arrays.
         force_constants_pair = {}
         force_constants_pair_sd = {}
         pair_counters = {}
-        for s1 in symboltypes:
-            for s2 in symboltypes:
-                force_constants_pair[(s1, s2)] = np.zeros(shape)
-                force_constants_pair_sd[(s1, s2)] = np.zeros(shape)
-                pair_counters[(s1, s2)] = np.zeros((natoms, natoms), dtype=int)
-
-        for (m, r) in zip(mappings, rotations_cart):
-            # i1, i2: indices after symmetry operations
-            # j1, j2: indices before symmetry operations
-            for i1 in range(natoms):
-                for i2 in range(natoms):
-                    j1 = m[i1]
-                    j2 = m[i2]
-                    s_i1 = symbols[i1]
-                    s_i2 = symbols[i2]
-                    s_j1 = symbols[j1]
-                    s_j2 = symbols[j2]
-
-                    tmp = np.dot(np.dot(r, self._force_constants[i1, i2]), r.T)
-                    tmp2 = tmp ** 2
-                    force_constants_symmetrized[j1, j2] += tmp
-                    force_constants_sd[j1, j2] += tmp2
-
-                    force_constants_pair[(s_i1, s_i2)][j1, j2] += tmp
-                    force_constants_pair_sd[(s_i1, s_i2)][j1, j2] += tmp2
-                    pair_counters[(s_i1, s_i2)][j1, j2] += 1
+        for ipair, key in enumerate(itertools.product(symboltypes, repeat=2)):
+            force_constants_pair[key] = force_constants_pair_stacked[ipair]
+            force_constants_pair_sd[key] = (
+                force_constants_pair_sd_stacked[ipair])
+            pair_counters[key] = pair_counters_stacked[ipair]
 
         self._pair_counters = pair_counters
-        counter_check = np.zeros((natoms, natoms), dtype=int)
-        for (key, c) in pair_counters.items():
-            counter_check += c
-        self._counter_check = counter_check
-
-        force_constants_symmetrized /= float(nsym)
-        force_constants_sd /= float(nsym)
-        force_constants_sd = get_matrix_std(
-            force_constants_symmetrized,
-            force_constants_sd)
-
-        for (s_i1, s_i2) in itertools.product(symboltypes, repeat=2):
-            for (i1, i2) in itertools.product(range(natoms), repeat=2):
-                cval = pair_counters[(s_i1, s_i2)][i1, i2]
-                if cval != 0:
-                    force_constants_pair[(s_i1, s_i2)][i1, i2] /= cval
-                    force_constants_pair_sd[(s_i1, s_i2)][i1, i2] /= cval
-                else:
-                    force_constants_pair[(s_i1, s_i2)][i1, i2] = np.nan
-                    force_constants_pair_sd[(s_i1, s_i2)][i1, i2] = np.nan
-            force_constants_pair_sd[(s_i1, s_i2)] = get_matrix_std(
-                force_constants_pair[(s_i1, s_i2)],
-                force_constants_pair_sd[(s_i1, s_i2)])
+        self._counter_check = np.sum(pair_counters_stacked, axis=0)
 
         self._force_constants_symmetrized = force_constants_symmetrized
         self._force_constants_sd = force_constants_sd
@@ -255,14 +234,14 @@ class FCSymmetrizerSPG(FCAnalyzerBase):
             filename_write="FORCE_CONSTANTS_SPG"):
 
         fc = self.get_force_constants_symmetrized()
-        write_FORCE_CONSTANTS(fc, filename_write)
+        write_force_constants(fc, filename_write)
 
     def write_force_constants_sd(
             self,
             filename_write="FORCE_CONSTANTS_SD"):
 
         fc = self.get_force_constants_sd()
-        write_FORCE_CONSTANTS(fc, filename_write)
+        write_force_constants(fc, filename_write)
 
     def write_force_constants_pair(
             self,
@@ -271,9 +250,9 @@ class FCSymmetrizerSPG(FCAnalyzerBase):
         force_constants_pair = self.get_force_constants_pair()
 
         for (pairtypes, force_constants_pair) in force_constants_pair.items():
-            filename_write_pair = "{}_{}_{}".format(filename_write, *pairtypes)
-            write_FORCE_CONSTANTS(force_constants_pair,
-                                  filename_write_pair)
+            filename_write_pair = _create_pair_filename(
+                filename_write, pairtypes)
+            write_force_constants(force_constants_pair, filename_write_pair)
 
     def write_force_constants_pair_sd(
             self,
@@ -282,38 +261,66 @@ class FCSymmetrizerSPG(FCAnalyzerBase):
         force_constants_pair_sd = self.get_force_constants_pair_sd()
 
         for (pairtypes, force_constants_pair_sd) in force_constants_pair_sd.items():
-            filename_write_pair = "{}_{}_{}".format(filename_write, *pairtypes)
-            write_FORCE_CONSTANTS(force_constants_pair_sd,
-                                  filename_write_pair)
+            filename_write_pair = _create_pair_filename(
+                filename_write, pairtypes)
+            write_force_constants(force_constants_pair_sd, filename_write_pair)
+
+    def write_force_constants_pair_archive(
+            self,
+            filename_write="FORCE_CONSTANTS_PAIR.npz"):
+        """Write FCs, SDs, and counters for all the symbol pairs in one file.
+
+        The file can be read by "read_force_constants_pair_archive" in
+        "fc_store".
+        """
+        write_force_constants_pair_archive(
+            filename_write,
+            self.get_force_constants_pair(),
+            self.get_force_constants_pair_sd(),
+            self.get_pair_counters())
 
     def write_pair_counters(self, filename_write="PAIR_COUNTER"):
 
         counters = self.get_pair_counters()
 
         for (pairtypes, pair_counter) in counters.items():
-            natoms = pair_counter.shape[0]
             filename_write_pair = "{}_{}_{}".format(filename_write, *pairtypes)
-            with open(filename_write_pair, "w") as f:
-                f.write("{:4d}\n".format(natoms))
-                for (i1, i2) in itertools.product(range(natoms), repeat=2):
-                    c = pair_counter[i1, i2]
-                    f.write("{:4d}{:4d}{:8d}\n".format(i1, i2, c))
+            _write_counter(filename_write_pair, pair_counter)
 
     def write_counter_check(self, filename_write="COUNTER_CHECK"):
 
         counters = self.get_pair_counters()
-        counter_sum = np.sum(counters.values())
+        counter_sum = np.sum(list(counters.values()), axis=0)
+
+        _write_counter(filename_write, counter_sum)
+
+
+def _write_counter(filename, counter, chunk_size=2 ** 14):
+    natoms = counter.shape[0]
+    i1s, i2s = np.indices((natoms, natoms))
+    data = np.column_stack((i1s.ravel(), i2s.ravel(), counter.ravel()))
+    with open(filename, "w") as f:
+        f.write("{:4d}\n".format(natoms))
+        # Many lines are formatted at once, which is much faster than
+        # "f.write" for each line and also than "np.savetxt".
+        for i in range(0, len(data), chunk_size):
+            chunk = data[i:i + chunk_size]
+            lines = "%4d%4d%8d\n" * len(chunk)
+            f.write(lines % tuple(chunk.ravel().tolist()))
 
-        natoms = counter_sum.shape[0]
 
-        with open(filename_write, "w") as f:
-            f.write("{:4d}\n".format(natoms))
-            for (i1, i2) in itertools.product(range(natoms), repeat=2):
-                c = counter_sum[i1, i2]
-                f.write("{:4d}{:4d}{:8d}\n".format(i1, i2, c))
+def _create_pair_filename(filename, pairtypes):
+    # The extension is kept at the end to keep the format.
+    root, ext = os.path.splitext(filename)
+    if ext != '.npy':
+        root, ext = filename, ''
+    return "{}_{}_{}{}".format(root, pairtypes[0], pairtypes[1], ext)
 
 
 def get_matrix_std(matrix_mean, matrix_mean_square):
     matrix_tmp = matrix_mean_square - matrix_mean ** 2
+    # Small negative values from rounding errors are removed.
+    # np.nan for the blocks with no contribution is kept.
+    np.maximum(matrix_tmp, 0.0, out=matrix_tmp)
     matrix_std = np.sqrt(matrix_tmp)
     return matrix_std
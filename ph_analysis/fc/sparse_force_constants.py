@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+import numpy as np
+from .fc_store import is_binary
+
+__author__ = 'Yuji Ikeda'
+
+
+class SparseForceConstants(object):
+    """Force constants stored as nonzero 3x3 blocks (COO format).
+
+    The blocks are kept as the arrays "rows", "cols", and "blocks", where
+    blocks[k] is the (rows[k], cols[k]) block of the (natoms, natoms, 3, 3)
+    force constants. Blocks added for the same (i, j) are summed up.
+    """
+    def __init__(self, natoms):
+        self._natoms = natoms
+        self._rows = np.zeros(0, dtype=int)
+        self._cols = np.zeros(0, dtype=int)
+        self._blocks = np.zeros((0, 3, 3))
+        self._pending = []
+
+    def get_number_of_atoms(self):
+        return self._natoms
+
+    @property
+    def shape(self):
+        return (self._natoms, self._natoms, 3, 3)
+
+    def add_blocks(self, rows, cols, blocks):
+        """Add blocks.
+
+        Parameters
+        ----------
+        rows: (...) integer array
+        cols: (...) integer array
+        blocks: (..., 3, 3) array
+        """
+        rows = np.asarray(rows, dtype=int)
+        cols = np.asarray(cols, dtype=int)
+        blocks = np.asarray(blocks, dtype=float)
+        shape = np.broadcast(rows, cols).shape
+        self._pending.append((
+            np.broadcast_to(rows, shape).ravel(),
+            np.broadcast_to(cols, shape).ravel(),
+            blocks.reshape(-1, 3, 3)))
+        return self
+
+    def _sum_duplicates(self):
+        if not self._pending:
+            return
+        rows, cols, blocks = zip(*self._pending)
+        self._pending = []
+        rows = np.concatenate((self._rows,) + rows)
+        cols = np.concatenate((self._cols,) + cols)
+        blocks = np.concatenate((self._blocks,) + blocks)
+
+        keys = rows * self._natoms + cols
+        # The stable sort keeps the order of the additions for each (i, j).
+        order = np.argsort(keys, kind='mergesort')
+        keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+        self._rows = rows[order][starts]
+        self._cols = cols[order][starts]
+        if len(keys) == 0:
+            self._blocks = blocks
+        else:
+            self._blocks = np.add.reduceat(blocks[order], starts, axis=0)
+
+    def get_blocks(self):
+        """Get the nonzero blocks.
+
+        Returns
+        -------
+        rows: (nblocks) integer array
+        cols: (nblocks) integer array
+        blocks: (nblocks, 3, 3) array
+            Sorted by (rows, cols) without duplicates.
+        """
+        self._sum_duplicates()
+        return self._rows, self._cols, self._blocks
+
+    def get_number_of_blocks(self):
+        return len(self.get_blocks()[0])
+
+    def set_permutation_symmetry(self):
+        """Sparse version of "set_permutation_symmetry" of phonopy.
+
+        fc[i, j] = (fc[i, j] + fc[j, i].T) / 2
+        """
+        rows, cols, blocks = self.get_blocks()
+        self._rows = np.zeros(0, dtype=int)
+        self._cols = np.zeros(0, dtype=int)
+        self._blocks = np.zeros((0, 3, 3))
+        self.add_blocks(rows, cols, blocks / 2.0)
+        self.add_blocks(cols, rows, blocks.transpose(0, 2, 1) / 2.0)
+        self._sum_duplicates()
+        return self
+
+    def set_translational_invariance_for_diagonal(self):
+        """fc[i, i] = -sum_j fc[i, j], where the sum includes the old fc[i, i].
+
+        This is the same as "set_translational_invariance_for_diagonal"
+        in "fc_enlarger" for the dense force constants.
+        """
+        rows, cols, blocks = self.get_blocks()
+        natoms = self._natoms
+        sums = np.zeros((natoms, 9))
+        blocks_flat = blocks.reshape(-1, 9)
+        for ix in range(9):
+            sums[:, ix] = np.bincount(
+                rows, weights=blocks_flat[:, ix], minlength=natoms)
+
+        is_offdiagonal = (rows != cols)
+        self._rows = rows[is_offdiagonal]
+        self._cols = cols[is_offdiagonal]
+        self._blocks = blocks[is_offdiagonal]
+        self.add_blocks(
+            np.arange(natoms), np.arange(natoms), -sums.reshape(-1, 3, 3))
+        self._sum_duplicates()
+        return self
+
+    def get_rows(self, start, stop):
+        """Get dense rows.
+
+        Returns
+        -------
+        force_constants: (stop - start, natoms, 3, 3) array
+        """
+        rows, cols, blocks = self.get_blocks()
+        k0, k1 = np.searchsorted(rows, [start, stop])
+        force_constants = np.zeros((stop - start, self._natoms, 3, 3))
+        force_constants[rows[k0:k1] - start, cols[k0:k1]] = blocks[k0:k1]
+        return force_constants
+
+    def to_dense(self):
+        return self.get_rows(0, self._natoms)
+
+    def write(self, filename, max_elements=2 ** 20):
+        """Write the force constants densified row by row.
+
+        The format is judged from the filename in the same way as
+        "write_force_constants" in "fc_store". The full dense array is not
+        created.
+        """
+        natoms = self._natoms
+        chunk_size = max(1, max_elements // (natoms * 9))
+        if is_binary(filename):
+            force_constants = np.lib.format.open_memmap(
+                filename, mode='w+', dtype='double', shape=self.shape)
+            for i0 in range(0, natoms, chunk_size):
+                i1 = min(i0 + chunk_size, natoms)
+                force_constants[i0:i1] = self.get_rows(i0, i1)
+            force_constants.flush()
+            del force_constants
+            return
+
+        # The same as "write_FORCE_CONSTANTS" of phonopy.
+        line_block = "\n%d %d" + ("\n" + "%22.15f" * 3) * 3
+        js = np.arange(natoms)
+        with open(filename, 'w') as f:
+            f.write("%4d %4d" % (natoms, natoms))
+            for i0 in range(0, natoms, chunk_size):
+                i1 = min(i0 + chunk_size, natoms)
+                data = np.empty((i1 - i0, natoms, 11))
+                data[:, :, 0] = np.arange(i0, i1)[:, None] + 1
+                data[:, :, 1] = js + 1
+                data[:, :, 2:] = self.get_rows(i0, i1).reshape(-1, natoms, 9)
+                f.write((line_block * (i1 - i0) * natoms) %
+                        tuple(data.ravel().tolist()))
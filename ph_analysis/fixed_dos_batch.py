@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Electronic free energies of many DOSCARs in the fixed-DOS approximation.
+
+The files are parsed by a thread pool, the DOSes are interpolated onto a
+common energy grid, and the pairs of the DOSes and the temperatures are
+evaluated in chunks by "calculate_thermodynamic_properties_batch".
+"""
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import numpy as np
+import pandas as pd
+from .fixed_dos_approximation import calculate_thermodynamic_properties_batch
+
+__author__ = 'Yuji Ikeda'
+
+
+def read_doscar(filename):
+    """Read the total DOS of DOSCAR.
+
+    Returns
+    -------
+    efermi: Float
+    energies: (NE) array
+    dos: (NE) array
+        Total DOS. For spin-polarized calculations, the sum of the both spins.
+    """
+    with open(filename) as f:
+        for _ in range(5):
+            next(f)
+        # EMAX, EMIN, NEDOS, EFERMI, weight
+        header = next(f).split()
+        nedos = int(header[2])
+        efermi = float(header[3])
+        lines = list(itertools.islice(f, nedos))
+    values = np.array(' '.join(lines).split(), dtype=float)
+    if len(lines) != nedos or len(values) % nedos != 0:
+        print("ERROR: {}".format(__name__))
+        print("{} is truncated.".format(filename))
+        raise ValueError
+    values = values.reshape(nedos, -1)
+    # Columns: E, DOS, IDOS or E, DOS(up), DOS(down), IDOS(up), IDOS(down)
+    ndos = (values.shape[1] - 1) // 2
+    energies = values[:, 0]
+    dos = values[:, 1:1 + ndos].sum(axis=1)
+    return efermi, energies, dos
+
+
+def create_common_energies(energies_list):
+    """Create the energy grid covering all the given grids.
+
+    The spacing is the finest one among the given grids.
+    """
+    emin = min(e[0] for e in energies_list)
+    emax = max(e[-1] for e in energies_list)
+    de = min((e[-1] - e[0]) / (len(e) - 1) for e in energies_list)
+    n = int(np.ceil((emax - emin) / de - 1e-6)) + 1
+    return np.linspace(emin, emax, n)
+
+
+class FixedDOSBatch(object):
+    def __init__(self,
+                 filenames,
+                 temperatures,
+                 energies=None,
+                 labels=None,
+                 fix_nelectrons=False,
+                 max_workers=None,
+                 max_elements=2 ** 14):
+        """
+
+        Parameters
+        ----------
+        filenames: List of strings
+            DOSCAR files.
+        temperatures: (NT) array
+        energies: (NE) array, optional
+            Common energy grid. If None, it is created by
+            "create_common_energies".
+        labels: Dictionary or pandas.DataFrame, optional
+            Columns with one value for each file, e.g., 'volume', which are
+            added to the table.
+        fix_nelectrons: Bool
+            If True, the chemical potentials are solved at each temperature
+            for the number of the electrons at T = 0.
+        max_workers: Integer or None
+            Number of threads to read the files. 1 reads them serially.
+        max_elements: Integer
+            Given to "calculate_thermodynamic_properties_batch".
+        """
+        self._filenames = list(filenames)
+        self._temperatures = np.asarray(temperatures, dtype=float)
+        self._energies = energies
+        self._labels = labels
+        self._fix_nelectrons = fix_nelectrons
+        self._max_workers = max_workers
+        self._max_elements = max_elements
+        self._efermis = None
+        self._doses = None
+        self._properties = None
+        self._data = None
+
+    def read(self):
+        if self._max_workers == 1:
+            results = list(map(read_doscar, self._filenames))
+        else:
+            with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+                results = list(executor.map(read_doscar, self._filenames))
+        efermis, energies_list, doses = zip(*results)
+
+        if self._energies is None:
+            self._energies = create_common_energies(energies_list)
+        energies = np.asarray(self._energies, dtype=float)
+        self._efermis = np.array(efermis)
+        self._doses = np.array([
+            np.interp(energies, e, d, left=0.0, right=0.0)
+            for e, d in zip(energies_list, doses)])
+        return self
+
+    def run(self):
+        self.read()
+        temperatures = self._temperatures
+        self._properties = calculate_thermodynamic_properties_batch(
+            temperatures,
+            self._efermis,
+            self._energies,
+            self._doses,
+            fix_nelectrons=self._fix_nelectrons,
+            max_elements=self._max_elements)
+
+        nfiles = len(self._filenames)
+        nt = len(temperatures)
+        data = pd.DataFrame()
+        data['filename'] = np.repeat(self._filenames, nt)
+        if self._labels is not None:
+            for k, v in pd.DataFrame(self._labels).items():
+                data[k] = np.repeat(np.asarray(v), nt)
+        data['efermi'] = np.repeat(self._efermis, nt)
+        data['T'] = np.tile(temperatures, nfiles)
+        data['mu'] = self._properties['chemical_potential'].ravel()
+        data['U'] = self._properties['internal_energy'].ravel()
+        data['S'] = self._properties['entropy'].ravel()
+        data['F'] = self._properties['helmholtz_energy'].ravel()
+        self._data = data
+        return self
+
+    def get_free_energies(self):
+        """(NFILES, NT) array of F.
+
+        For the files at volumes V, this is in the shape of
+        "free_energies_vib" of "QHA", and the transpose can be added to the
+        (NT, NV) energies of "BatchEOSFitting".
+        """
+        return self._properties['helmholtz_energy']
+
+    def get_energies(self):
+        return self._energies
+
+    def get_doses(self):
+        return self._doses
+
+    def get_data(self):
+        """Table with one row for each pair of a file and a temperature."""
+        return self._data
+
+    def write(self, filename='fixed_dos.dat'):
+        with open(filename, 'w') as f:
+            self._data.to_string(
+                f, float_format='{:22.12e}'.format, index=False)
+            f.write('\n')
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Quasi-harmonic approximation on a volume-temperature grid.
+
+F(V, T) = E(V) + F_vib(V, T) + P V is evaluated on the whole grid at once,
+and F(V) at all the temperatures is fitted by an EOS in one batched
+Levenberg-Marquardt step ("BatchEOSFitting").
+
+Units are eV, A^3, and K, e.g., per atom.
+"""
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import numpy as np
+import pandas as pd
+from ..debye.debye import Debye, calculate_debye_from_gruneisen
+from ..debye.td_props import calculate_helmholtz_energy
+from ..eos.eos import EOSFactory
+from ..eos.eos_fitting import BatchEOSFitting
+
+__author__ = 'Yuji Ikeda'
+
+
+def calculate_debye_free_energies(temperatures, debye_temperatures):
+    """Calculate F_vib of the Debye model on the grid.
+
+    Parameters
+    ----------
+    temperatures: (NT) array
+    debye_temperatures: (NV) array
+
+    Returns
+    -------
+    free_energies: (NV, NT) array
+    """
+    return calculate_helmholtz_energy(
+        np.asarray(temperatures, dtype=float)[None, :],
+        np.asarray(debye_temperatures, dtype=float)[:, None])
+
+
+def calculate_debye_temperatures_from_gruneisen(volumes, v0, debye0, gruneisen):
+    """Debye temperatures with a constant Gruneisen parameter."""
+    return calculate_debye_from_gruneisen(volumes, v0, debye0, gruneisen)
+
+
+def calculate_debye_temperatures_from_eos(volumes,
+                                          eos_name,
+                                          parameters,
+                                          mass_in_da,
+                                          poisson=0.25):
+    """Debye temperatures from the bulk moduli of the static EOS.
+
+    Parameters
+    ----------
+    volumes: (NV) array
+    eos_name: String
+    parameters: (E_0, B_0, B'_0, V_0)
+    mass_in_da: Float
+        Average atomic mass.
+    poisson: Float
+        Poisson's ratio.
+    """
+    eos = EOSFactory(eos_name).create()
+    bulk_moduli = eos.bv(np.asarray(volumes, dtype=float), *parameters)
+    return Debye(poisson).run(volumes, bulk_moduli, mass_in_da)
+
+
+class QHA(object):
+    def __init__(self,
+                 volumes,
+                 energies,
+                 temperatures,
+                 free_energies_vib,
+                 eos_name='Vinet',
+                 pressure=0.0,
+                 max_workers=1):
+        """
+
+        Parameters
+        ----------
+        volumes: (NV) array
+        energies: (NV) array
+            Static energies E(V).
+        temperatures: (NT) array
+            Sorted and equidistant grids are recommended for the derivatives.
+        free_energies_vib: (NV, NT) array
+            F_vib(V, T), e.g., by "calculate_debye_free_energies" or phonon
+            calculations at each volume.
+        eos_name: String
+        pressure: Float
+            In eV/A^3.
+        max_workers: Integer or None
+            Given to "BatchEOSFitting".
+        """
+        self._volumes = np.asarray(volumes, dtype=float)
+        self._energies = np.asarray(energies, dtype=float)
+        self._temperatures = np.asarray(temperatures, dtype=float)
+        self._free_energies_vib = np.asarray(free_energies_vib, dtype=float)
+        self._eos_name = eos_name
+        self._pressure = pressure
+        self._max_workers = max_workers
+        self._data = None
+
+        shape = (len(self._volumes), len(self._temperatures))
+        if self._free_energies_vib.shape != shape:
+            print("ERROR: {}".format(__name__))
+            print("The shape of free_energies_vib is not {}.".format(shape))
+            raise ValueError
+
+    def run(self):
+        volumes = self._volumes
+        temperatures = self._temperatures
+
+        # (NT, NV)
+        gibbs_energies = (
+            self._energies[None, :] +
+            self._free_energies_vib.T +
+            self._pressure * volumes[None, :])
+        fitting = BatchEOSFitting(
+            volumes,
+            gibbs_energies,
+            self._eos_name,
+            max_workers=self._max_workers)
+        data = fitting.fit().get_data()
+
+        # Since PV is linear in V, V0 and B0 of the fitted G(V) are the
+        # equilibrium volume and the isothermal bulk modulus at the pressure.
+        volumes_t = data['V0'].values
+        gibbs_t = data['F0'].values
+
+        # alpha = (1/V) dV/dT, C_P = -T d^2G/dT^2
+        alphas = np.gradient(volumes_t, temperatures) / volumes_t
+        heat_capacities = -temperatures * np.gradient(
+            np.gradient(gibbs_t, temperatures), temperatures)
+
+        table = pd.DataFrame()
+        table['T'] = temperatures
+        table['V'] = volumes_t
+        table['B'] = data['B0'].values
+        table['Bp'] = data['Bp0'].values
+        table['G'] = gibbs_t
+        table['alpha'] = alphas
+        table['Cp'] = heat_capacities
+        table['F_RMSE'] = data['F_RMSE'].values
+        self._data = table
+        return self
+
+    def write(self, filename='qha.dat'):
+        with open(filename, 'w') as f:
+            self._data.to_string(
+                f,
+                formatters=(
+                    ['{:12.4f}'.format] +
+                    ['{:22.12e}'.format] * (len(self._data.columns) - 1)),
+                index=False,
+            )
+            f.write('\n')
+
+    def get_data(self):
+        return self._data
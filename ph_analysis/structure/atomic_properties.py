@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Per-atom properties of many structures in one columnar table.
+
+Displacements and SAD are obtained from the same displacement vectors,
+which are computed for stacks of structures with the same number of atoms at
+once. All the values are collected into arrays, and the DataFrame is created
+only once for all the structures.
+"""
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from .atomic_report import (
+    STATISTICS,
+    create_data_stat,
+    write_atomic_report,
+    write_data,
+)
+from .volume_factory import VolumeFactory
+
+__author__ = 'Yuji Ikeda'
+
+PROPERTIES = ('displacement', 'sad', 'volume')
+
+
+def calculate_origins(scaled_positions, scaled_positions_ideal):
+    """Calculate the rigid shifts of all the atoms from the ideal positions.
+
+    Parameters
+    ----------
+    scaled_positions: (..., natoms, 3) array
+    scaled_positions_ideal: (..., natoms, 3) array
+
+    Returns
+    -------
+    origins: (..., 3) array
+    """
+    diff = scaled_positions - scaled_positions_ideal
+    diff -= np.rint(diff)
+    return np.average(diff, axis=-2)
+
+
+def calculate_displacements(cells, scaled_positions, scaled_positions_ideal):
+    """Calculate displacement vectors from the ideal positions.
+
+    The rigid shift of all the atoms is removed for each structure.
+
+    Parameters
+    ----------
+    cells: (T, 3, 3) array
+    scaled_positions: (T, natoms, 3) array
+    scaled_positions_ideal: (natoms, 3) or (T, natoms, 3) array
+
+    Returns
+    -------
+    vectors: (T, natoms, 3) array
+        Displacement vectors in Cartesian coordinates.
+    """
+    origins = calculate_origins(scaled_positions, scaled_positions_ideal)
+    diff = scaled_positions - (scaled_positions_ideal + origins[:, None, :])
+    diff -= np.rint(diff)
+    return np.einsum('tij,tjk->tik', diff, cells)
+
+
+def calculate_atomic_volumes(method, atoms):
+    volume = VolumeFactory().create(method, atoms)
+    volume.generate_atomic_volume()
+    return volume.get_data()['volume'].values
+
+
+class AtomicProperties(object):
+    def __init__(self,
+                 atoms_list,
+                 atoms_ideal_list=None,
+                 volume_method='voronoi',
+                 max_workers=1,
+                 max_elements=2 ** 22):
+        """
+
+        Parameters
+        ----------
+        atoms_list: List of Atoms
+        atoms_ideal_list: List of Atoms, optional
+            Ideal structures for displacements and SAD.
+        volume_method: 'mesh' or 'voronoi'
+        max_workers: Integer or None
+            Number of processes for atomic volumes. None uses the number of
+            the processors, and 1 runs serially without processes.
+        max_elements: Integer
+            Maximum number of the elements of the stacked positions.
+        """
+        self._atoms_list = atoms_list
+        self._atoms_ideal_list = atoms_ideal_list
+        self._volume_method = volume_method
+        self._max_workers = max_workers
+        self._max_elements = max_elements
+        self._initialize_data()
+
+    def _initialize_data(self):
+        atoms_list = self._atoms_list
+        natoms = np.array([len(a.get_chemical_symbols()) for a in atoms_list])
+        self._natoms = natoms
+        self._offsets = np.concatenate(([0], np.cumsum(natoms)))
+
+        data = pd.DataFrame()
+        data['index'] = np.concatenate([np.arange(n) for n in natoms])
+        data['symbol'] = np.concatenate(
+            [a.get_chemical_symbols() for a in atoms_list])
+        data['atom'] = ''
+        data['structure'] = np.repeat(np.arange(len(atoms_list)), natoms)
+        self._data = data
+
+    def run(self, properties=PROPERTIES):
+        """Calculate properties.
+
+        Parameters
+        ----------
+        properties: List of 'displacement', 'sad', and 'volume'
+        """
+        for p in properties:
+            if p not in PROPERTIES:
+                print("ERROR: {}".format(__name__))
+                print("Unknown property: {}".format(p))
+                raise ValueError
+
+        if 'displacement' in properties or 'sad' in properties:
+            sad = self._calculate_sad()
+            if 'displacement' in properties:
+                self._data['displacement'] = np.sqrt(sad)
+            if 'sad' in properties:
+                self._data['sad'] = sad
+
+        if 'volume' in properties:
+            self._data['volume'] = self._calculate_volumes()
+        return self
+
+    def _calculate_sad(self):
+        if self._atoms_ideal_list is None:
+            print("ERROR: {}".format(__name__))
+            print("Ideal structures are required.")
+            raise ValueError
+
+        atoms_list = self._atoms_list
+        atoms_ideal_list = self._atoms_ideal_list
+        offsets = self._offsets
+        sad = np.zeros(offsets[-1])
+        # Structures with the same number of atoms are stacked.
+        for n in np.unique(self._natoms):
+            indices = np.flatnonzero(self._natoms == n)
+            chunk_size = max(1, self._max_elements // (n * 3))
+            for i0 in range(0, len(indices), chunk_size):
+                chunk = indices[i0:i0 + chunk_size]
+                vectors = calculate_displacements(
+                    np.array([atoms_list[i].get_cell() for i in chunk]),
+                    np.array([atoms_list[i].get_scaled_positions()
+                              for i in chunk]),
+                    np.array([atoms_ideal_list[i].get_scaled_positions()
+                              for i in chunk]))
+                values = np.einsum('tik,tik->ti', vectors, vectors)
+                for i, v in zip(chunk, values):
+                    sad[offsets[i]:offsets[i + 1]] = v
+        return sad
+
+    def _calculate_volumes(self):
+        methods = [self._volume_method] * len(self._atoms_list)
+        if self._max_workers == 1:
+            volumes = list(
+                map(calculate_atomic_volumes, methods, self._atoms_list))
+        else:
+            with ProcessPoolExecutor(max_workers=self._max_workers) as executor:
+                volumes = list(executor.map(
+                    calculate_atomic_volumes, methods, self._atoms_list))
+        return np.concatenate(volumes)
+
+    def get_properties(self):
+        return [p for p in PROPERTIES if p in self._data.columns]
+
+    def create_data_stat(self, keys, sort=False, statistics=STATISTICS):
+        return create_data_stat(
+            self._data, keys, self.get_properties(), sort, statistics)
+
+    def write(self, filename, sort=False, statistics=STATISTICS):
+        with open(filename, 'w') as f:
+            write_atomic_report(
+                f, self._data, self.get_properties(), sort, statistics)
+
+    def write_data(self, filename):
+        """Write the per-atom data in the CSV or the Parquet format."""
+        write_data(self._data, filename)
+
+    def get_data(self):
+        return self._data
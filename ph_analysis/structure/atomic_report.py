@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tables of per-atom properties and their statistics.
+
+The rows are formatted by chunks with the %-operator instead of
+"DataFrame.iterrows", and the statistics are computed by the built-in
+aggregations of pandas.
+"""
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import os
+import numpy as np
+import pandas as pd
+
+__author__ = 'Yuji Ikeda'
+
+STATISTICS = (
+    'sum',
+    'avg.',
+    's.d.',
+    'abs._sum',
+    'abs._avg.',
+    'abs._s.d.',
+)
+
+
+def create_atomic_data(symbols):
+    """Create the DataFrame with the columns 'index', 'symbol' and 'atom'.
+
+    'atom' is the same for all the atoms to group all of them.
+    """
+    data = pd.DataFrame()
+    data['symbol'] = symbols
+    data['atom'] = ''
+    data = data.reset_index()  # data['index'] is created
+    return data
+
+
+def create_data_stat(data, keys, properties, sort=False, statistics=STATISTICS):
+    """Calculate statistics of properties for groups.
+
+    Parameters
+    ----------
+    data: pandas.DataFrame
+    keys: String or list of strings
+        Columns to group the rows.
+    properties: List of strings
+    sort: Bool
+        If False, the groups are in the order of their first appearance.
+    statistics: List of strings
+        Names of the statistics from 'sum', 'avg.', 'sqrt_avg.', 's.d.',
+        'abs._sum', 'abs._avg.', and 'abs._s.d.'.
+        Standard deviations are for ddof=0.
+
+    Returns
+    -------
+    data_stat: pandas.DataFrame
+        Columns are (property, statistic) in the given orders.
+    """
+    groupby = data.groupby(keys, sort=sort)[properties]
+    data_abs = data.assign(**{p: data[p].abs() for p in properties})
+    groupby_abs = data_abs.groupby(keys, sort=sort)[properties]
+
+    functions = {
+        'sum': lambda: groupby.sum(),
+        'avg.': lambda: groupby.mean(),
+        'sqrt_avg.': lambda: np.sqrt(groupby.mean()),
+        's.d.': lambda: groupby.std(ddof=0),
+        'abs._sum': lambda: groupby_abs.sum(),
+        'abs._avg.': lambda: groupby_abs.mean(),
+        'abs._s.d.': lambda: groupby_abs.std(ddof=0),
+    }
+    data_stat = pd.concat(
+        [functions[s]() for s in statistics], axis=1, keys=statistics)
+    return data_stat.swaplevel(axis=1)[properties]
+
+
+def write_rows(f, line_format, columns, chunk_size=2 ** 14):
+    """Write rows formatted with the %-operator by chunks.
+
+    Parameters
+    ----------
+    f: File object
+    line_format: String
+        Format of one line including the newline, e.g. '%5d %18.12f\\n'.
+    columns: List of arrays
+        Values for the fields of "line_format".
+    """
+    nrows = len(columns[0]) if columns else 0
+    for i0 in range(0, nrows, chunk_size):
+        i1 = min(i0 + chunk_size, nrows)
+        values = np.empty((i1 - i0, len(columns)), dtype=object)
+        for j, column in enumerate(columns):
+            values[:, j] = np.asarray(column[i0:i1]).tolist()
+        f.write((line_format * (i1 - i0)) % tuple(values.ravel().tolist()))
+
+
+def write_data_stat(f, data_stat, line_format, get_key_columns):
+    """Write statistics as the rows of (statistic, keys, value).
+
+    Parameters
+    ----------
+    data_stat: pandas.DataFrame
+        Given by "create_data_stat".
+    line_format: String
+        Format of one line with the fields of the statistic, the key
+        columns, and the value.
+    get_key_columns: Function
+        Returns the list of the key columns from the group index.
+        Each group is followed by an empty line.
+    """
+    names = [k[1] for k in data_stat.columns]
+    nstats = len(names)
+    values = data_stat.values
+    key_columns = get_key_columns(data_stat.index)
+    for i in range(len(data_stat)):
+        columns = [names]
+        columns += [[c[i]] * nstats for c in key_columns]
+        columns.append(values[i])
+        write_rows(f, line_format, columns)
+        f.write('\n')
+
+
+def _empty(index):
+    return [''] * len(index)
+
+
+def write_atomic_report(f, data, properties, sort=False, statistics=STATISTICS):
+    """Write per-atom properties of structures and their statistics.
+
+    Parameters
+    ----------
+    f: File object
+    data: pandas.DataFrame
+        Columns 'structure', 'index', 'symbol', 'atom' and "properties".
+    properties: List of strings
+    """
+    headers = ['', 'str.', 'index', 'symb.'] + list(properties)
+    f.write(('{:<10s} {:<5s} {:<5s} {:<5s}' +
+             ' {:<18s}' * len(properties)).format(*headers))
+    f.write('\n')
+    write_rows(
+        f,
+        'atom      ' + ' %5d %5d %-5s' + ' %18.12f' * len(properties) + '\n',
+        [data['structure'].values, data['index'].values, data['symbol'].values]
+        + [data[p].values for p in properties])
+    f.write('\n')
+
+    for p in properties:
+        if len(properties) > 1:
+            f.write('# {}\n'.format(p))
+        _write_statistics(f, data, [p], sort, statistics)
+
+
+def _write_statistics(f, data, properties, sort, statistics):
+    line_format = '%-10s %5s %5s %-5s %18.12f\n'
+    line_format_int = '%-10s %5d %5s %-5s %18.12f\n'
+
+    # Statistics for all atoms
+    data_stat = create_data_stat(data, 'atom', properties, sort, statistics)
+    write_data_stat(f, data_stat, line_format,
+                    lambda index: [_empty(index), _empty(index), index])
+
+    # Statistics for each symbol
+    data_stat = create_data_stat(data, 'symbol', properties, sort, statistics)
+    write_data_stat(f, data_stat, line_format,
+                    lambda index: [_empty(index), _empty(index), index])
+
+    # Statistics for each structure
+    data_stat = create_data_stat(
+        data, ['structure'], properties, sort, statistics)
+    write_data_stat(f, data_stat, line_format_int,
+                    lambda index: [index, _empty(index), _empty(index)])
+
+    # Statistics for each symbol in each structure
+    data_stat = create_data_stat(
+        data, ['structure', 'symbol'], properties, sort, statistics)
+    write_data_stat(
+        f, data_stat, line_format_int,
+        lambda index: [index.get_level_values(0), _empty(index),
+                       index.get_level_values(1)])
+
+
+def write_data(data, filename):
+    """Write the DataFrame for other tools.
+
+    The format is judged from the extension; ".csv" or ".parquet".
+    Parquet requires pyarrow or fastparquet.
+    """
+    extension = os.path.splitext(filename)[1]
+    if extension == '.csv':
+        data.to_csv(filename, index=False)
+    elif extension == '.parquet':
+        data.to_parquet(filename, index=False)
+    else:
+        print("ERROR: {}".format(__name__))
+        print("Unknown extension: {}".format(extension))
+        raise ValueError
@@ -4,6 +4,7 @@ from __future__ import absolute_import, division, print_function
 
 __author__ = "Yuji Ikeda"
 
+import copy
 import numpy as np
 
 
@@ -15,48 +16,100 @@ class ConfigurationRandomizer(object):
         ----------
         atoms : Atoms object.
         map_s2s : dictionary.
+        random_seed : None, Integer, np.random.SeedSequence, or
+            np.random.Generator.
+            Given to "np.random.default_rng". The global random state of
+            NumPy is not used.
         """
         self._atoms = atoms
         self._map_s2s = map_s2s
-        if random_seed is not None:
-            self.set_random_seed(random_seed)
+        self.set_random_seed(random_seed)
+        self._create_replacements()
 
     def set_random_seed(self, random_seed):
-        np.random.seed(random_seed)
+        self._rng = np.random.default_rng(random_seed)
 
-    def create_randomized_configuration(self):
+    def _create_replacements(self):
+        """Create the species to be distributed over the replaced atoms.
+
+        symbol_types: The symbols of the original and the new atoms.
+        species_orig: (natoms) integer array
+            Indices of symbol_types for the original atoms.
+        replacements: List of (indices_replaced, species_new)
+            species_new are the species to be permuted over
+            indices_replaced.
+        """
         symbols_orig = self._atoms.get_chemical_symbols()
-        symbols_randomized = symbols_orig[:]
+        symbol_types = sorted(set(symbols_orig), key=symbols_orig.index)
+        for dict_symbols_new in self._map_s2s.values():
+            for symbol_new in dict_symbols_new:
+                if symbol_new not in symbol_types:
+                    symbol_types.append(symbol_new)
+
+        species_orig = np.array([symbol_types.index(s) for s in symbols_orig])
+
+        replacements = []
         for symbol_replaced, dict_symbols_new in self._map_s2s.items():
-            indices_replaced = [
-                i for i, _ in enumerate(symbols_orig) if _ == symbol_replaced
-            ]
+            indices_replaced = np.flatnonzero(
+                species_orig == symbol_types.index(symbol_replaced))
             natoms_replaced = len(indices_replaced)
 
-            indices_replaced = np.random.permutation(indices_replaced)
-
             sum_ratio = float(sum([_ for _ in dict_symbols_new.values()]))
-            i_s = 0
+            species_new = []
             for symbol_new, ratio in dict_symbols_new.items():
-                i_f = i_s + int(round(natoms_replaced * ratio / sum_ratio))
-                for index in indices_replaced[i_s:i_f]:
-                    symbols_randomized[index] = symbol_new
-                i_s += i_f
+                n = int(round(natoms_replaced * ratio / sum_ratio))
+                species_new += [symbol_types.index(symbol_new)] * n
 
-            if i_f != natoms_replaced:
+            if len(species_new) != natoms_replaced:
                 print("ERROR: The number of the replaced atoms is not equal "
                       "to that of the atoms which should be replaced.")
-                print(i_f, natoms_replaced)
+                print(len(species_new), natoms_replaced)
                 print("One should change the values of the \"map_s2s\"")
                 raise ValueError
 
-        print("symbols_randomized:")
-        print(symbols_randomized)
+            replacements.append((indices_replaced, np.array(species_new)))
+
+        self._symbol_types = symbol_types
+        self._species_orig = species_orig
+        self._replacements = replacements
+
+    def get_symbol_types(self):
+        return self._symbol_types
+
+    def create_species(self, nconfigurations=1):
+        """Create randomized configurations as species.
+
+        Returns
+        -------
+        species : (nconfigurations, natoms) integer array
+            Indices of "get_symbol_types()" for the atoms.
+        """
+        species = np.tile(self._species_orig, (nconfigurations, 1))
+        for indices_replaced, species_new in self._replacements:
+            species[:, indices_replaced] = self._rng.permuted(
+                np.tile(species_new, (nconfigurations, 1)), axis=1)
+        return species
+
+    def create_atoms(self, species, is_copied=True):
+        """Create the Atoms object for the species of one configuration.
+
+        Parameters
+        ----------
+        species : (natoms) integer array
+        is_copied : Bool
+            If False, the chemical symbols of the original Atoms object are
+            overwritten and the object is returned without being copied.
+        """
+        if is_copied:
+            atoms = copy.deepcopy(self._atoms)
+        else:
+            atoms = self._atoms
+        symbols = [self._symbol_types[i] for i in species]
+        atoms.set_chemical_symbols(symbols)
+        return atoms
 
-        import copy
-        atoms_new = copy.deepcopy(self._atoms)
-        atoms_new.set_chemical_symbols(symbols_randomized)
-        return atoms_new
+    def create_randomized_configuration(self, is_copied=True):
+        return self.create_atoms(self.create_species()[0], is_copied)
 
 
 def create_randomized_configurations(mapfile,
@@ -90,8 +143,11 @@ def create_randomized_configurations(mapfile,
         random_seed=random_seed,
     )
 
-    for i in range(numconf):
-        atoms = configuration_randomizer.create_randomized_configuration()
+    # All the configurations are created at once, and the Atoms object is
+    # reused for writing them.
+    species_all = configuration_randomizer.create_species(numconf)
+    for i, species in enumerate(species_all):
+        atoms = configuration_randomizer.create_atoms(species, is_copied=False)
         filename = "RPOSCAR-{}".format(i + 1)
         poscar = Poscar().set_atoms(atoms)
         if is_sorted:
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Neighbor lists and distances under periodic boundary conditions."""
+from __future__ import absolute_import, division, print_function
+import itertools
+import numpy as np
+from scipy.spatial import cKDTree
+
+__author__ = 'Yuji Ikeda'
+
+
+class NeighborList(object):
+    def __init__(self, cell, scaled_positions, cutoff):
+        """Neighbors within a cutoff radius in the CSR format.
+
+        The neighbors of the atom i are
+            indices[indptr[i]:indptr[i + 1]]
+        sorted by the distances. The vector from i to its neighbor j is
+            np.dot(scaled_positions[j] + shift - scaled_positions[i], cell)
+        where shift is the lattice translation in "shifts".
+        Periodic images of the atom i itself are included, while the atom i
+        itself is not.
+
+        Parameters
+        ----------
+        cell: (3, 3) array
+            Row vectors are lattice vectors.
+        scaled_positions: (natoms, 3) array
+        cutoff: Float
+            Pairs with distances not larger than this are included.
+        """
+        self._cell = np.array(cell, dtype=float)
+        self._scaled_positions = np.array(scaled_positions, dtype=float)
+        self._cutoff = cutoff
+        self._run()
+
+    def _run(self):
+        cell = self._cell
+        cutoff = self._cutoff
+        natoms = len(self._scaled_positions)
+
+        positions, lattice_points = wrap_scaled_positions(
+            self._scaled_positions)
+        images, images_atoms, images_shifts = create_periodic_images(
+            cell, positions, cutoff)
+
+        tree = cKDTree(np.dot(positions, cell))
+        tree_images = cKDTree(np.dot(images, cell))
+        pairs = tree.sparse_distance_matrix(
+            tree_images, cutoff, output_type='ndarray')
+
+        i_s = pairs['i']
+        js = images_atoms[pairs['j']]
+        shifts = images_shifts[pairs['j']]
+        distances = pairs['v']
+
+        is_self = (i_s == js) & np.all(shifts == 0, axis=1)
+        i_s = i_s[~is_self]
+        js = js[~is_self]
+        shifts = shifts[~is_self]
+        distances = distances[~is_self]
+
+        # Sorted by i, then by the distances.
+        order = np.lexsort((js, distances, i_s))
+        i_s = i_s[order]
+        self._indices = js[order]
+        self._distances = distances[order]
+        # Shifts for the original (not wrapped) scaled positions.
+        self._shifts = (
+            shifts[order] - lattice_points[self._indices] + lattice_points[i_s]
+        ).astype(int)
+        self._indptr = np.searchsorted(i_s, np.arange(natoms + 1))
+
+    def get_indptr(self):
+        return self._indptr
+
+    def get_indices(self):
+        return self._indices
+
+    def get_distances(self):
+        return self._distances
+
+    def get_shifts(self):
+        return self._shifts
+
+    def get_neighbors(self, i):
+        """Get indices, distances, and shifts of the neighbors of the atom i.
+        """
+        k0, k1 = self._indptr[i], self._indptr[i + 1]
+        return (
+            self._indices[k0:k1], self._distances[k0:k1], self._shifts[k0:k1])
+
+    def get_number_of_neighbors(self):
+        return np.diff(self._indptr)
+
+
+def wrap_scaled_positions(scaled_positions):
+    """Wrap scaled positions into [0, 1).
+
+    Returns
+    -------
+    positions: (natoms, 3) array
+    lattice_points: (natoms, 3) array
+        scaled_positions = positions + lattice_points
+    """
+    lattice_points = np.floor(scaled_positions)
+    positions = scaled_positions - lattice_points
+    # "positions" can be 1.0 by rounding errors.
+    lattice_points[positions >= 1.0] += 1.0
+    positions[positions >= 1.0] -= 1.0
+    return positions, lattice_points
+
+
+def create_periodic_images(cell, positions, cutoff):
+    """Create periodic images within the cutoff from the unit cell.
+
+    Parameters
+    ----------
+    cell: (3, 3) array
+    positions: (natoms, 3) array
+        Scaled positions wrapped into [0, 1).
+    cutoff: Float
+
+    Returns
+    -------
+    images: (nimages, 3) array
+        Scaled positions of the images including the original atoms.
+    images_atoms: (nimages) integer array
+        Indices of the original atoms.
+    images_shifts: (nimages, 3) integer array
+        Lattice translations from the original atoms.
+    """
+    margins = cutoff / get_interplanar_spacings(cell)
+    nmax = np.ceil(margins).astype(int)
+    images = []
+    images_atoms = []
+    images_shifts = []
+    for shift in itertools.product(*[range(-n, n + 1) for n in nmax]):
+        tmp = positions + shift
+        is_within = np.all((tmp >= -margins) & (tmp < 1.0 + margins), axis=1)
+        images.append(tmp[is_within])
+        images_atoms.append(np.flatnonzero(is_within))
+        images_shifts.append(np.tile(shift, (np.sum(is_within), 1)))
+    return (
+        np.concatenate(images),
+        np.concatenate(images_atoms),
+        np.concatenate(images_shifts),
+    )
+
+
+def get_interplanar_spacings(cell):
+    """Get distances between lattice planes parallel to pairs of vectors.
+
+    The i-th spacing is for the plane spanned by the other two vectors.
+    """
+    cell = np.asarray(cell, dtype=float)
+    volume = abs(np.linalg.det(cell))
+    areas = np.linalg.norm(
+        [np.cross(cell[1], cell[2]),
+         np.cross(cell[2], cell[0]),
+         np.cross(cell[0], cell[1])], axis=1)
+    return volume / areas
+
+
+def get_minimum_image_vectors(cell, scaled_differences):
+    """Get the shortest periodic images of difference vectors.
+
+    Parameters
+    ----------
+    cell: (3, 3) array
+    scaled_differences: (..., 3) array
+
+    Returns
+    -------
+    distances: (...) array
+    scaled_differences_minimum: (..., 3) array
+        For ties, the first one in the order of
+        itertools.product([-1, 0, 1], repeat=3) is taken.
+    """
+    cell = np.asarray(cell, dtype=float)
+    diffs = np.array(scaled_differences, dtype=float)
+    diffs -= np.rint(diffs)
+
+    additions = np.array(list(itertools.product(range(-1, 2), repeat=3)))
+    vectors = np.dot(diffs, cell)
+    distances_square = np.full(diffs.shape[:-1], np.inf)
+    indices = np.zeros(diffs.shape[:-1], dtype=int)
+    for k, translation in enumerate(np.dot(additions, cell)):
+        tmp = vectors + translation
+        tmp = np.einsum('...i,...i->...', tmp, tmp)
+        is_shorter = tmp < distances_square
+        np.copyto(distances_square, tmp, where=is_shorter)
+        np.copyto(indices, k, where=is_shorter)
+    return np.sqrt(distances_square), diffs + additions[indices]
+
+
+def get_distances_from_positions(cell,
+                                 scaled_positions,
+                                 positions_checked,
+                                 max_elements=2 ** 22):
+    """Get the minimum-image distances from query points to all the atoms.
+
+    Parameters
+    ----------
+    cell: (3, 3) array
+    scaled_positions: (natoms, 3) array
+    positions_checked: (npositions, 3) array
+        Scaled positions from which the distances are measured.
+
+    Returns
+    -------
+    distances: (npositions, natoms) array
+    scaled_distances: (npositions, natoms, 3) array
+        scaled_distances[k, j] is the scaled vector from the k-th query
+        point to the atom j.
+    """
+    scaled_positions = np.asarray(scaled_positions, dtype=float)
+    positions_checked = np.asarray(positions_checked, dtype=float)
+    natoms = len(scaled_positions)
+    npositions = len(positions_checked)
+    distances = np.zeros((npositions, natoms))
+    scaled_distances = np.zeros((npositions, natoms, 3))
+    chunk_size = max(1, max_elements // max(1, natoms * 3))
+    for i0 in range(0, npositions, chunk_size):
+        i1 = min(i0 + chunk_size, npositions)
+        diffs = scaled_positions[None, :, :] - positions_checked[i0:i1, None, :]
+        distances[i0:i1], scaled_distances[i0:i1] = (
+            get_minimum_image_vectors(cell, diffs))
+    return distances, scaled_distances
+
+
+def get_distance_matrix(cell, scaled_positions, max_elements=2 ** 22):
+    """Get the distance matrix with the minimum image convention.
+
+    This is a dense fallback for small cells. The memory usage is O(N^2).
+
+    Returns
+    -------
+    distance_matrix: (natoms, natoms) array
+    scaled_distances: (natoms, natoms, 3) array
+        scaled_distances[i, j] is the scaled vector from i to j.
+    """
+    return get_distances_from_positions(
+        cell, scaled_positions, scaled_positions, max_elements)
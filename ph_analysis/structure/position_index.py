@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, division, print_function
+import itertools
+import numpy as np
+
+__author__ = 'Yuji Ikeda'
+
+
+class PositionIndex(object):
+    """Index of scaled positions to find atoms at given positions.
+
+    The unit cell is divided into a grid whose bins are not smaller than
+    2 * symprec. Each atom is registered by the integer key of its bin, and
+    a query checks only the atoms in the bins within symprec from the query
+    position. All the queries are answered at once with "np.searchsorted".
+    """
+    def __init__(self, scaled_positions, symprec=1e-5):
+        self._scaled_positions = np.array(scaled_positions, dtype=float)
+        self._symprec = symprec
+
+        # The bins must be not smaller than 2 * symprec so that all the atoms
+        # within symprec are in the same or the neighboring bins.
+        # The upper limit keeps the keys within int64.
+        self._ngrid = int(min(max(np.floor(0.5 / symprec), 1), 2 ** 20))
+
+        keys = self._create_keys(self._get_bins(self._scaled_positions))
+        self._order = np.argsort(keys, kind='mergesort')
+        self._keys_sorted = keys[self._order]
+
+    def _get_bins(self, positions):
+        ngrid = self._ngrid
+        bins = np.floor((positions - np.floor(positions)) * ngrid)
+        # "positions - np.floor(positions)" can be 1.0 by rounding errors.
+        return bins.astype(np.int64) % ngrid
+
+    def _create_keys(self, bins):
+        ngrid = self._ngrid
+        return (bins[..., 0] * ngrid + bins[..., 1]) * ngrid + bins[..., 2]
+
+    def get_indices(self, positions):
+        """Get indices of the atoms at the given scaled positions.
+
+        Parameters
+        ----------
+        positions: (..., 3) array
+            Scaled positions. Lattice translations are ignored.
+
+        Returns
+        -------
+        indices: (...) integer array
+            Indices of the atoms whose distances along all the axes are
+            smaller than symprec. If several atoms are found, the smallest
+            index is given. -1 if no atom is found.
+        """
+        positions = np.asarray(positions, dtype=float)
+        shape = positions.shape[:-1]
+        positions = positions.reshape(-1, 3)
+
+        ngrid = self._ngrid
+        order = self._order
+        keys_sorted = self._keys_sorted
+        natoms = len(order)
+
+        indices = np.full(len(positions), natoms, dtype=int)
+        # Only the bins overlapping with the box of +-symprec around each
+        # query are checked. Since the bins are not smaller than 2 * symprec,
+        # there are at most two bins along each axis, and usually one.
+        bins_lower = self._get_bins(positions - self._symprec)
+        bins_upper = self._get_bins(positions + self._symprec)
+        nbins = (bins_upper - bins_lower) % ngrid + 1
+        for offset in itertools.product([0, 1], repeat=3):
+            iqs = np.nonzero(np.all(np.array(offset) < nbins, axis=1))[0]
+            if len(iqs) == 0:
+                continue
+            keys = self._create_keys((bins_lower[iqs] + offset) % ngrid)
+            starts = np.searchsorted(keys_sorted, keys, side='left')
+            ends = np.searchsorted(keys_sorted, keys, side='right')
+            # Usually each bin has at most one atom.
+            k = 0
+            while True:
+                tmp = np.nonzero(starts + k < ends)[0]
+                if len(tmp) == 0:
+                    break
+                iq = iqs[tmp]
+                candidates = order[starts[tmp] + k]
+                diff = self._scaled_positions[candidates] - positions[iq]
+                diff -= np.rint(diff)
+                is_found = np.all(np.abs(diff) < self._symprec, axis=1)
+                iq = iq[is_found]
+                indices[iq] = np.minimum(indices[iq], candidates[is_found])
+                k += 1
+
+        indices[indices == natoms] = -1
+        return indices.reshape(shape)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Partial radial distribution functions.
+
+The partial RDF between the chemical symbols a and b is defined as
+
+    g_ab(r) = V / (N_a N_b) sum_{i in a} sum_{j in b} delta(r - r_ij)
+              / (4 pi r^2),
+
+where the sum runs over all the periodic images within the cutoff except
+for i == j without translation. The total RDF is sum_ab c_a c_b g_ab(r)
+with the concentrations c_a = N_a / N.
+"""
+from __future__ import absolute_import, division, print_function
+import warnings
+import numpy as np
+from .neighbor_list import NeighborList
+
+__author__ = 'Yuji Ikeda'
+
+
+def create_bins(rmax, dr):
+    """Create the bin edges and the centers from 0 to rmax."""
+    nbins = int(np.ceil(rmax / dr - 1e-9))
+    edges = np.arange(nbins + 1) * dr
+    return edges, 0.5 * (edges[1:] + edges[:-1])
+
+
+def smear_gaussian(values, dr, sigma, axis=-1):
+    """Convolve values on the equidistant grid with a Gaussian by FFT."""
+    from scipy.signal import fftconvolve
+
+    n = int(np.ceil(5.0 * sigma / dr))
+    xs = np.arange(-n, n + 1) * dr
+    kernel = np.exp(-0.5 * (xs / sigma) ** 2) / (np.sqrt(2.0 * np.pi) * sigma)
+    kernel *= dr
+    shape = [1] * np.ndim(values)
+    shape[axis] = len(kernel)
+    return fftconvolve(values, kernel.reshape(shape), mode='same', axes=axis)
+
+
+def calculate_partial_rdfs(cell,
+                           scaled_positions,
+                           symbols,
+                           rmax,
+                           dr=0.01,
+                           sigma=None,
+                           symbol_types=None):
+    """Calculate partial RDFs g_ab(r) for one structure.
+
+    Parameters
+    ----------
+    cell: (3, 3) array
+    scaled_positions: (natoms, 3) array
+    symbols: List of chemical symbols
+    rmax: Float
+        Maximum distance.
+    dr: Float
+        Width of the bins.
+    sigma: Float or None
+        Standard deviation of the Gaussian smearing. If None, the histogram
+        is returned.
+    symbol_types: List of chemical symbols or None
+        Order of the chemical symbols of "rdfs".
+
+    Returns
+    -------
+    rs: (nbins) array
+        Centers of the bins.
+    rdfs: (nsymbols, nsymbols, nbins) array
+        rdfs[a, b] is g_ab(r). np.nan for the symbols missing in the
+        structure.
+    symbol_types: List of chemical symbols
+    """
+    if symbol_types is None:
+        symbol_types = sorted(set(symbols), key=symbols.index)
+    nsymbols = len(symbol_types)
+    symbol_numbers = np.array([symbol_types.index(s) for s in symbols])
+
+    edges, rs = create_bins(rmax, dr)
+    nbins = len(rs)
+
+    # The Gaussian tails beyond rmax contribute to the bins below rmax.
+    cutoff = rmax if sigma is None else rmax + 5.0 * sigma
+    nbins_extended = int(np.ceil(cutoff / dr - 1e-9))
+
+    neighbor_list = NeighborList(cell, scaled_positions, cutoff)
+    natoms = len(symbols)
+    i_s = np.repeat(np.arange(natoms), neighbor_list.get_number_of_neighbors())
+    js = neighbor_list.get_indices()
+    distances = neighbor_list.get_distances()
+
+    bins = np.minimum((distances / dr).astype(int), nbins_extended - 1)
+    codes = symbol_numbers[i_s] * nsymbols + symbol_numbers[js]
+    weights = 1.0 / (4.0 * np.pi * distances ** 2 * dr)
+    histograms = np.bincount(
+        codes * nbins_extended + bins,
+        weights=weights,
+        minlength=nsymbols * nsymbols * nbins_extended,
+    ).reshape(nsymbols, nsymbols, nbins_extended)
+
+    if sigma is not None:
+        histograms = smear_gaussian(histograms, dr, sigma)
+    histograms = histograms[..., :nbins]
+
+    volume = abs(np.linalg.det(cell))
+    counts = np.bincount(symbol_numbers, minlength=nsymbols).astype(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        normalization = volume / (counts[:, None] * counts[None, :])
+    normalization[~np.isfinite(normalization)] = np.nan
+    rdfs = histograms * normalization[..., None]
+
+    return rs, rdfs, symbol_types
+
+
+def calculate_partial_rdfs_batch(atoms_list,
+                                 rmax,
+                                 dr=0.01,
+                                 sigma=None,
+                                 symbol_types=None,
+                                 is_averaged=True):
+    """Calculate partial RDFs for many structures.
+
+    Parameters
+    ----------
+    atoms_list: List of Atoms objects
+        E.g., snapshots of MD or SQS candidates.
+    is_averaged: Bool
+        If True, the RDFs averaged over the structures are returned.
+        Symbols missing in some structures are ignored for the averages.
+
+    Returns
+    -------
+    rs: (nbins) array
+    rdfs: (nsymbols, nsymbols, nbins) or
+        (nstructures, nsymbols, nsymbols, nbins) array
+    symbol_types: List of chemical symbols
+    """
+    if symbol_types is None:
+        symbol_types = []
+        for atoms in atoms_list:
+            for s in atoms.get_chemical_symbols():
+                if s not in symbol_types:
+                    symbol_types.append(s)
+
+    rdfs_all = []
+    for atoms in atoms_list:
+        rs, rdfs, _ = calculate_partial_rdfs(
+            atoms.get_cell(),
+            atoms.get_scaled_positions(),
+            atoms.get_chemical_symbols(),
+            rmax,
+            dr=dr,
+            sigma=sigma,
+            symbol_types=symbol_types)
+        rdfs_all.append(rdfs)
+    rdfs_all = np.array(rdfs_all)
+
+    if is_averaged:
+        with warnings.catch_warnings():
+            # For symbol pairs missing in all the structures.
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            rdfs_all = np.nanmean(rdfs_all, axis=0)
+    return rs, rdfs_all, symbol_types
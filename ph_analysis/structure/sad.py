@@ -3,34 +3,26 @@
 from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
 import numpy as np
-import pandas as pd
+from .atomic_properties import calculate_displacements
+from .atomic_report import create_atomic_data
+from .atomic_report import create_data_stat as _create_data_stat
 
 __author__ = 'Yuji Ikeda'
 __version__ = '0.1.0'
 
-
-def create_statistical_functions():
-    return [
-        ('sum', np.sum),
-        ('avg.', np.average),
-        ('sqrt_avg.', lambda x: np.sqrt(np.average(x))),
-        ('s.d.', lambda x: np.std(x, ddof=0)),
-        ('abs._sum', lambda x: np.sum(np.abs(x))),
-        ('abs._avg.', lambda x: np.average(np.abs(x))),
-        ('abs._s.d.', lambda x: np.std(np.abs(x), ddof=0)),
-    ]
+STATISTICS_SAD = (
+    'sum',
+    'avg.',
+    'sqrt_avg.',
+    's.d.',
+    'abs._sum',
+    'abs._avg.',
+    'abs._s.d.',
+)
 
 
 def create_data_stat(data, keys, properties):
-    """
-
-    :param data: pandas.DataFrame
-    :param keys: List of strings
-    :param properties: List of strings
-    :return:
-    """
-    functions = create_statistical_functions()
-    return data.groupby(keys, sort=False).agg(functions)[properties]
+    return _create_data_stat(data, keys, properties, statistics=STATISTICS_SAD)
 
 
 class SAD(object):
@@ -40,35 +32,19 @@ class SAD(object):
         self._initialize_data()
 
     def _initialize_data(self):
-        data = pd.DataFrame()
-        data['symbol'] = self._atoms.get_chemical_symbols()
-        data['atom'] = ''
-        data = data.reset_index()  # data['index'] is created
-        self._data = data
+        self._data = create_atomic_data(self._atoms.get_chemical_symbols())
 
     def run(self):
         self.calculate_sad()
         self.write()
 
-    def _calculate_origin(self):
-        positions = self._atoms.get_scaled_positions()
-        positions_ideal = self._atoms_ideal.get_scaled_positions()
-        diff = positions - positions_ideal
-        diff -= np.rint(diff)
-        return np.average(diff, axis=0)
-
     def calculate_sad(self):
         atoms = self._atoms
-        atoms_ideal =self._atoms_ideal
-
-        origin = self._calculate_origin()
-
-        positions = atoms.get_scaled_positions()
-        positions_ideal = atoms_ideal.get_scaled_positions()
-        diff = positions - (positions_ideal + origin)
-        diff -= np.rint(diff)
-        diff = np.dot(diff, atoms.get_cell())  # frac -> A
-        sad = np.sum(diff ** 2, axis=1)
+        vectors = calculate_displacements(
+            [atoms.get_cell()],
+            [atoms.get_scaled_positions()],
+            self._atoms_ideal.get_scaled_positions())[0]
+        sad = np.sum(vectors ** 2, axis=1)
 
         self._data['sad'] = sad
 
@@ -2,11 +2,19 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, print_function
 import sys
-import itertools
+import warnings
 import six
 import numpy as np
+from scipy.spatial import cKDTree
 from phonopy.structure.atoms import Atoms
 from phonopy.structure.symmetry import Symmetry
+from .neighbor_list import (
+    NeighborList,
+    get_distance_matrix,
+    get_distances_from_positions,
+)
+from .position_index import PositionIndex
+from .radial_distribution import calculate_partial_rdfs
 
 __author__ = "Yuji Ikeda"
 
@@ -62,31 +70,44 @@ class StructureAnalyzer(object):
             xmax=3.0,
             xpitch=0.01,
             dim=2):
-        from ph_unfolder.analysis.smearing import Smearing
-
-        self.generate_supercell(dim=dim)
-
-        print("Warning: this method is under development!")
-        # TODO(ikeda): Consider atoms over boundaries
-        atoms = self._atoms
-        cell = atoms.get_cell()
-        natoms = atoms.get_number_of_atoms()
-        density = natoms / np.linalg.det(cell)
-        print("Calculating distance matrix:", end="")
-        self.generate_distance_matrix()
-        print(" Finished.")
-        distance_matrix = self.get_distance_matrix()
-        smearing = Smearing(sigma=sigma, xmin=xmin, xmax=xmax, xpitch=xpitch)
-        xs = smearing.get_xs()
-        rdfs = []
-        for distances in distance_matrix:
-            distances = np.sort(distances)[1:]  # To avoid the same atom
-            weights = 1.0 / (4.0 * np.pi * distances ** 2)
-            rdf = smearing.run(peaks=distances, weights=weights)
-            rdfs.append(rdf)
-        rdfs = np.array(rdfs)
-        rdfs /= density
-        return xs, rdfs
+        """Calculate the total RDF.
+
+        Deprecated. Use "calculate_partial_rdfs" instead, on which this
+        method is now based. The total RDF sum_ab c_a c_b g_ab(r) is the
+        average of the RDFs for each atom returned formerly, and it is
+        returned at the bin centers from "xmin" to "xmax". "dim" is ignored
+        since the periodic images are included in the neighbor list.
+
+        Returns
+        -------
+        xs: (nbins) array
+        rdf: (nbins) array
+        """
+        warnings.warn(
+            '"calculate_radial_distribution_functions" is deprecated. '
+            'Use "calculate_partial_rdfs" instead.',
+            DeprecationWarning)
+        symbols = self._atoms.get_chemical_symbols()
+        rs, rdfs, symbol_types = self.calculate_partial_rdfs(
+            xmax, dr=xpitch, sigma=sigma)
+        concentrations = np.array(
+            [symbols.count(s) for s in symbol_types]) / float(len(symbols))
+        rdf = np.einsum('a,b,abr->r', concentrations, concentrations, rdfs)
+        is_inside = rs >= xmin
+        return rs[is_inside], rdf[is_inside]
+
+    def calculate_partial_rdfs(self, rmax, dr=0.01, sigma=None):
+        """Calculate partial RDFs g_ab(r) between chemical symbols.
+
+        See "calculate_partial_rdfs" in "radial_distribution".
+        """
+        return calculate_partial_rdfs(
+            self._atoms.get_cell(),
+            self._atoms.get_scaled_positions(),
+            self._atoms.get_chemical_symbols(),
+            rmax,
+            dr=dr,
+            sigma=sigma)
 
     def calculate_distances_from_position(self, position_checked):
         """
@@ -94,55 +115,42 @@ class StructureAnalyzer(object):
         Args:
             position: Scaled positions from which the distances are measured.
         """
-        cell = self._atoms.get_cell()
-        scaled_positions = self._atoms.get_scaled_positions()
-        number_of_atoms = self._atoms.get_number_of_atoms()
-
-        expansion = range(-1, 2)
-        distances = np.zeros(number_of_atoms) * np.nan
-        scaled_distances = np.zeros((number_of_atoms, 3)) * np.nan
-        for i2, p2 in enumerate(scaled_positions):
-            distance = np.inf
-            for addition in itertools.product(expansion, repeat=3):
-                scaled_distance_new = p2 - position_checked
-                scaled_distance_new -= np.rint(scaled_distance_new)
-                scaled_distance_new += addition
-                distance_new = np.linalg.norm(
-                    np.dot(cell.T, scaled_distance_new))
-                if distance > distance_new:
-                    distance = distance_new
-                    scaled_distance = scaled_distance_new
-            distances[i2] = distance
-            scaled_distances[i2] = scaled_distance
-        return distances, scaled_distances
+        distances, scaled_distances = self.calculate_distances_from_positions(
+            [position_checked])
+        return distances[0], scaled_distances[0]
+
+    def calculate_distances_from_positions(self, positions_checked):
+        """Calculate distances from many positions at once.
+
+        Parameters
+        ----------
+        positions_checked: (npositions, 3) array
+            Scaled positions from which the distances are measured.
+
+        Returns
+        -------
+        distances: (npositions, natoms) array
+        scaled_distances: (npositions, natoms, 3) array
+            Minimum-image scaled vectors from the positions to the atoms.
+        """
+        return get_distances_from_positions(
+            self._atoms.get_cell(),
+            self._atoms.get_scaled_positions(),
+            positions_checked)
 
     def generate_distance_matrix(self):
-        dm, diffs = self._create_distance_matrix_expanded()
-        self._distance_matrix = dm[..., 0]
-        self._scaled_distances = diffs[..., 0, :]
-        return self
-
-    def _create_distance_matrix_expanded(self):
-        cell = self._atoms.get_cell()
-        scaled_positions = self._atoms.get_scaled_positions()
-
-        expansion = range(-1, 2)
-        additions = list(itertools.product(expansion, repeat=3))
-
-        diffs = scaled_positions[None, :, :] - scaled_positions[:, None, :]
-        diffs -= np.rint(diffs)
-        diffs = diffs[:, :, None, :] + additions
+        """Generate the full distance matrix (minimum image convention).
 
-        dm = np.linalg.norm(np.dot(diffs, cell), axis=-1)
-        indices = np.argsort(dm)
-
-        tmp = np.indices(dm.shape)
-        dm = dm[tmp[0], tmp[1], indices]
-
-        tmp = np.indices(diffs.shape)
-        diffs = diffs[tmp[0], tmp[1], indices[..., None]]
+        The memory usage is O(N^2). For large cells, "get_neighbor_list"
+        should be used instead.
+        """
+        self._distance_matrix, self._scaled_distances = get_distance_matrix(
+            self._atoms.get_cell(), self._atoms.get_scaled_positions())
+        return self
 
-        return dm, diffs
+    def get_neighbor_list(self, cutoff):
+        return NeighborList(
+            self._atoms.get_cell(), self._atoms.get_scaled_positions(), cutoff)
 
     def write_properties(self, precision=16):
         width = precision + 6
@@ -221,15 +229,33 @@ class StructureAnalyzer(object):
         sys.stdout.write("\n")
 
     def get_index_from_position(self, position, symprec=1e-6):
+        index = self.get_indices_from_positions([position], symprec)[0]
+        if index < 0:
+            print("WARNING: {}".format(__name__))
+            print("Index for the specified position cannot be found.")
+            return None
+        return int(index)
+
+    def create_position_index(self, symprec=1e-6):
+        """Create the index to find atoms at given positions repeatedly.
+
+        The index must be recreated after the atoms are modified.
+        """
+        return PositionIndex(self._atoms.get_scaled_positions(), symprec)
 
-        for i, p in enumerate(self._atoms.get_scaled_positions()):
-            diff = position - p
-            diff -= np.rint(diff)
-            if all([abs(x) < symprec for x in diff]):
-                return i
-        print("WARNING: {}".format(__name__))
-        print("Index for the specified position cannot be found.")
-        return None
+    def get_indices_from_positions(self, positions, symprec=1e-6):
+        """Get indices of the atoms at the given scaled positions.
+
+        Parameters
+        ----------
+        positions: (..., 3) array
+
+        Returns
+        -------
+        indices: (...) integer array
+            -1 for the positions where no atom is found.
+        """
+        return self.create_position_index(symprec).get_indices(positions)
 
     def write_distance_matrix(self):
         number_of_atoms = self._atoms.get_number_of_atoms()
@@ -507,15 +533,11 @@ class StructureAnalyzer(object):
 
     def get_mappings_for_symops(self, prec=1e-6):
         """Get mappings for symmetry operations."""
-        natoms = self._atoms.get_number_of_atoms()
-
         dataset = self.get_symmetry_dataset()
         rotations = dataset["rotations"]
         translations = dataset["translations"]
-        nopr = len(rotations)
-        mappings = -1 * np.ones((nopr, natoms), dtype=int)
-        for iopr, (r, t) in enumerate(zip(rotations, translations)):
-            mappings[iopr] = self.extract_mapping_for_symopr(r, t, prec)[0]
+        mappings = self.extract_mappings_for_symops(
+            rotations, translations, prec)[0]
 
         if -1 in mappings:
             print("ERROR: {}".format(__name__))
@@ -524,6 +546,49 @@ class StructureAnalyzer(object):
 
         return mappings
 
+    def extract_mappings_for_symops(self,
+                                    rotations,
+                                    translations,
+                                    prec=1e-6,
+                                    max_points=2 ** 20):
+        """Extract mappings for many symmetry operations at once.
+
+        Args:
+            rotations (nopr x 3 x 3 array): Rotation matrices.
+            translations (nopr x 3 array): Translation vectors.
+            max_points (int): Approximate upper limit of the number of the
+                transformed positions searched at once.
+
+        Returns:
+            mappings (nopr x n integral array):
+                -1 for the atoms which are not mapped.
+            diff_positions (nopr x n x 3 integral array):
+        """
+        chemical_symbols = self._atoms.get_chemical_symbols()
+        scaled_positions = self._atoms.get_scaled_positions()
+        natoms = len(scaled_positions)
+
+        rotations = np.asarray(rotations)
+        translations = np.asarray(translations)
+        nopr = len(rotations)
+
+        mappings = -1 * np.ones((nopr, natoms), dtype=int)
+        diff_positions = np.zeros((nopr, natoms, 3), dtype=int)
+        chunk_size = max(1, max_points // max(1, natoms))
+        for i0 in range(0, nopr, chunk_size):
+            i1 = min(i0 + chunk_size, nopr)
+            transformed_scaled_positions = (
+                np.einsum('kij,nj->kni', rotations[i0:i1], scaled_positions) +
+                translations[i0:i1, None, :])
+            mappings[i0:i1], diff_positions[i0:i1] = find_mappings(
+                chemical_symbols,
+                scaled_positions,
+                chemical_symbols,
+                transformed_scaled_positions,
+                prec)
+
+        return mappings, diff_positions
+
     def extract_transformed_scaled_positions(self, rotation, translation):
         """Extract transformed scaled positions.
 
@@ -572,25 +637,10 @@ class StructureAnalyzer(object):
                 mapping[i] == j means that the i-th atom moves to the position
                 of the j-th atom.
         """
-        natoms = self._atoms.get_number_of_atoms()
         symbols_old = self._atoms.get_chemical_symbols()
         positions_old = self._atoms.get_scaled_positions()
-
-        mapping = -1 * np.ones(natoms, dtype=int)
-        diff_positions = np.zeros((natoms, 3), dtype=int)
-        for iatoms, sp_trn in enumerate(positions_new):
-            for jatoms, sp_orig in enumerate(positions_old):
-                if symbols_new[iatoms] != symbols_old[jatoms]:
-                    continue
-                diff = sp_trn - sp_orig
-                wrapped_dpos = diff - np.rint(diff) 
-
-                if (np.abs(wrapped_dpos) < prec).all():
-                    mapping[iatoms] = jatoms
-                    diff_positions[iatoms] = np.rint(diff).astype(int)
-                    break
-
-        return mapping, diff_positions
+        return find_mappings(
+            symbols_old, positions_old, symbols_new, positions_new, prec)
 
 
 def _get_matrix(matrix):
@@ -749,3 +799,63 @@ def transform_scaled_positions(scaled_positions, rotation, translation):
     transformed_scaled_positions = np.dot(rotation, scaled_positions.T).T
     transformed_scaled_positions += translation
     return transformed_scaled_positions
+
+
+def find_mappings(symbols_old, positions_old, symbols_new, positions_new,
+                  prec=1e-6):
+    """Find the old atoms at the transformed positions.
+
+    A periodic k-d tree is made for each chemical symbol, and all the new
+    positions are searched at once. Two positions are regarded as the same
+    when all the components of their difference (modulo lattice vectors)
+    are smaller than "prec".
+
+    Args:
+        symbols_old (n list): Chemical symbols of the original atoms.
+        positions_old (n x 3 array): Fractional positions of the original
+            atoms.
+        symbols_new (n list): Chemical symbols of the transformed atoms.
+        positions_new (... x n x 3 array): Fractional positions of the
+            transformed atoms. Many sets of the positions can be given.
+
+    Returns:
+        mapping (... x n integral array):
+            mapping[..., i] == j means that the i-th atom moves to the
+            position of the j-th atom. -1 if no atom is found.
+        diff_positions (... x n x 3 integral array):
+            Lattice vectors between the new and the old positions.
+    """
+    symbols_old = np.asarray(symbols_old)
+    symbols_new = np.asarray(symbols_new)
+    positions_old = np.asarray(positions_old, dtype=float)
+    positions_new = np.asarray(positions_new, dtype=float)
+
+    mapping = -1 * np.ones(positions_new.shape[:-1], dtype=int)
+    for symbol in np.unique(symbols_old):
+        indices_old = np.where(symbols_old == symbol)[0]
+        indices_new = np.where(symbols_new == symbol)[0]
+        if len(indices_new) == 0:
+            continue
+        tree = cKDTree(
+            _wrap_into_unit_cell(positions_old[indices_old]), boxsize=1.0)
+        distances, indices = tree.query(
+            _wrap_into_unit_cell(positions_new[..., indices_new, :]),
+            p=np.inf,
+            distance_upper_bound=prec)
+        is_found = indices < len(indices_old)
+        mapping[..., indices_new] = np.where(
+            is_found, indices_old[np.minimum(indices, len(indices_old) - 1)], -1)
+
+    diff = positions_new - positions_old[mapping]
+    diff_positions = np.where(
+        (mapping >= 0)[..., None], np.rint(diff), 0).astype(int)
+
+    return mapping, diff_positions
+
+
+def _wrap_into_unit_cell(scaled_positions):
+    """Wrap fractional positions into [0, 1) as required by cKDTree."""
+    scaled_positions = scaled_positions - np.floor(scaled_positions)
+    # e.g. -1e-17 becomes 1.0 by the above operation.
+    scaled_positions[scaled_positions >= 1.0] -= 1.0
+    return scaled_positions
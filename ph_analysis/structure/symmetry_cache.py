@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Cache of symmetry datasets and mappings for symmetry operations.
+
+The data are keyed by a hash of the cell, the positions, the atomic numbers
+and symprec. They are kept in memory and also stored as compressed ".npz"
+files under a cache directory, so that repeated runs for the same ideal
+structure skip the symmetry search completely.
+
+The cache directory is given by the environment variable
+"PH_ANALYSIS_CACHE_DIR" (default: "~/.cache/ph_analysis/symmetry").
+"""
+from __future__ import absolute_import, division, print_function
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+import numpy as np
+from phonopy.structure.symmetry import Symmetry
+from .structure_analyzer import StructureAnalyzer
+
+__author__ = 'Yuji Ikeda'
+
+# Increment this when the stored contents change.
+_CACHE_VERSION = 1
+
+_default_cache = None
+
+
+class SymmetryCache(object):
+    def __init__(self,
+                 cache_dir=None,
+                 max_size=2 ** 30,
+                 max_entries_in_memory=16,
+                 is_persistent=True):
+        """
+
+        Parameters
+        ----------
+        cache_dir: String
+            Directory for the ".npz" files.
+        max_size: Integer
+            Upper limit of the total size of the ".npz" files in bytes.
+            The least recently used files are removed beyond this size.
+        max_entries_in_memory: Integer
+            Number of the entries kept in memory.
+        is_persistent: Bool
+            If False, the data are only kept in memory.
+        """
+        if cache_dir is None:
+            cache_dir = os.environ.get(
+                'PH_ANALYSIS_CACHE_DIR',
+                os.path.join('~', '.cache', 'ph_analysis', 'symmetry'))
+        self._cache_dir = os.path.expanduser(cache_dir)
+        self._max_size = max_size
+        self._max_entries_in_memory = max_entries_in_memory
+        self._is_persistent = is_persistent
+        self._memo = OrderedDict()
+
+    def get(self, atoms, symprec=1e-5):
+        """Get symmetry data for "atoms".
+
+        Returns
+        -------
+        symmetry_data: Dictionary with the keys
+            "number", "international", "rotations", "translations",
+            "independent_atoms", "map_atoms", "map_operations",
+            "rotations_cart", "mappings", "mappings_inverse".
+        """
+        key = create_key(atoms, symprec)
+
+        if key in self._memo:
+            self._memo.move_to_end(key)
+            return self._memo[key]
+
+        symmetry_data = None
+        if self._is_persistent:
+            symmetry_data = self._load(key)
+        if symmetry_data is None:
+            symmetry_data = create_symmetry_data(atoms, symprec)
+            if self._is_persistent:
+                self._save(key, symmetry_data)
+                self._evict()
+
+        self._memo[key] = symmetry_data
+        while len(self._memo) > self._max_entries_in_memory:
+            self._memo.popitem(last=False)
+
+        return symmetry_data
+
+    def clear(self):
+        self._memo.clear()
+        for filename in self._get_filenames():
+            os.remove(filename)
+
+    def _create_filename(self, key):
+        return os.path.join(self._cache_dir, '{}.npz'.format(key))
+
+    def _get_filenames(self):
+        if not os.path.isdir(self._cache_dir):
+            return []
+        return [
+            os.path.join(self._cache_dir, x)
+            for x in os.listdir(self._cache_dir) if x.endswith('.npz')
+        ]
+
+    def _load(self, key):
+        filename = self._create_filename(key)
+        try:
+            with np.load(filename) as data:
+                symmetry_data = {k: data[k] for k in data.files}
+        except (IOError, OSError, ValueError):
+            # Missing or broken files are regarded as cache misses.
+            return None
+        symmetry_data['number'] = int(symmetry_data['number'])
+        symmetry_data['international'] = str(symmetry_data['international'])
+        # The modification time is used for the LRU eviction.
+        os.utime(filename, None)
+        return symmetry_data
+
+    def _save(self, key, symmetry_data):
+        if not os.path.isdir(self._cache_dir):
+            os.makedirs(self._cache_dir)
+        # Written to a temporary file first not to leave broken files
+        # when several processes write the same entry.
+        fd, filename_tmp = tempfile.mkstemp(
+            suffix='.tmp', dir=self._cache_dir)
+        with os.fdopen(fd, 'wb') as f:
+            np.savez_compressed(f, **symmetry_data)
+        os.replace(filename_tmp, self._create_filename(key))
+
+    def _evict(self):
+        files = []
+        for filename in self._get_filenames():
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, filename))
+        files.sort()
+
+        total_size = sum(x[1] for x in files)
+        for _, size, filename in files:
+            if total_size <= self._max_size:
+                break
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+            total_size -= size
+
+
+def create_key(atoms, symprec):
+    """Create a hash from the cell, the positions, the numbers and symprec."""
+    h = hashlib.sha1()
+    h.update(str(_CACHE_VERSION).encode())
+    h.update(np.ascontiguousarray(atoms.get_cell(), dtype=float).tobytes())
+    h.update(np.ascontiguousarray(
+        atoms.get_scaled_positions(), dtype=float).tobytes())
+    h.update(np.ascontiguousarray(
+        atoms.get_atomic_numbers(), dtype=np.int64).tobytes())
+    h.update(np.float64(symprec).tobytes())
+    return h.hexdigest()
+
+
+def create_symmetry_data(atoms, symprec=1e-5):
+    """Create symmetry data from one symmetry search with "symprec".
+
+    All the operation-wise arrays ("rotations", "translations",
+    "rotations_cart" and the rows of "mappings") are in the same order.
+    """
+    symmetry = Symmetry(atoms, symprec=symprec)
+    dataset = symmetry.get_dataset()
+    rotations = dataset['rotations']
+    translations = dataset['translations']
+
+    mappings = StructureAnalyzer(atoms).extract_mappings_for_symops(
+        rotations, translations, prec=symprec)[0]
+    if -1 in mappings:
+        print("ERROR: {}".format(__name__))
+        print("Some atoms are not mapped by some symmetry operations.")
+        raise ValueError
+
+    return {
+        'number': dataset['number'],
+        'international': dataset['international'],
+        'rotations': np.array(rotations),
+        'translations': np.array(translations),
+        'independent_atoms': np.array(symmetry.get_independent_atoms()),
+        'map_atoms': np.array(symmetry.get_map_atoms()),
+        'map_operations': np.array(symmetry.get_map_operations()),
+        'rotations_cart': convert_rotations_to_cartesian(
+            rotations, atoms.get_cell()),
+        'mappings': mappings,
+        'mappings_inverse': invert_mappings(mappings),
+    }
+
+
+def convert_rotations_to_cartesian(rotations, cell):
+    """L^T R L^-T for the rotations R in the fractional coordinates.
+
+    Parameters
+    ----------
+    rotations: (nsym, 3, 3) array
+    cell: (3, 3) array
+        Lattice vectors as rows.
+    """
+    cell = np.asarray(cell, dtype=float)
+    return np.einsum('ji,sjk,lk->sil', cell, rotations, np.linalg.inv(cell))
+
+
+def invert_mappings(mappings):
+    """Inverse permutations, i.e., inverse[k][mappings[k][i]] = i."""
+    return np.argsort(mappings, axis=1, kind='stable')
+
+
+def get_symmetry_data(atoms, symprec=1e-5):
+    """Get symmetry data using the default cache."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = SymmetryCache()
+    return _default_cache.get(atoms, symprec)
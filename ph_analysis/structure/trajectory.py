@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Streaming analysis of displacements and SAD over trajectories.
+
+Frames are read one by one and grouped into blocks of (T, N, 3) scaled
+positions. Displacements and SAD are computed for a whole block at once, and
+only running statistics (Welford's algorithm, merged by Chan's formula) are
+kept, so that the memory usage does not depend on the number of frames.
+"""
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import itertools
+import numpy as np
+import pandas as pd
+from .atomic_properties import calculate_displacements
+
+__author__ = 'Yuji Ikeda'
+
+
+def read_xdatcar(filename):
+    """Read frames of XDATCAR one by one.
+
+    Both the fixed-cell format (one header) and the variable-cell format
+    (one header per frame) of VASP 5 are accepted.
+
+    Yields
+    ------
+    cell: (3, 3) array
+    symbols: List of chemical symbols
+    scaled_positions: (natoms, 3) array
+    """
+    with open(filename) as f:
+        cell = symbols = None
+        for line in f:
+            if not line.strip():
+                continue
+            if not line.lstrip().lower().startswith('direct'):
+                # Header; "line" is the title.
+                cell, symbols = _read_xdatcar_header(f)
+                continue
+            natoms = len(symbols)
+            lines = list(itertools.islice(f, natoms))
+            scaled_positions = np.array(
+                ' '.join(lines).split(), dtype=float).reshape(-1, 3)
+            if len(scaled_positions) != natoms:
+                print("ERROR: {}".format(__name__))
+                print("{} is truncated.".format(filename))
+                raise ValueError
+            yield cell, symbols, scaled_positions
+
+
+def _read_xdatcar_header(f):
+    scale = float(next(f).split()[0])
+    cell = np.array([next(f).split()[:3] for _ in range(3)], dtype=float)
+    if scale < 0.0:
+        # Negative values are the volume.
+        scale = (-scale / abs(np.linalg.det(cell))) ** (1.0 / 3.0)
+    cell *= scale
+    symbols_types = next(f).split()
+    numbers = [int(x) for x in next(f).split()]
+    symbols = []
+    for s, n in zip(symbols_types, numbers):
+        symbols += [s] * n
+    return cell, symbols
+
+
+def iterate_frames_from_atoms(atoms_list):
+    """Convert Atoms objects into frames in the same way as "read_xdatcar".
+    """
+    for atoms in atoms_list:
+        yield (atoms.get_cell(),
+               atoms.get_chemical_symbols(),
+               atoms.get_scaled_positions())
+
+
+def iterate_blocks(frames, block_size=1000):
+    """Group frames into blocks.
+
+    Yields
+    ------
+    cells: (T, 3, 3) array
+    scaled_positions: (T, natoms, 3) array
+    """
+    frames = iter(frames)
+    while True:
+        block = list(itertools.islice(frames, block_size))
+        if not block:
+            return
+        cells, _, scaled_positions = zip(*block)
+        yield np.array(cells), np.array(scaled_positions)
+
+
+class RunningStatistics(object):
+    def __init__(self, ngroups):
+        """Running count, average, variance, minimum and maximum for groups.
+
+        Blocks are merged by the formula of Chan et al., which is the block
+        version of Welford's algorithm.
+        """
+        self._counts = np.zeros(ngroups)
+        self._averages = np.zeros(ngroups)
+        self._m2s = np.zeros(ngroups)
+        self._minima = np.full(ngroups, np.inf)
+        self._maxima = np.full(ngroups, -np.inf)
+
+    def add_block(self, values, groups):
+        """
+
+        Parameters
+        ----------
+        values: (T, N) array
+        groups: (N) integer array
+            Groups of the columns of "values".
+        """
+        ngroups = len(self._counts)
+        groups_all = np.broadcast_to(groups, values.shape).ravel()
+        values = values.ravel()
+
+        counts = np.bincount(groups_all, minlength=ngroups).astype(float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            averages = np.bincount(
+                groups_all, weights=values, minlength=ngroups) / counts
+        averages[counts == 0] = 0.0
+        m2s = np.bincount(
+            groups_all,
+            weights=(values - averages[groups_all]) ** 2,
+            minlength=ngroups)
+        np.minimum.at(self._minima, groups_all, values)
+        np.maximum.at(self._maxima, groups_all, values)
+
+        counts_total = self._counts + counts
+        is_updated = counts_total > 0
+        deltas = averages - self._averages
+        ratios = np.zeros(ngroups)
+        ratios[is_updated] = counts[is_updated] / counts_total[is_updated]
+        self._averages += deltas * ratios
+        self._m2s += m2s + deltas ** 2 * self._counts * ratios
+        self._counts = counts_total
+
+    def get_counts(self):
+        return self._counts
+
+    def get_sums(self):
+        return self._averages * self._counts
+
+    def get_averages(self):
+        return self._averages
+
+    def get_standard_deviations(self, ddof=0):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(self._m2s / (self._counts - ddof))
+
+    def get_minima(self):
+        return self._minima
+
+    def get_maxima(self):
+        return self._maxima
+
+
+class TrajectoryAnalyzer(object):
+    properties = ('displacement', 'sad')
+
+    def __init__(self, atoms_ideal, block_size=1000):
+        """Running statistics of displacements and SAD over frames.
+
+        The statistics are kept for each atom, for each chemical symbol, and
+        for all the atoms.
+
+        Parameters
+        ----------
+        atoms_ideal: Atoms
+            Ideal structure. The order of the atoms must be the same as the
+            frames.
+        block_size: Integer
+            Number of frames treated at once.
+        """
+        self._atoms_ideal = atoms_ideal
+        self._block_size = block_size
+
+        symbols = atoms_ideal.get_chemical_symbols()
+        self._symbols = symbols
+        self._symbol_types = sorted(set(symbols), key=symbols.index)
+        self._symbol_numbers = np.array(
+            [self._symbol_types.index(s) for s in symbols])
+        self._nframes = 0
+
+        natoms = len(symbols)
+        self._statistics = {}
+        for p in self.properties:
+            self._statistics[p] = {
+                'atom': RunningStatistics(natoms),
+                'symbol': RunningStatistics(len(self._symbol_types)),
+                'all': RunningStatistics(1),
+            }
+
+    def run(self, frames):
+        """Analyze frames given by, e.g., "read_xdatcar".
+
+        Parameters
+        ----------
+        frames: Iterable of (cell, symbols, scaled_positions)
+        """
+        for cells, scaled_positions in iterate_blocks(frames, self._block_size):
+            self.add_block(cells, scaled_positions)
+        return self
+
+    def add_block(self, cells, scaled_positions):
+        """
+
+        Parameters
+        ----------
+        cells: (T, 3, 3) array
+        scaled_positions: (T, natoms, 3) array
+        """
+        natoms = len(self._symbols)
+        if scaled_positions.shape[1:] != (natoms, 3):
+            print("ERROR: {}".format(__name__))
+            print("The number of atoms is not {}.".format(natoms))
+            raise ValueError
+
+        vectors = calculate_displacements(
+            cells,
+            scaled_positions,
+            self._atoms_ideal.get_scaled_positions())
+        sad = np.einsum('tik,tik->ti', vectors, vectors)
+        values = {
+            'displacement': np.sqrt(sad),
+            'sad': sad,
+        }
+
+        groups = {
+            'atom': np.arange(natoms),
+            'symbol': self._symbol_numbers,
+            'all': np.zeros(natoms, dtype=int),
+        }
+        for p in self.properties:
+            for k, statistics in self._statistics[p].items():
+                statistics.add_block(values[p], groups[k])
+        self._nframes += len(scaled_positions)
+
+    def get_number_of_frames(self):
+        return self._nframes
+
+    def get_statistics(self, property_name, key):
+        """
+
+        Parameters
+        ----------
+        property_name: 'displacement' or 'sad'
+        key: 'atom', 'symbol', or 'all'
+
+        Returns
+        -------
+        RunningStatistics
+        """
+        return self._statistics[property_name][key]
+
+    def get_data_stat(self, key):
+        """Get the statistics as a DataFrame.
+
+        Parameters
+        ----------
+        key: 'atom', 'symbol', or 'all'
+
+        Returns
+        -------
+        data_stat: pandas.DataFrame
+            Columns are (property, statistic).
+        """
+        if key == 'atom':
+            index = pd.Index(range(len(self._symbols)), name='index')
+        elif key == 'symbol':
+            index = pd.Index(self._symbol_types, name='symbol')
+        else:
+            index = pd.Index([''], name='atom')
+
+        columns = {}
+        for p in self.properties:
+            statistics = self._statistics[p][key]
+            columns[(p, 'count')] = statistics.get_counts().astype(int)
+            columns[(p, 'sum')] = statistics.get_sums()
+            columns[(p, 'avg.')] = statistics.get_averages()
+            columns[(p, 's.d.')] = statistics.get_standard_deviations()
+            columns[(p, 'min.')] = statistics.get_minima()
+            columns[(p, 'max.')] = statistics.get_maxima()
+        data_stat = pd.DataFrame(columns, index=index)
+        if key == 'atom':
+            data_stat.insert(0, 'symbol', self._symbols)
+        return data_stat
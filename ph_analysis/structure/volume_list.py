@@ -3,18 +3,30 @@
 from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
 import pandas as pd
-from .volume import create_data_stat
-from .volume_factory import VolumeFactory
+from .atomic_properties import AtomicProperties
+from .atomic_report import write_atomic_report, write_data
 
 __author__ = 'Yuji Ikeda'
 __version__ = '0.1.0'
 
 
 class VolumeList(object):
-    def __init__(self, atoms_list, method):
+    def __init__(self, atoms_list, method, max_workers=1):
+        """
+
+        Parameters
+        ----------
+        atoms_list: List of Atoms
+        method: String
+            'mesh' or 'voronoi'.
+        max_workers: Integer or None
+            Number of processes over the structures. 1 (default) runs
+            serially without processes, and None uses the number of the
+            processors.
+        """
         self._atoms_list = atoms_list
         self._method = method
-        self._factory = VolumeFactory()
+        self._max_workers = max_workers
         self._initialize_data()
 
     def _initialize_data(self):
@@ -25,15 +37,13 @@ class VolumeList(object):
         self.write_atomic_volume(sort)
 
     def generate_atomic_volume(self):
-        data_list = []
-        for i, atoms in enumerate(self._atoms_list):
-            # TODO(ikeda): additional arguments should be acceptable
-            volume = self._factory.create(self._method, atoms)
-            volume.generate_atomic_volume()
-            data_tmp = volume.get_data()
-            data_tmp['structure'] = i
-            data_list.append(data_tmp)
-        self._data = pd.concat(data_list, ignore_index=True)
+        # TODO(ikeda): additional arguments should be acceptable
+        atomic_properties = AtomicProperties(
+            self._atoms_list,
+            volume_method=self._method,
+            max_workers=self._max_workers)
+        atomic_properties.run(['volume'])
+        self._data = atomic_properties.get_data()
 
     def write_atomic_volume(self, sort=False):
         filename = self._create_filename()
@@ -41,71 +51,13 @@ class VolumeList(object):
 
         properties = ['volume']
 
-        headers = ['', 'str.', 'index', 'symb.', 'volume']
         with open(filename, "w") as f:
             f.write(self._create_header())
-            f.write('{:<10s} {:<5s} {:<5s} {:<5s} {:<18s}'.format(
-                *headers))
-            f.write('\n')
-            for i, x in data.iterrows():
-                f.write('atom      ')
-                f.write(' {:5d}'.format(x['structure']))
-                f.write(' {:5d}'.format(x['index']))
-                f.write(' {:5s}'.format(x['symbol']))
-                f.write(' {:18.12f}'.format(x['volume']))
-                f.write('\n')
+            write_atomic_report(f, data, properties, sort=sort)
 
-            f.write('\n')
-
-            # Write statistics for all atoms
-            data_stat = create_data_stat(data, 'atom', properties, sort)
-            for k0, x in data_stat.iterrows():
-                for k1, v in x.iteritems():
-                    f.write('{:10s}'.format(k1[1]))
-                    f.write(' {:5s}'.format(''))
-                    f.write(' {:5s}'.format(''))
-                    f.write(' {:5s}'.format(k0))
-                    f.write(' {:18.12f}'.format(v))
-                    f.write('\n')
-                f.write('\n')
-
-            # Write statistics for each symbol
-            data_stat = create_data_stat(data, 'symbol', properties, sort)
-            for k0, x in data_stat.iterrows():
-                for k1, v in x.iteritems():
-                    f.write('{:10s}'.format(k1[1]))
-                    f.write(' {:5s}'.format(''))
-                    f.write(' {:5s}'.format(''))
-                    f.write(' {:5s}'.format(k0))
-                    f.write(' {:18.12f}'.format(v))
-                    f.write('\n')
-                f.write('\n')
-
-            # Write statistics for each structure
-            keys = ['structure']
-            data_stat = create_data_stat(data, keys, properties, sort)
-            for k0, x in data_stat.iterrows():
-                for k1, v in x.iteritems():
-                    f.write('{:10s}'.format(k1[1]))
-                    f.write(' {:5d}'.format(k0))
-                    f.write(' {:5s}'.format(''))
-                    f.write(' {:5s}'.format(''))
-                    f.write(' {:18.12f}'.format(v))
-                    f.write('\n')
-                f.write('\n')
-
-            # Write statistics for each symbol
-            keys = ['structure', 'symbol']
-            data_stat = create_data_stat(data, keys, properties, sort)
-            for k0, x in data_stat.iterrows():
-                for k1, v in x.iteritems():
-                    f.write('{:10s}'.format(k1[1]))
-                    f.write(' {:5d}'.format(k0[0]))
-                    f.write(' {:5s}'.format(''))
-                    f.write(' {:5s}'.format(k0[1]))
-                    f.write(' {:18.12f}'.format(v))
-                    f.write('\n')
-                f.write('\n')
+    def write_data(self, filename):
+        """Write the per-atom data in the CSV or the Parquet format."""
+        write_data(self._data, filename)
 
     def _create_header(self):
         return ''
@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from .volume import Volume
 
@@ -10,48 +11,98 @@ __version__ = '0.1.0'
 
 
 class VolumeMesh(Volume):
-    def __init__(self, atoms, mesh):
+    def __init__(self, atoms, mesh, max_elements=2 ** 22, max_workers=1):
+        """
+
+        Parameters
+        ----------
+        atoms: Atoms
+        mesh: List of three integers
+        max_elements: Integer
+            Maximum number of (grid point, atom) pairs treated at once.
+            This limits the memory usage.
+        max_workers: Integer or None
+            Number of threads over the chunks of the grid points.
+            None uses the default of ThreadPoolExecutor.
+        """
         super(VolumeMesh, self).__init__(atoms)
         self._mesh = mesh
+        self._max_elements = max_elements
+        self._max_workers = max_workers
 
     def generate_atomic_volume(self, prec=1e-6):
+        """Generate atomic volumes by counting the closest grid points.
+
+        A grid point equidistant (within prec) from several atoms is shared
+        equally among them.
+        """
         atoms = self._atoms
         mesh = self._mesh
         cell = atoms.get_cell()
         natoms = atoms.get_number_of_atoms()
-        atomic_positions = atoms.get_scaled_positions()
         volumes_atom = np.zeros(natoms)
 
-        get_distances = self._get_distances1
+        npoints = int(np.prod(mesh))
+        chunk_size = max(1, self._max_elements // max(1, natoms * 3))
+        starts = range(0, npoints, chunk_size)
 
-        positions = []
-        for x0 in np.linspace(0, 1, mesh[0], endpoint=False):
-            for x1 in np.linspace(0, 1, mesh[1], endpoint=False):
-                for x2 in np.linspace(0, 1, mesh[2], endpoint=False):
-                    position = np.array([x0, x1, x2])
-                    positions.append(position)
-        positions = np.array(positions)
+        def run_chunk(start):
+            return self._find_closest_atoms(
+                start, min(start + chunk_size, npoints), prec)
 
-        for position in positions:
-            # TODO(ikeda): This may fail for extremely strange cell shape
-            rpos = position - atomic_positions  # broadcasting
-            rpos -= np.rint(rpos)  # np.rint seems to be faster than np.around.
-            distance = get_distances(rpos)
+        # The contributions are added in the order of the grid points so that
+        # the volumes do not depend on the number of threads.
+        if self._max_workers == 1:
+            for indices, weights in map(run_chunk, starts):
+                np.add.at(volumes_atom, indices, weights)
+        else:
+            with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+                for indices, weights in executor.map(run_chunk, starts):
+                    np.add.at(volumes_atom, indices, weights)
 
-            distance_min = min(distance)
-            atoms_close = []
-            weight = 0
-            for ia in range(natoms):
-                if distance[ia] - distance_min < prec:
-                    atoms_close.append(ia)
-                    weight += 1
+        volumes_atom /= np.prod(mesh)
 
-            for ia in atoms_close:
-                volumes_atom[ia] += 1.0 / float(weight)
+        self._data['volume'] = volumes_atom * np.linalg.det(cell)
 
-        volumes_atom /= np.product(mesh)
+    def _create_grid_points(self, start, stop):
+        """Create scaled positions of the grid points in [start, stop).
 
-        self._data['volume'] = volumes_atom * np.linalg.det(cell)
+        The order is the same as three nested loops along the axes.
+        """
+        mesh = self._mesh
+        indices = np.unravel_index(np.arange(start, stop), mesh)
+        return np.column_stack([
+            np.linspace(0, 1, m, endpoint=False)[i]
+            for m, i in zip(mesh, indices)])
+
+    def _find_closest_atoms(self, start, stop, prec):
+        """
+
+        Returns
+        -------
+        indices: (npairs) integer array
+            Atoms closest to the grid points, ordered by the grid points.
+        weights: (npairs) array
+            1 / (number of the closest atoms) for each grid point.
+        """
+        cell = self._atoms.get_cell()
+        atomic_positions = self._atoms.get_scaled_positions()
+        natoms = len(atomic_positions)
+
+        positions = self._create_grid_points(start, stop)
+        # TODO(ikeda): This may fail for extremely strange cell shape
+        rpos = positions[:, None, :] - atomic_positions[None, :, :]
+        rpos -= np.rint(rpos)
+        rpos = np.dot(rpos.reshape(-1, 3), cell)
+        distances = np.sqrt(rpos[:, 0] * rpos[:, 0] +
+                            rpos[:, 1] * rpos[:, 1] +
+                            rpos[:, 2] * rpos[:, 2]).reshape(-1, natoms)
+
+        distances_min = np.min(distances, axis=1)
+        is_close = (distances - distances_min[:, None] < prec)
+        weights = 1.0 / np.sum(is_close, axis=1)
+        points, indices = np.nonzero(is_close)
+        return indices, weights[points]
 
     def _create_header(self):
         return '# {} {} {}\n'.format(*self._mesh)
@@ -3,7 +3,8 @@
 from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
 import numpy as np
-from scipy.spatial import ConvexHull, Voronoi
+from scipy.spatial import Voronoi
+from .neighbor_list import create_periodic_images, wrap_scaled_positions
 from .volume import Volume
 
 __author__ = 'Yuji Ikeda'
@@ -11,64 +12,48 @@ __version__ = '0.1.0'
 
 
 class VolumeVoronoi(Volume):
+    def __init__(self, atoms, cutoff=None, max_iterations=10):
+        """
+
+        Parameters
+        ----------
+        atoms: Atoms
+        cutoff: Float or None
+            Periodic images within this distance from the cell are included
+            for the Voronoi tessellation. It is increased automatically
+            until the Voronoi cells are converged. If None, it is estimated
+            from the volume per atom.
+        max_iterations: Integer
+            Maximum number of the increases of the cutoff.
+        """
+        super(VolumeVoronoi, self).__init__(atoms)
+        self._cutoff = cutoff
+        self._max_iterations = max_iterations
+
     def generate_atomic_volume(self, prec=1e-6):
         atoms = self._atoms
         cell = atoms.get_cell()
         natoms = atoms.get_number_of_atoms()
-        scaled_positions = atoms.get_scaled_positions()
-
-        expansion = [
-            [ 0,  0,  0],
-            [ 0,  0,  1],
-            [ 0,  0, -1],
-            [ 0,  1,  0],
-            [ 0,  1,  1],
-            [ 0,  1, -1],
-            [ 0, -1,  0],
-            [ 0, -1,  1],
-            [ 0, -1, -1],
-            [ 1,  0,  0],
-            [ 1,  0,  1],
-            [ 1,  0, -1],
-            [ 1,  1,  0],
-            [ 1,  1,  1],
-            [ 1,  1, -1],
-            [ 1, -1,  0],
-            [ 1, -1,  1],
-            [ 1, -1, -1],
-            [-1,  0,  0],
-            [-1,  0,  1],
-            [-1,  0, -1],
-            [-1,  1,  0],
-            [-1,  1,  1],
-            [-1,  1, -1],
-            [-1, -1,  0],
-            [-1, -1,  1],
-            [-1, -1, -1],
-            ]
-        expansion = np.array(expansion)
-
-        scaled_positions_expanded = np.reshape(
-            scaled_positions[None, None, :, :] + expansion[None, :, None, :],
-            (-1, 3))
-
-        positions_expanded = np.dot(scaled_positions_expanded, cell)
-
-        voronoi = Voronoi(positions_expanded)
-
-        volumes_atom = np.full(natoms, np.nan)
-        for i in range(natoms):
-            j = voronoi.point_region[i]
-            region = voronoi.regions[j]
-            if np.all(np.asarray(region) >= 0):
-                vertices = voronoi.vertices[region]
-                # Since a Voronoi cell is always a convex polyhedron,
-                # we can obtain it's volume using ConvexHull.
-                # https://stackoverflow.com/questions/17129115
-                volume = ConvexHull(vertices).volume
-                volumes_atom[i] = volume
-            else:
-                raise ValueError('Region includes infinite point')
+
+        cutoff = self._cutoff
+        if cutoff is None:
+            cutoff = 2.0 * (atoms.get_volume() / natoms) ** (1.0 / 3.0)
+
+        for _ in range(self._max_iterations):
+            volumes_atom, radius = calculate_voronoi_volumes(
+                cell, atoms.get_scaled_positions(), cutoff)
+            # A Voronoi cell is exact if all the points within twice the
+            # largest distance to its vertices are included.
+            if radius is not None and 2.0 * radius <= cutoff:
+                break
+            cutoff = 2.0 * cutoff if radius is None else 2.0 * radius + prec
+        else:
+            raise ValueError('Voronoi cells are not converged', cutoff)
+
+        volume = abs(np.linalg.det(cell))
+        if abs(np.sum(volumes_atom) - volume) > prec * volume:
+            raise ValueError('Sum of Voronoi volumes is not the cell volume',
+                             np.sum(volumes_atom), volume)
 
         self._data['volume'] = volumes_atom
 
@@ -79,6 +64,86 @@ class VolumeVoronoi(Volume):
         return 'atomic_volume.dat'
 
 
+def calculate_voronoi_volumes(cell, scaled_positions, cutoff):
+    """Calculate volumes of the Voronoi cells of the atoms in the cell.
+
+    Each Voronoi cell is divided into pyramids whose bases are its faces and
+    whose apexes are the atom. The volume of the pyramid is
+    area * distance / 6, where distance is that to the neighbor sharing the
+    face.
+
+    Parameters
+    ----------
+    cell: (3, 3) array
+    scaled_positions: (natoms, 3) array
+    cutoff: Float
+        Periodic images within this distance from the cell are included.
+
+    Returns
+    -------
+    volumes: (natoms) array
+    radius: Float or None
+        Largest distance from the atoms to the vertices of their Voronoi
+        cells. None if some of the Voronoi cells are not closed.
+    """
+    natoms = len(scaled_positions)
+    positions = wrap_scaled_positions(np.asarray(scaled_positions))[0]
+    images, _, images_shifts = create_periodic_images(cell, positions, cutoff)
+    # The original atoms come first.
+    order = np.argsort(np.any(images_shifts != 0, axis=1), kind='mergesort')
+    points = np.dot(images[order], cell)
+
+    voronoi = Voronoi(points)
+
+    ridge_points = voronoi.ridge_points
+    is_used = np.any(ridge_points < natoms, axis=1)
+    ridge_points = ridge_points[is_used]
+    ridge_vertices = [
+        r for r, u in zip(voronoi.ridge_vertices, is_used) if u]
+    lengths = np.array([len(r) for r in ridge_vertices])
+    vertices = np.concatenate(ridge_vertices)
+    if np.any(vertices < 0):
+        return np.full(natoms, np.nan), None
+    ridges = np.repeat(np.arange(len(ridge_vertices)), lengths)
+    vertices = voronoi.vertices[vertices]
+
+    # The vertices of each face are sorted by the angles around the center.
+    normals = points[ridge_points[:, 1]] - points[ridge_points[:, 0]]
+    distances = np.linalg.norm(normals, axis=1)
+    normals /= distances[:, None]
+    centers = np.zeros((len(ridge_vertices), 3))
+    for ix in range(3):
+        centers[:, ix] = np.bincount(ridges, weights=vertices[:, ix])
+    centers /= lengths[:, None]
+    axes0 = np.cross(normals, np.eye(3)[np.argmin(np.abs(normals), axis=1)])
+    axes1 = np.cross(normals, axes0)
+    tmp = vertices - centers[ridges]
+    angles = np.arctan2(
+        np.einsum('ij,ij->i', tmp, axes1[ridges]),
+        np.einsum('ij,ij->i', tmp, axes0[ridges]))
+    order = np.lexsort((angles, ridges))
+    tmp = tmp[order]
+    starts = np.cumsum(lengths) - lengths
+    following = np.arange(len(tmp)) + 1
+    following[starts + lengths - 1] = starts
+    triangles = np.cross(tmp, tmp[following])
+    areas = 0.5 * np.bincount(
+        ridges, weights=np.einsum('ij,ij->i', triangles, normals[ridges]))
+
+    volumes = np.zeros(natoms)
+    for k in range(2):
+        is_original = ridge_points[:, k] < natoms
+        volumes += np.bincount(
+            ridge_points[is_original, k],
+            weights=areas[is_original] * distances[is_original] / 6.0,
+            minlength=natoms)
+
+    # Vertices of a face are equidistant from the two atoms sharing it.
+    radius = np.max(np.linalg.norm(
+        vertices - points[np.repeat(ridge_points[:, 0], lengths)], axis=1))
+    return volumes, radius
+
+
 def main():
     import argparse
     from phonopy.interface.vasp import read_vasp
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import unittest
+import numpy as np
+from phonopy.structure.atoms import PhonopyAtoms
+from ph_analysis.structure.atomic_properties import AtomicProperties
+from ph_analysis.structure.sad import SAD
+from ph_analysis.structure.volume_voronoi import VolumeVoronoi
+
+
+class TestAtomicProperties(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self._atoms_list = []
+        self._atoms_ideal_list = []
+        # Structures with different numbers of atoms are mixed.
+        for natoms in [4, 6, 4, 5]:
+            symbols = ['Cu', 'Au'] * 3
+            atoms_ideal = PhonopyAtoms(
+                symbols=symbols[:natoms],
+                cell=np.eye(3) * 4.0,
+                scaled_positions=rng.rand(natoms, 3))
+            atoms = PhonopyAtoms(
+                symbols=symbols[:natoms],
+                cell=np.eye(3) * 4.0 + rng.rand(3, 3) * 0.1,
+                scaled_positions=(atoms_ideal.get_scaled_positions() +
+                                  rng.randn(natoms, 3) * 0.02 + 0.3))
+            self._atoms_list.append(atoms)
+            self._atoms_ideal_list.append(atoms_ideal)
+
+    def test_run(self):
+        atomic_properties = AtomicProperties(
+            self._atoms_list, self._atoms_ideal_list, max_workers=1)
+        atomic_properties.run()
+        data = atomic_properties.get_data()
+        self.assertEqual(len(data), 19)
+
+        for i, (atoms, atoms_ideal) in enumerate(
+                zip(self._atoms_list, self._atoms_ideal_list)):
+            data_structure = data[data['structure'] == i]
+            sad = SAD(atoms, atoms_ideal)
+            sad.calculate_sad()
+            expected = sad.get_data()['sad'].values
+            np.testing.assert_allclose(data_structure['sad'], expected)
+            np.testing.assert_allclose(
+                data_structure['displacement'], np.sqrt(expected))
+
+            volume = VolumeVoronoi(atoms)
+            volume.generate_atomic_volume()
+            np.testing.assert_allclose(
+                data_structure['volume'], volume.get_data()['volume'])
+
+
+if __name__ == '__main__':
+    unittest.main()
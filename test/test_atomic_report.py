@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import io
+import unittest
+import numpy as np
+import pandas as pd
+from ph_analysis.structure.atomic_report import (
+    create_data_stat,
+    write_rows,
+)
+
+
+class TestAtomicReport(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        data = pd.DataFrame()
+        data['symbol'] = ['Cu', 'Au', 'Pd'] * 10
+        data['structure'] = np.repeat([3, 1, 2], 10)
+        data['atom'] = ''
+        data['value'] = rng.randn(30) + 1.0
+        self._data = data
+
+    def test_create_data_stat(self):
+        data = self._data
+        functions = [
+            ('sum', np.sum),
+            ('avg.', np.average),
+            ('sqrt_avg.', lambda x: np.sqrt(np.average(x))),
+            ('s.d.', lambda x: np.std(x, ddof=0)),
+            ('abs._sum', lambda x: np.sum(np.abs(x))),
+            ('abs._avg.', lambda x: np.average(np.abs(x))),
+            ('abs._s.d.', lambda x: np.std(np.abs(x), ddof=0)),
+        ]
+        statistics = [k for k, _ in functions]
+        for keys in ['atom', 'symbol', ['structure'], ['structure', 'symbol']]:
+            expected = data.groupby(keys, sort=False)[['value']].agg(functions)
+            data_stat = create_data_stat(
+                data, keys, ['value'], statistics=statistics)
+            pd.testing.assert_frame_equal(data_stat, expected)
+
+    def test_write_rows(self):
+        data = self._data
+        f = io.StringIO()
+        write_rows(f, '%5d %-5s%18.12f\n',
+                   [data['structure'].values,
+                    data['symbol'].values,
+                    data['value'].values],
+                   chunk_size=7)
+        expected = ''.join(
+            '{:5d} {:5s}{:18.12f}\n'.format(x['structure'], x['symbol'],
+                                             x['value'])
+            for _, x in data.iterrows())
+        self.assertEqual(f.getvalue(), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import unittest
+from collections import OrderedDict
+import numpy as np
+from phonopy.structure.atoms import PhonopyAtoms
+from ph_analysis.structure.configuration_randomizer import (
+    ConfigurationRandomizer)
+
+
+class TestConfigurationRandomizer(unittest.TestCase):
+    def setUp(self):
+        symbols = ['Cu'] * 12 + ['O'] * 4
+        self._atoms = PhonopyAtoms(
+            symbols=symbols,
+            cell=np.eye(3),
+            scaled_positions=np.random.RandomState(0).rand(16, 3))
+        self._map_s2s = OrderedDict([
+            ('Cu', OrderedDict([('Au', 1), ('Ag', 1), ('Cu', 1)])),
+        ])
+
+    def test_create_species(self):
+        randomizer = ConfigurationRandomizer(
+            self._atoms, self._map_s2s, random_seed=42)
+        symbol_types = randomizer.get_symbol_types()
+        species = randomizer.create_species(50)
+
+        self.assertEqual(species.shape, (50, 16))
+        self.assertTrue(np.all(species[:, 12:] == symbol_types.index('O')))
+        for symbol in ['Au', 'Ag', 'Cu']:
+            counts = np.sum(
+                species[:, :12] == symbol_types.index(symbol), axis=1)
+            self.assertTrue(np.all(counts == 4))
+        self.assertGreater(len(set(map(tuple, species))), 1)
+
+        species_2 = ConfigurationRandomizer(
+            self._atoms, self._map_s2s, random_seed=42).create_species(50)
+        np.testing.assert_array_equal(species, species_2)
+
+    def test_create_randomized_configuration(self):
+        symbols_orig = self._atoms.get_chemical_symbols()
+        randomizer = ConfigurationRandomizer(
+            self._atoms, self._map_s2s, random_seed=42)
+        atoms = randomizer.create_randomized_configuration()
+        self.assertEqual(self._atoms.get_chemical_symbols(), symbols_orig)
+        self.assertEqual(atoms.get_chemical_symbols().count('Au'), 4)
+
+        atoms = randomizer.create_randomized_configuration(is_copied=False)
+        self.assertIs(atoms, self._atoms)
+
+
+if __name__ == '__main__':
+    unittest.main()
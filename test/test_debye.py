@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import unittest
+import numpy as np
+from ph_analysis.debye.debye import (
+    Debye,
+    DebyeGruneisen,
+    f_nu,
+    inv_f_nu,
+)
+from ph_analysis.debye.td_props import calculate_helmholtz_energy
+
+
+class TestDebye(unittest.TestCase):
+    def test_inv_f_nu(self):
+        nus = np.linspace(-0.999, 0.499, 1001)
+        np.testing.assert_allclose(inv_f_nu(f_nu(nus)), nus, atol=1e-14)
+        self.assertAlmostEqual(inv_f_nu(f_nu(0.25)), 0.25, places=14)
+        with self.assertRaises(ValueError):
+            inv_f_nu(100.0)
+
+    def test_arrays(self):
+        poissons = np.array([0.2, 0.3])
+        bulk_moduli = np.array([[0.5], [0.6], [0.7]])
+        debye = Debye(poissons).run(16.5, bulk_moduli, 58.7)
+        self.assertEqual(debye.shape, (3, 2))
+        self.assertAlmostEqual(
+            debye[1, 1], Debye(0.3).run(16.5, 0.6, 58.7), places=10)
+
+    def test_gruneisen(self):
+        # Two compositions
+        model = DebyeGruneisen(
+            [[16.0], [17.0]], [[400.0], [300.0]], [[2.0], [1.5]])
+        volumes = np.linspace(15.0, 18.0, 7)
+        temperatures = np.linspace(0.0, 1000.0, 11)
+        properties = model.calculate_thermodynamic_properties(
+            volumes, temperatures)
+        self.assertEqual(properties['debye'].shape, (2, 7))
+        self.assertEqual(properties['free_energy'].shape, (2, 7, 11))
+        self.assertAlmostEqual(
+            properties['debye'][1, 3], 300.0 * (17.0 / 16.5) ** 1.5)
+        np.testing.assert_allclose(
+            properties['free_energy'][1, 3],
+            calculate_helmholtz_energy(
+                temperatures, properties['debye'][1, 3]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import unittest
+import numpy as np
+from ph_analysis.eos.eos import EOSFactory
+from ph_analysis.eos.eos_fitting import BatchEOSFitting
+
+
+class TestBatchEOSFitting(unittest.TestCase):
+    def test(self):
+        volumes = np.linspace(14.0, 20.0, 11)
+        temperatures = np.linspace(0.0, 1.0, 50)
+        # (E_0, B_0, B'_0, V_0)
+        parameters = np.array([
+            -3.0 + 0.1 * temperatures,
+            0.6 - 0.2 * temperatures,
+            4.5 + temperatures,
+            16.0 + temperatures,
+        ])
+        for name in ['Vinet', 'BM3', 'Murnaghan']:
+            eos = EOSFactory(name).create()
+            energies = eos.ev(volumes, *parameters[:, :, None])
+            data = BatchEOSFitting(volumes, energies, name).fit().get_data()
+            np.testing.assert_allclose(data['F0'], parameters[0], atol=1e-8)
+            np.testing.assert_allclose(data['B0'], parameters[1], atol=1e-7)
+            np.testing.assert_allclose(data['Bp0'], parameters[2], atol=1e-6)
+            np.testing.assert_allclose(data['V0'], parameters[3], atol=1e-6)
+            self.assertTrue(np.all(data['F_RMSE'] < 1e-10))
+            self.assertTrue(np.all(data['NV'] == 11))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import os
+import shutil
+import tempfile
+import unittest
+from collections import OrderedDict
+import numpy as np
+from phonopy.interface.vasp import write_vasp
+from phonopy.structure.atoms import PhonopyAtoms
+try:
+    from ph_analysis.fc.fc_enlarger import FCEnlarger
+    from ph_analysis.fc.fc_store import (
+        read_force_constants,
+        write_force_constants,
+    )
+    from ph_analysis.structure import symmetry_cache
+except ImportError:  # "vasp" is required.
+    FCEnlarger = None
+
+
+@unittest.skipIf(FCEnlarger is None, 'Dependencies are not found.')
+class TestFCEnlarger(unittest.TestCase):
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._root = tempfile.mkdtemp()
+        self._cache_dir_orig = os.environ.get('PH_ANALYSIS_CACHE_DIR')
+        os.environ['PH_ANALYSIS_CACHE_DIR'] = os.path.join(
+            self._root, 'cache')
+        symmetry_cache._default_cache = None
+        os.chdir(self._root)
+
+        scaled_positions = [
+            [0.0, 0.0, 0.0],
+            [0.0, 0.5, 0.5],
+            [0.5, 0.0, 0.5],
+            [0.5, 0.5, 0.0],
+        ]
+        cell = np.eye(3) * 3.8
+        write_vasp('POSCAR_orig_ideal', PhonopyAtoms(
+            symbols=['Cu'] * 4, cell=cell, scaled_positions=scaled_positions))
+        write_vasp('POSCAR_orig', PhonopyAtoms(
+            symbols=['Cu', 'Cu', 'Au', 'Au'], cell=cell,
+            scaled_positions=scaled_positions))
+        natoms = 32
+        rng = np.random.RandomState(0)
+        write_force_constants(
+            rng.standard_normal((natoms, natoms, 3, 3)),
+            'FORCE_CONSTANTS_orig.npy')
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        symmetry_cache._default_cache = None
+        if self._cache_dir_orig is None:
+            del os.environ['PH_ANALYSIS_CACHE_DIR']
+        else:
+            os.environ['PH_ANALYSIS_CACHE_DIR'] = self._cache_dir_orig
+        shutil.rmtree(self._root)
+
+    def _run_ensemble(self, max_workers):
+        dict_input = {
+            'force_constants': 'FORCE_CONSTANTS_orig.npy',
+            'map_s2s': OrderedDict([
+                ('Cu', OrderedDict([('Cu', 1), ('Au', 1)])),
+            ]),
+            'random_seed': 42,
+            'num_configurations': 2,
+            'supercell_matrix': np.eye(3, dtype=int) * 2,
+            'enlargement_matrix': np.eye(3, dtype=int) * 3,
+        }
+        directory = 'workers_{}'.format(max_workers)
+        os.mkdir(directory)
+        FCEnlarger(dict_input).run_ensemble(
+            filename_cell=os.path.join(directory, 'POSCAR_enlarged'),
+            filename_fc=os.path.join(directory, 'FORCE_CONSTANTS.npy'),
+            max_workers=max_workers)
+        return directory
+
+    def test_run_ensemble(self):
+        directories = [self._run_ensemble(n) for n in (1, 2)]
+        for index in (1, 2):
+            filenames_cell = [
+                os.path.join(d, 'POSCAR_enlarged-{}'.format(index))
+                for d in directories]
+            filenames_fc = [
+                os.path.join(d, 'FORCE_CONSTANTS-{}.npy'.format(index))
+                for d in directories]
+            for filename in filenames_cell + filenames_fc:
+                self.assertTrue(os.path.isfile(filename))
+            with open(filenames_cell[0]) as f0, open(filenames_cell[1]) as f1:
+                self.assertEqual(f0.read(), f1.read())
+            force_constants = read_force_constants(filenames_fc[0])
+            self.assertEqual(force_constants.shape, (108, 108, 3, 3))
+            np.testing.assert_array_equal(
+                force_constants, read_force_constants(filenames_fc[1]))
+
+        # The configurations are different from each other.
+        self.assertFalse(np.array_equal(
+            read_force_constants(
+                os.path.join(directories[0], 'FORCE_CONSTANTS-1.npy')),
+            read_force_constants(
+                os.path.join(directories[0], 'FORCE_CONSTANTS-2.npy'))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from ph_analysis.fc.fc_store import (
+    convert_force_constants,
+    read_force_constants,
+    read_force_constants_pair_archive,
+    write_force_constants,
+    write_force_constants_pair_archive,
+)
+
+
+class TestFCStore(unittest.TestCase):
+    def setUp(self):
+        self._dirname = tempfile.mkdtemp()
+        rng = np.random.RandomState(0)
+        self._force_constants = rng.standard_normal((4, 4, 3, 3))
+
+    def tearDown(self):
+        shutil.rmtree(self._dirname)
+
+    def test_convert(self):
+        filename_text = os.path.join(self._dirname, 'FORCE_CONSTANTS')
+        filename_npy = os.path.join(self._dirname, 'FORCE_CONSTANTS.npy')
+        filename_text2 = os.path.join(self._dirname, 'FORCE_CONSTANTS_2')
+
+        write_force_constants(self._force_constants, filename_text)
+        convert_force_constants(filename_text, filename_npy)
+        convert_force_constants(filename_npy, filename_text2)
+
+        fc_npy = read_force_constants(filename_npy)
+        self.assertIsInstance(fc_npy, np.memmap)
+        self.assertFalse(fc_npy.flags.writeable)
+        np.testing.assert_allclose(
+            fc_npy, self._force_constants, atol=1e-10)
+        np.testing.assert_array_equal(
+            read_force_constants(filename_text2),
+            read_force_constants(filename_text))
+
+    def test_pair_archive(self):
+        filename = os.path.join(self._dirname, 'FORCE_CONSTANTS_PAIR.npz')
+        fc = self._force_constants
+        pairs = [('Cu', 'Cu'), ('Cu', 'Au'), ('Au', 'Cu'), ('Au', 'Au')]
+        force_constants_pair = {k: fc * i for i, k in enumerate(pairs)}
+        pair_counters = {
+            k: np.full(fc.shape[:2], i) for i, k in enumerate(pairs)}
+
+        write_force_constants_pair_archive(
+            filename, force_constants_pair, pair_counters=pair_counters)
+        data = read_force_constants_pair_archive(filename)
+
+        self.assertNotIn('force_constants_pair_sd', data)
+        for k in pairs:
+            np.testing.assert_array_equal(
+                data['force_constants_pair'][k], force_constants_pair[k])
+            np.testing.assert_array_equal(
+                data['pair_counters'][k], pair_counters[k])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import unittest
+import numpy as np
+from ph_analysis.fc.fc_symmetrizer_engine import (
+    average_force_constants_for_independent_atoms,
+    average_force_constants_full,
+    distribute_force_constants,
+)
+
+
+def create_random_rotations(nsym, rng):
+    rotations = []
+    for _ in range(nsym):
+        q, r = np.linalg.qr(rng.standard_normal((3, 3)))
+        rotations.append(q)
+    return np.array(rotations)
+
+
+class TestFCSymmetrizerEngine(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self._natoms = 12
+        self._nsym = 5
+        self._nsymbols = 3
+        self._fc = rng.standard_normal((self._natoms, self._natoms, 3, 3))
+        self._mappings = np.array(
+            [rng.permutation(self._natoms) for _ in range(self._nsym)])
+        self._rotations = create_random_rotations(self._nsym, rng)
+        self._symbol_numbers = rng.randint(self._nsymbols, size=self._natoms)
+        self._independent_atoms = np.array([0, 3, 7])
+
+    def test_average(self):
+        fc = self._fc
+        nsymbols = self._nsymbols
+        npairs = nsymbols ** 2
+        natoms = self._natoms
+        independent_atoms = self._independent_atoms
+        symbol_numbers = self._symbol_numbers
+
+        nind = len(independent_atoms)
+        fc_sum = np.zeros((nind, natoms, 3, 3))
+        fc_square_sum = np.zeros((nind, natoms, 3, 3))
+        fc_pair_sum = np.zeros((npairs, nind, natoms, 3, 3))
+        fc_pair_square_sum = np.zeros((npairs, nind, natoms, 3, 3))
+        counters = np.zeros((npairs, nind, natoms), dtype=int)
+        for minv, r in zip(self._mappings, self._rotations):
+            for ii, i1 in enumerate(independent_atoms):
+                for i2 in range(natoms):
+                    j1 = minv[i1]
+                    j2 = minv[i2]
+                    p = symbol_numbers[j1] * nsymbols + symbol_numbers[j2]
+                    tmp = np.dot(np.dot(r, fc[j1, j2]), r.T)
+                    fc_sum[ii, i2] += tmp
+                    fc_square_sum[ii, i2] += tmp ** 2
+                    fc_pair_sum[p, ii, i2] += tmp
+                    fc_pair_square_sum[p, ii, i2] += tmp ** 2
+                    counters[p, ii, i2] += 1
+
+        # A small "max_elements" is given to check the chunks.
+        results = average_force_constants_for_independent_atoms(
+            fc,
+            self._mappings,
+            self._rotations,
+            independent_atoms,
+            symbol_numbers,
+            nsymbols,
+            max_elements=100)
+
+        expected = (
+            fc_sum, fc_square_sum, fc_pair_sum, fc_pair_square_sum, counters)
+        for x, y in zip(results, expected):
+            np.testing.assert_allclose(x, y, atol=1e-12)
+
+    def test_distribute(self):
+        fc = self._fc
+        natoms = self._natoms
+        map_atoms = self._independent_atoms[
+            np.arange(natoms) % len(self._independent_atoms)]
+        map_operations = np.arange(natoms) % self._nsym
+
+        fc_distributed = np.zeros_like(fc)
+        for i in range(natoms):
+            r = self._rotations[map_operations[i]]
+            for j in range(natoms):
+                j_equiv = self._mappings[map_operations[i], j]
+                fc_distributed[i, j] = np.dot(
+                    np.dot(r.T, fc[map_atoms[i], j_equiv]), r)
+
+        np.testing.assert_allclose(
+            distribute_force_constants(
+                fc, map_atoms, map_operations, self._rotations, self._mappings),
+            fc_distributed,
+            atol=1e-12)
+
+    def test_average_full(self):
+        fc = self._fc
+        nsymbols = self._nsymbols
+        npairs = nsymbols ** 2
+        natoms = self._natoms
+        nsym = self._nsym
+        symbol_numbers = self._symbol_numbers
+
+        fc_sum = np.zeros_like(fc)
+        fc_square_sum = np.zeros_like(fc)
+        fc_pair_sum = np.zeros((npairs,) + fc.shape)
+        fc_pair_square_sum = np.zeros((npairs,) + fc.shape)
+        counters = np.zeros((npairs, natoms, natoms), dtype=int)
+        for m, r in zip(self._mappings, self._rotations):
+            for i1 in range(natoms):
+                for i2 in range(natoms):
+                    j1 = m[i1]
+                    j2 = m[i2]
+                    p = symbol_numbers[i1] * nsymbols + symbol_numbers[i2]
+                    tmp = np.dot(np.dot(r, fc[i1, i2]), r.T)
+                    fc_sum[j1, j2] += tmp
+                    fc_square_sum[j1, j2] += tmp ** 2
+                    fc_pair_sum[p, j1, j2] += tmp
+                    fc_pair_square_sum[p, j1, j2] += tmp ** 2
+                    counters[p, j1, j2] += 1
+
+        fc_mean = fc_sum / nsym
+        fc_sd = np.sqrt(fc_square_sum / nsym - fc_mean ** 2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            c = counters[..., None, None]
+            fc_pair_mean = np.where(c != 0, fc_pair_sum / c, np.nan)
+            fc_pair_sd = np.sqrt(np.where(
+                c != 0, fc_pair_square_sum / c, np.nan) - fc_pair_mean ** 2)
+        expected = (fc_mean, fc_sd, fc_pair_mean, fc_pair_sd, counters)
+
+        for dtype, atol in [('double', 1e-12), ('single', 1e-2)]:
+            results = average_force_constants_full(
+                fc,
+                self._mappings,
+                self._rotations,
+                symbol_numbers,
+                nsymbols,
+                dtype=dtype)
+            for x, y in zip(results, expected):
+                np.testing.assert_allclose(x, y, atol=atol)
+
+    def test_average_full_constant(self):
+        # The blocks are identical for all the operations, so the variances
+        # are zero and can be slightly negative by the rounding errors.
+        natoms = self._natoms
+        nsym = 3
+        block = np.array([[0.1, 1.0 / 3.0, 0.7],
+                          [1.0 / 3.0, 2.0 / 3.0, 0.3],
+                          [0.7, 0.3, 1.0 / 7.0]])
+        fc = np.tile(block, (natoms, natoms, 1, 1))
+        mappings = self._mappings[:nsym]
+        rotations = np.tile(np.eye(3), (nsym, 1, 1))
+        for dtype in ['double', 'single']:
+            with np.errstate(invalid='raise'):
+                fc_mean, fc_sd, _, fc_pair_sd, _ = (
+                    average_force_constants_full(
+                        fc, mappings, rotations, self._symbol_numbers,
+                        self._nsymbols, dtype=dtype))
+            np.testing.assert_allclose(fc_mean, fc, atol=1e-12)
+            self.assertFalse(np.isnan(fc_sd).any())
+            np.testing.assert_allclose(fc_sd, 0.0, atol=1e-6)
+            finite = ~np.isnan(fc_pair_sd)
+            np.testing.assert_allclose(fc_pair_sd[finite], 0.0, atol=1e-3)
+
+
+if __name__ == '__main__':
+    unittest.main()
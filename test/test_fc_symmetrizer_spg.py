@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from phonopy.structure.atoms import Atoms
+from phonopy.structure.symmetry import Symmetry
+from ph_analysis.fc.fc_symmetrizer_engine import distribute_force_constants
+from ph_analysis.fc.fc_symmetrizer_spg import FCSymmetrizerSPG
+from ph_analysis.structure import symmetry_cache
+
+
+class TestFCSymmetrizerSPG(unittest.TestCase):
+    def setUp(self):
+        self._root = tempfile.mkdtemp()
+        self._cache_dir_orig = os.environ.get('PH_ANALYSIS_CACHE_DIR')
+        os.environ['PH_ANALYSIS_CACHE_DIR'] = self._root
+        symmetry_cache._default_cache = None
+
+        scaled_positions = [
+            [0.0, 0.0, 0.0],
+            [0.0, 0.5, 0.5],
+            [0.5, 0.0, 0.5],
+            [0.5, 0.5, 0.0],
+        ]
+        cell = np.eye(3) * 3.8
+        self._atoms_ideal = Atoms(
+            symbols=['Cu'] * 4, cell=cell,
+            scaled_positions=scaled_positions, pbc=True)
+        self._atoms = Atoms(
+            symbols=['Cu', 'Au', 'Cu', 'Au'], cell=cell,
+            scaled_positions=scaled_positions, pbc=True)
+        self._supercell_matrix = np.eye(3, dtype=int) * 2
+        natoms = 32
+        rng = np.random.RandomState(0)
+        self._force_constants = rng.standard_normal((natoms, natoms, 3, 3))
+
+    def tearDown(self):
+        symmetry_cache._default_cache = None
+        if self._cache_dir_orig is None:
+            del os.environ['PH_ANALYSIS_CACHE_DIR']
+        else:
+            os.environ['PH_ANALYSIS_CACHE_DIR'] = self._cache_dir_orig
+        shutil.rmtree(self._root)
+
+    def _create_symmetrizer(self):
+        return FCSymmetrizerSPG(
+            force_constants=self._force_constants.copy(),
+            atoms=self._atoms,
+            atoms_ideal=self._atoms_ideal,
+            supercell_matrix=self._supercell_matrix)
+
+    def test_average_force_constants_spg(self):
+        fcs = self._create_symmetrizer()
+        fcs.average_force_constants_spg()
+        fcs_full = self._create_symmetrizer()
+        fcs_full.average_force_constants_spg_full()
+
+        np.testing.assert_allclose(
+            fcs.get_force_constants_symmetrized(),
+            fcs_full.get_force_constants_symmetrized(), atol=1e-12)
+        np.testing.assert_allclose(
+            fcs.get_force_constants_sd(),
+            fcs_full.get_force_constants_sd(), atol=1e-12)
+        pair = fcs.get_force_constants_pair()
+        pair_full = fcs_full.get_force_constants_pair()
+        self.assertEqual(sorted(pair.keys()), sorted(pair_full.keys()))
+        for key in pair:
+            np.testing.assert_allclose(pair[key], pair_full[key], atol=1e-12)
+
+    def test_distribute_force_constants_spg(self):
+        fcs = self._create_symmetrizer()
+        atoms_ideal = fcs.get_atoms_ideal()
+        symmetry = Symmetry(atoms_ideal, symprec=1e-5)
+        symmetry_data = symmetry_cache.get_symmetry_data(atoms_ideal, 1e-5)
+        rotations_cart = symmetry_data['rotations_cart']
+        mappings = symmetry_data['mappings']
+        fc_distributed = fcs.distribute_force_constants_spg(
+            self._force_constants, symmetry, rotations_cart, mappings)
+        np.testing.assert_allclose(
+            fc_distributed,
+            distribute_force_constants(
+                self._force_constants,
+                symmetry_data['map_atoms'],
+                symmetry_data['map_operations'],
+                rotations_cart,
+                mappings),
+            atol=1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import unittest
+import numpy as np
+from ph_analysis.fixed_dos_approximation import (
+    calculate_chemical_potentials,
+    calculate_thermodynamic_properties,
+    calculate_helmholtz_energy,
+    fermi_dirac_distribution,
+    s,
+    k_b,
+)
+
+
+class TestFixedDOSApproximation(unittest.TestCase):
+    def setUp(self):
+        self._energies = np.linspace(-5.0, 5.0, 2001)
+        self._dos = 1.0 + 0.1 * self._energies
+
+    def test_sommerfeld(self):
+        # S = pi^2 / 3 k_B^2 T g(E_F) at low temperatures
+        temperatures = np.array([0.0, 100.0, 300.0, 1000.0])
+        efermi = 0.5
+        properties = calculate_thermodynamic_properties(
+            temperatures, efermi, self._energies, self._dos)
+        dos_efermi = 1.0 + 0.1 * efermi
+        entropies = np.pi ** 2 / 3.0 * k_b ** 2 * temperatures * dos_efermi
+        np.testing.assert_allclose(
+            properties['entropy'], entropies, rtol=1e-3)
+        np.testing.assert_allclose(
+            properties['helmholtz_energy'],
+            properties['internal_energy'] -
+            temperatures * properties['entropy'])
+        self.assertEqual(properties['helmholtz_energy'][0], 0.0)
+
+    def test_compare_with_direct(self):
+        temperatures = np.linspace(0.0, 5000.0, 31)
+        efermis = np.linspace(-0.3, 0.3, 31)
+        properties = calculate_thermodynamic_properties(
+            temperatures, efermis, self._energies, self._dos,
+            max_elements=5000)
+        for i, (t, e) in enumerate(zip(temperatures, efermis)):
+            f0 = fermi_dirac_distribution(0.0, e, self._energies)
+            f = fermi_dirac_distribution(t, e, self._energies)
+            u = np.trapz(self._dos * (f - f0) * self._energies,
+                         self._energies)
+            entropy = 0.0 if t == 0.0 else k_b * np.trapz(
+                self._dos * s(f), self._energies)
+            self.assertAlmostEqual(
+                properties['internal_energy'][i], u, places=12)
+            self.assertAlmostEqual(
+                properties['entropy'][i], entropy, places=14)
+        self.assertAlmostEqual(
+            calculate_helmholtz_energy(
+                temperatures[5], efermis[5], self._energies, self._dos),
+            properties['helmholtz_energy'][5], places=14)
+
+    def test_fixed_nelectrons(self):
+        energies = self._energies
+        dos = self._dos
+        efermi = 0.5
+        temperatures = np.linspace(0.0, 5000.0, 51)
+        mus = calculate_chemical_potentials(
+            temperatures, efermi, energies, dos)
+        self.assertEqual(mus[0], efermi)
+        # dN/dmu > 0 and g'(E) > 0 make mu decrease.
+        self.assertTrue(np.all(np.diff(mus) < 0.0))
+
+        f0 = fermi_dirac_distribution(0.0, efermi, energies)
+        nelectrons = np.trapz(dos * f0, energies)
+        properties = calculate_thermodynamic_properties(
+            temperatures, efermi, energies, dos, fix_nelectrons=True)
+        np.testing.assert_allclose(properties['chemical_potential'], mus)
+        for i, (t, mu) in enumerate(zip(temperatures, mus)):
+            f = fermi_dirac_distribution(t, mu, energies)
+            self.assertAlmostEqual(
+                np.trapz(dos * f, energies), nelectrons, places=9)
+            u = np.trapz(dos * (f - f0) * energies, energies)
+            self.assertAlmostEqual(
+                properties['internal_energy'][i], u, places=12)
+
+    def test_fixed_nelectrons_fine_grid(self):
+        # Most of the Newton steps are accepted without the re-evaluation,
+        # and U and S are then corrected to the first order.
+        energies = self._energies
+        dos = 1.0 + 0.1 * energies + 0.05 * energies ** 2
+        efermi = 0.5
+        temperatures = np.linspace(0.0, 3000.0, 1001)
+        properties = calculate_thermodynamic_properties(
+            temperatures, efermi, energies, dos, fix_nelectrons=True)
+        f0 = fermi_dirac_distribution(0.0, efermi, energies)
+        nelectrons = np.trapz(dos * f0, energies)
+        mus = properties['chemical_potential']
+        for i in range(37, 1001, 37):
+            f = fermi_dirac_distribution(temperatures[i], mus[i], energies)
+            self.assertAlmostEqual(
+                np.trapz(dos * f, energies), nelectrons, places=9)
+            u = np.trapz(dos * (f - f0) * energies, energies)
+            self.assertAlmostEqual(
+                properties['internal_energy'][i], u, places=11)
+            entropy = k_b * np.trapz(dos * s(f), energies)
+            self.assertAlmostEqual(
+                properties['entropy'][i], entropy, places=14)
+
+
+if __name__ == '__main__':
+    unittest.main()
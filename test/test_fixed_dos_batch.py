@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from ph_analysis.fixed_dos_approximation import (
+    calculate_thermodynamic_properties,
+)
+from ph_analysis.fixed_dos_batch import FixedDOSBatch, read_doscar
+
+
+def write_doscar(filename, efermi, energies, doses):
+    """doses: (NE, nspin) array"""
+    with open(filename, 'w') as f:
+        for _ in range(5):
+            f.write('header\n')
+        f.write('{} {} {} {} 1.0\n'.format(
+            energies[-1], energies[0], len(energies), efermi))
+        for e, d in zip(energies, doses):
+            values = [e] + list(d) + list(np.cumsum(d))
+            f.write(' '.join('{:.10f}'.format(v) for v in values) + '\n')
+
+
+class TestFixedDOSBatch(unittest.TestCase):
+    def setUp(self):
+        self._root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._root)
+
+    def test_run(self):
+        energies = np.linspace(-6.0, 4.0, 1001)
+        doses = [
+            np.stack([1.0 + 0.1 * energies], axis=1),
+            np.stack([0.5 + 0.05 * energies] * 2, axis=1),  # spin
+        ]
+        efermis = [0.3, -0.2]
+        filenames = []
+        for i, (e, d) in enumerate(zip(efermis, doses)):
+            filename = os.path.join(self._root, 'DOSCAR_{}'.format(i))
+            write_doscar(filename, e, energies, d)
+            filenames.append(filename)
+
+        efermi, energies_read, dos = read_doscar(filenames[1])
+        self.assertEqual(efermi, -0.2)
+        np.testing.assert_allclose(dos, doses[1].sum(axis=1))
+
+        temperatures = np.linspace(0.0, 2000.0, 21)
+        batch = FixedDOSBatch(
+            filenames, temperatures, labels={'volume': [16.0, 17.0]},
+            max_elements=3000).run()
+        data = batch.get_data()
+        self.assertEqual(len(data), 2 * 21)
+        self.assertEqual(list(data['volume'].unique()), [16.0, 17.0])
+        for i in range(2):
+            properties = calculate_thermodynamic_properties(
+                temperatures, efermis[i], energies, doses[i].sum(axis=1))
+            np.testing.assert_allclose(
+                batch.get_free_energies()[i],
+                properties['helmholtz_energy'], atol=1e-12)
+            np.testing.assert_allclose(
+                data['S'].values[21 * i:21 * (i + 1)],
+                properties['entropy'], atol=1e-14)
+
+    def test_fix_nelectrons(self):
+        energies = np.linspace(-6.0, 4.0, 1001)
+        doses = [
+            np.stack([1.0 + 0.1 * energies], axis=1),
+            np.stack([0.5 + 0.05 * energies ** 2] * 2, axis=1),  # spin
+        ]
+        efermis = [0.3, -0.2]
+        filenames = []
+        for i, (e, d) in enumerate(zip(efermis, doses)):
+            filename = os.path.join(self._root, 'DOSCAR_{}'.format(i))
+            write_doscar(filename, e, energies, d)
+            filenames.append(filename)
+
+        temperatures = np.linspace(0.0, 2000.0, 21)
+        # Three rows for each chunk, so a chunk can include both the DOSes.
+        batch = FixedDOSBatch(
+            filenames, temperatures, fix_nelectrons=True, max_workers=1,
+            max_elements=3003).run()
+        data = batch.get_data()
+        for i in range(2):
+            properties = calculate_thermodynamic_properties(
+                temperatures, efermis[i], energies, doses[i].sum(axis=1),
+                fix_nelectrons=True)
+            rows = slice(21 * i, 21 * (i + 1))
+            np.testing.assert_allclose(
+                data['mu'].values[rows],
+                properties['chemical_potential'], atol=1e-12)
+            np.testing.assert_allclose(
+                data['U'].values[rows],
+                properties['internal_energy'], atol=1e-12)
+            np.testing.assert_allclose(
+                batch.get_free_energies()[i],
+                properties['helmholtz_energy'], atol=1e-12)
+            self.assertEqual(data['mu'].values[rows][0], efermis[i])
+            self.assertNotEqual(data['mu'].values[rows][-1], efermis[i])
+
+
+if __name__ == '__main__':
+    unittest.main()
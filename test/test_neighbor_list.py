@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import itertools
+import unittest
+import numpy as np
+from ph_analysis.structure.neighbor_list import (
+    NeighborList,
+    get_distance_matrix,
+)
+
+
+class TestNeighborList(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self._cell = np.array([
+            [3.0, 0.0, 0.0],
+            [1.2, 2.8, 0.0],
+            [0.5, -0.7, 3.3],
+        ])
+        # Positions outside the unit cell are also tested.
+        self._scaled_positions = rng.uniform(-1.0, 2.0, size=(7, 3))
+
+    def test_neighbor_list(self):
+        cell = self._cell
+        scaled_positions = self._scaled_positions
+        cutoff = 4.5  # Larger than the cell to include self images.
+
+        pairs = []
+        for i, j in itertools.product(range(len(scaled_positions)), repeat=2):
+            for shift in itertools.product(range(-5, 6), repeat=3):
+                d = np.linalg.norm(np.dot(
+                    scaled_positions[j] + shift - scaled_positions[i], cell))
+                if d <= cutoff and not (i == j and not any(shift)):
+                    pairs.append((i, j) + shift)
+
+        neighbor_list = NeighborList(cell, scaled_positions, cutoff)
+        indptr = neighbor_list.get_indptr()
+        i_s = np.repeat(np.arange(len(scaled_positions)), np.diff(indptr))
+        js = neighbor_list.get_indices()
+        shifts = neighbor_list.get_shifts()
+        distances = neighbor_list.get_distances()
+
+        self.assertEqual(
+            sorted(pairs),
+            sorted(tuple(x) for x in np.column_stack((i_s, js, shifts))))
+        vectors = np.dot(
+            scaled_positions[js] + shifts - scaled_positions[i_s], cell)
+        np.testing.assert_allclose(
+            np.linalg.norm(vectors, axis=1), distances)
+        for i in range(len(scaled_positions)):
+            d = neighbor_list.get_neighbors(i)[1]
+            self.assertTrue(np.all(np.diff(d) >= 0.0))
+
+    def test_distance_matrix(self):
+        cell = self._cell
+        scaled_positions = self._scaled_positions
+
+        additions = list(itertools.product(range(-1, 2), repeat=3))
+        diffs = scaled_positions[None, :, :] - scaled_positions[:, None, :]
+        diffs -= np.rint(diffs)
+        diffs = diffs[:, :, None, :] + additions
+        dm = np.linalg.norm(np.dot(diffs, cell), axis=-1)
+
+        distance_matrix, scaled_distances = get_distance_matrix(
+            cell, scaled_positions, max_elements=30)
+        np.testing.assert_allclose(distance_matrix, np.min(dm, axis=-1))
+        np.testing.assert_allclose(
+            np.linalg.norm(np.dot(scaled_distances, cell), axis=-1),
+            distance_matrix)
+
+
+if __name__ == '__main__':
+    unittest.main()
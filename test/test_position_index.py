@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import unittest
+import numpy as np
+from ph_analysis.structure.position_index import PositionIndex
+
+
+def find_index_linearly(scaled_positions, position, symprec):
+    for j, scaled_position in enumerate(scaled_positions):
+        diff = position - scaled_position
+        diff -= np.rint(diff)
+        if np.all(np.abs(diff) < symprec):
+            return j
+    return -1
+
+
+class TestPositionIndex(unittest.TestCase):
+    def test_get_indices(self):
+        rng = np.random.RandomState(0)
+        symprec = 1e-3
+        grid = np.array(list(np.ndindex(4, 4, 4))) / 4.0
+        # Positions on the bin boundaries and near the cell boundaries.
+        scaled_positions = np.vstack((grid, [[0.999999, 0.5, 0.0]]))
+        scaled_positions = scaled_positions[rng.permutation(len(grid) + 1)]
+
+        positions = (
+            scaled_positions[rng.randint(len(scaled_positions), size=200)] +
+            rng.randint(-2, 3, size=(200, 3)) +
+            rng.uniform(-2.0 * symprec, 2.0 * symprec, size=(200, 3)))
+        positions = positions.reshape(10, 20, 3)
+
+        indices = PositionIndex(scaled_positions, symprec).get_indices(
+            positions)
+
+        self.assertEqual(indices.shape, (10, 20))
+        self.assertTrue((indices == -1).any())
+        for index, position in zip(indices.ravel(), positions.reshape(-1, 3)):
+            self.assertEqual(
+                index,
+                find_index_linearly(scaled_positions, position, symprec))
+
+
+if __name__ == '__main__':
+    unittest.main()
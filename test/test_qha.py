@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import unittest
+import numpy as np
+from ph_analysis.eos.eos import EOSFactory
+from ph_analysis.qha.qha import QHA
+
+
+class TestQHA(unittest.TestCase):
+    def test_linear_free_energies(self):
+        # F_vib = c T V works as the pressure c T. E + c T V is not exactly
+        # in the form of the EOS, and the fit has small errors.
+        eos = EOSFactory('Vinet').create()
+        parameters = [-3.0, 0.6, 4.5, 16.5]
+        volumes = np.linspace(14.0, 20.0, 15)
+        energies = eos.ev(volumes, *parameters)
+        temperatures = np.linspace(0.0, 1000.0, 101)
+        c = 1e-5
+        free_energies_vib = c * volumes[:, None] * temperatures[None, :]
+
+        data = QHA(volumes, energies, temperatures, free_energies_vib).run(
+            ).get_data()
+        np.testing.assert_allclose(
+            eos.pv(data['V'].values, *parameters), c * temperatures,
+            atol=2e-5)
+        np.testing.assert_allclose(
+            data['B'], eos.bv(data['V'].values, *parameters), rtol=1e-2)
+        self.assertTrue(np.all(data['alpha'] < 0.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
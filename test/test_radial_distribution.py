@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import unittest
+import numpy as np
+from phonopy.structure.atoms import PhonopyAtoms
+from phonopy.structure.cells import Supercell
+from ph_analysis.structure.radial_distribution import (
+    calculate_partial_rdfs,
+    calculate_partial_rdfs_batch,
+)
+from ph_analysis.structure.structure_analyzer import StructureAnalyzer
+
+
+class TestRadialDistribution(unittest.TestCase):
+    def setUp(self):
+        a = 4.0
+        unitcell = PhonopyAtoms(
+            symbols=['Cu', 'Au', 'Au', 'Au'],
+            cell=np.eye(3) * a,
+            scaled_positions=[
+                [0.0, 0.0, 0.0],
+                [0.0, 0.5, 0.5],
+                [0.5, 0.0, 0.5],
+                [0.5, 0.5, 0.0],
+            ])
+        self._atoms = Supercell(unitcell, np.eye(3, dtype=int) * 2)
+        self._nn = a / np.sqrt(2.0)
+
+    def _get_coordination_numbers(self, rs, rdfs, dr):
+        # Integrated over the first shell with the bin centers, which
+        # deviates from the exact distances by O(dr / r).
+        atoms = self._atoms
+        symbols = atoms.get_chemical_symbols()
+        volume = atoms.get_volume()
+        counts = np.array([symbols.count(s) for s in ['Cu', 'Au']])
+        is_shell = rs < 0.5 * (self._nn + 4.0)
+        return np.sum(
+            rdfs[..., is_shell] * 4.0 * np.pi * rs[is_shell] ** 2 * dr,
+            axis=-1) * counts[None, :] / volume
+
+    def test_coordination_numbers(self):
+        # In CuAu3 (L1_2), Cu has 12 Au neighbors, Au has 4 Cu and 8 Au.
+        atoms = self._atoms
+        dr = 0.01
+        expected = [[0.0, 12.0], [4.0, 8.0]]
+        for sigma in [None, 0.05]:
+            rs, rdfs, symbol_types = calculate_partial_rdfs(
+                atoms.get_cell(),
+                atoms.get_scaled_positions(),
+                atoms.get_chemical_symbols(),
+                rmax=3.5,
+                dr=dr,
+                sigma=sigma)
+            self.assertEqual(symbol_types, ['Cu', 'Au'])
+            np.testing.assert_allclose(
+                self._get_coordination_numbers(rs, rdfs, dr),
+                expected,
+                rtol=5e-3,
+                atol=1e-6)
+
+    def test_batch(self):
+        atoms = self._atoms
+        rs, rdfs, _ = calculate_partial_rdfs(
+            atoms.get_cell(),
+            atoms.get_scaled_positions(),
+            atoms.get_chemical_symbols(),
+            rmax=3.5)
+        rs_batch, rdfs_batch, _ = calculate_partial_rdfs_batch(
+            [atoms, atoms], rmax=3.5)
+        np.testing.assert_allclose(rs_batch, rs)
+        np.testing.assert_allclose(rdfs_batch, rdfs)
+
+    def test_total_rdf_deprecated(self):
+        # The total RDF gives 12 neighbors in the first shell of fcc.
+        atoms = self._atoms
+        dr = 0.01
+        with self.assertWarns(DeprecationWarning):
+            rs, rdf = StructureAnalyzer(
+                atoms).calculate_radial_distribution_functions(
+                    sigma=0.05, xmax=3.5, xpitch=dr)
+        density = len(atoms.get_chemical_symbols()) / atoms.get_volume()
+        is_shell = rs < 0.5 * (self._nn + 4.0)
+        nneighbors = np.sum(
+            rdf[is_shell] * 4.0 * np.pi * rs[is_shell] ** 2 * dr) * density
+        self.assertAlmostEqual(nneighbors, 12.0, delta=0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
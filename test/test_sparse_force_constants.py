@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from phonopy.file_IO import write_FORCE_CONSTANTS
+from phonopy.harmonic.force_constants import set_permutation_symmetry
+from ph_analysis.fc.sparse_force_constants import SparseForceConstants
+
+
+class TestSparseForceConstants(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self._natoms = 7
+        nblocks = 30
+        self._rows = rng.randint(self._natoms, size=nblocks)
+        self._cols = rng.randint(self._natoms, size=nblocks)
+        self._blocks = rng.standard_normal((nblocks, 3, 3))
+
+        fc = SparseForceConstants(self._natoms)
+        fc.add_blocks(self._rows[:10], self._cols[:10], self._blocks[:10])
+        fc.add_blocks(self._rows[10:], self._cols[10:], self._blocks[10:])
+        self._fc = fc
+
+        fc_dense = np.zeros((self._natoms, self._natoms, 3, 3))
+        np.add.at(fc_dense, (self._rows, self._cols), self._blocks)
+        self._fc_dense = fc_dense
+
+    def test_to_dense(self):
+        np.testing.assert_allclose(self._fc.to_dense(), self._fc_dense)
+
+    def test_symmetries(self):
+        fc_dense = self._fc_dense
+        set_permutation_symmetry(fc_dense)
+        for i in range(self._natoms):
+            fc_dense[i, i] = -1.0 * np.sum(fc_dense[i, :], axis=0)
+
+        fc = self._fc
+        fc.set_permutation_symmetry()
+        fc.set_translational_invariance_for_diagonal()
+        np.testing.assert_allclose(fc.to_dense(), fc_dense, atol=1e-12)
+
+    def test_write(self):
+        dirname = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(dirname, 'FORCE_CONSTANTS')
+            filename_ref = os.path.join(dirname, 'FORCE_CONSTANTS_REF')
+            filename_npy = os.path.join(dirname, 'FORCE_CONSTANTS.npy')
+            self._fc.write(filename, max_elements=100)
+            self._fc.write(filename_npy, max_elements=100)
+            write_FORCE_CONSTANTS(self._fc.to_dense(), filename_ref)
+            with open(filename) as f, open(filename_ref) as f_ref:
+                self.assertEqual(f.read(), f_ref.read())
+            np.testing.assert_array_equal(
+                np.load(filename_npy), self._fc.to_dense())
+        finally:
+            shutil.rmtree(dirname)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import unittest
+import numpy as np
+from phonopy.structure.atoms import Atoms
+from ph_analysis.structure.structure_analyzer import StructureAnalyzer
+
+
+def create_atoms():
+    """Create a 2x2x2 supercell of the conventional fcc cell with two
+    chemical symbols and slightly distorted positions."""
+    positions_unit = np.array([
+        [0.0, 0.0, 0.0],
+        [0.0, 0.5, 0.5],
+        [0.5, 0.0, 0.5],
+        [0.5, 0.5, 0.0],
+    ])
+    translations = np.array(
+        [[i, j, k] for i in range(2) for j in range(2) for k in range(2)])
+    scaled_positions = (
+        positions_unit[None, :, :] + translations[:, None, :]) / 2.0
+    scaled_positions = scaled_positions.reshape(-1, 3)
+    symbols = ['Cu', 'Au'] * 16
+    return Atoms(
+        cell=np.eye(3) * 7.2,
+        symbols=symbols,
+        scaled_positions=scaled_positions,
+    )
+
+
+class TestStructureAnalyzer(unittest.TestCase):
+    def setUp(self):
+        self._atoms = create_atoms()
+
+    def test_mappings(self):
+        atoms = self._atoms
+        sa = StructureAnalyzer(atoms)
+        dataset = sa.get_symmetry_dataset()
+        rotations = dataset['rotations']
+        translations = dataset['translations']
+        symbols = atoms.get_chemical_symbols()
+        scaled_positions = atoms.get_scaled_positions()
+
+        mappings, diff_positions = sa.extract_mappings_for_symops(
+            rotations, translations, max_points=100)
+
+        # Brute-force search
+        for r, t, m, d in zip(rotations, translations, mappings, diff_positions):
+            positions_new = np.dot(scaled_positions, r.T) + t
+            for i, p in enumerate(positions_new):
+                diff = p - scaled_positions
+                is_found = np.all(np.abs(diff - np.rint(diff)) < 1e-6, axis=1)
+                is_found &= (np.array(symbols) == symbols[i])
+                j = np.where(is_found)[0][0]
+                self.assertEqual(m[i], j)
+                np.testing.assert_array_equal(d[i], np.rint(diff[j]))
+
+    def test_mappings_not_found(self):
+        sa = StructureAnalyzer(self._atoms)
+        rotations = [np.eye(3, dtype=int)]
+        translations = [[0.1, 0.0, 0.0]]
+        mappings = sa.extract_mappings_for_symops(rotations, translations)[0]
+        self.assertTrue(np.all(mappings == -1))
+
+    def test_distances_from_positions(self):
+        atoms = self._atoms
+        sa = StructureAnalyzer(atoms)
+        cell = atoms.get_cell()
+        scaled_positions = atoms.get_scaled_positions()
+        positions_checked = np.random.RandomState(0).rand(5, 3)
+
+        distances, scaled_distances = sa.calculate_distances_from_positions(
+            positions_checked)
+
+        # Brute-force search
+        for k, p in enumerate(positions_checked):
+            diff = scaled_positions - p
+            diff -= np.rint(diff)
+            for j, d in enumerate(diff):
+                candidates = d + np.array(
+                    [[i0, i1, i2]
+                     for i0 in range(-1, 2)
+                     for i1 in range(-1, 2)
+                     for i2 in range(-1, 2)])
+                tmp = np.linalg.norm(np.dot(candidates, cell), axis=1)
+                self.assertAlmostEqual(distances[k, j], np.min(tmp))
+                np.testing.assert_allclose(
+                    scaled_distances[k, j], candidates[np.argmin(tmp)])
+
+    def test_indices_from_positions(self):
+        sa = StructureAnalyzer(self._atoms)
+        scaled_positions = self._atoms.get_scaled_positions()
+        positions = scaled_positions[::-1] + [1.0, -1.0, 0.0]
+        positions = np.vstack((positions, [[0.1, 0.1, 0.1]]))
+        indices = sa.get_indices_from_positions(positions)
+        expected = list(range(len(scaled_positions)))[::-1] + [-1]
+        np.testing.assert_array_equal(indices, expected)
+        self.assertEqual(sa.get_index_from_position(positions[0]),
+                         len(scaled_positions) - 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
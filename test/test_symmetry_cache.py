@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from phonopy.structure.atoms import Atoms
+from ph_analysis.structure import symmetry_cache
+from ph_analysis.structure.symmetry_cache import SymmetryCache, create_key
+
+
+def create_atoms(symbols, displacement=0.0):
+    scaled_positions = np.array([
+        [0.0, 0.0, 0.0],
+        [0.0, 0.5, 0.5],
+        [0.5, 0.0, 0.5],
+        [0.5, 0.5, 0.0],
+    ])
+    scaled_positions[0, 0] += displacement
+    return Atoms(symbols=symbols, cell=np.eye(3) * 3.8,
+                 scaled_positions=scaled_positions, pbc=True)
+
+
+class TestSymmetryCache(unittest.TestCase):
+    def setUp(self):
+        self._root = tempfile.mkdtemp()
+        self._cache_dir_orig = os.environ.get('PH_ANALYSIS_CACHE_DIR')
+        os.environ['PH_ANALYSIS_CACHE_DIR'] = self._root
+        self._atoms0 = create_atoms(['Cu'] * 4)
+        self._atoms1 = create_atoms(['Cu', 'Au', 'Au', 'Au'])
+
+    def tearDown(self):
+        if self._cache_dir_orig is None:
+            del os.environ['PH_ANALYSIS_CACHE_DIR']
+        else:
+            os.environ['PH_ANALYSIS_CACHE_DIR'] = self._cache_dir_orig
+        shutil.rmtree(self._root)
+
+    def _get_filenames(self):
+        return sorted(x for x in os.listdir(self._root) if x.endswith('.npz'))
+
+    def test_key(self):
+        key = create_key(self._atoms0, 1e-5)
+        self.assertEqual(key, create_key(create_atoms(['Cu'] * 4), 1e-5))
+        self.assertNotEqual(key, create_key(self._atoms0, 1e-3))
+        self.assertNotEqual(key, create_key(self._atoms1, 1e-5))
+        self.assertNotEqual(
+            key, create_key(create_atoms(['Cu'] * 4, 1e-3), 1e-5))
+
+    def test_round_trip(self):
+        symmetry_data = SymmetryCache().get(self._atoms0)
+        self.assertEqual(
+            self._get_filenames(),
+            ['{}.npz'.format(create_key(self._atoms0, 1e-5))])
+
+        # A new instance reads the file without the symmetry search.
+        create_symmetry_data = symmetry_cache.create_symmetry_data
+        symmetry_cache.create_symmetry_data = None
+        try:
+            symmetry_data_loaded = SymmetryCache().get(self._atoms0)
+        finally:
+            symmetry_cache.create_symmetry_data = create_symmetry_data
+        self.assertEqual(
+            sorted(symmetry_data.keys()), sorted(symmetry_data_loaded.keys()))
+        self.assertEqual(symmetry_data_loaded['number'], 225)
+        self.assertEqual(
+            symmetry_data_loaded['international'],
+            symmetry_data['international'])
+        for k in ['rotations', 'map_atoms', 'mappings', 'mappings_inverse']:
+            np.testing.assert_array_equal(
+                symmetry_data_loaded[k], symmetry_data[k])
+
+    def test_memo(self):
+        cache = SymmetryCache(is_persistent=False, max_entries_in_memory=1)
+        symmetry_data0 = cache.get(self._atoms0)
+        self.assertIs(cache.get(self._atoms0), symmetry_data0)
+        cache.get(self._atoms1)  # "atoms0" is removed from the memory.
+        self.assertIsNot(cache.get(self._atoms0), symmetry_data0)
+        self.assertEqual(self._get_filenames(), [])
+
+    def test_eviction(self):
+        cache = SymmetryCache(max_size=0)
+        cache.get(self._atoms0)
+        cache.get(self._atoms1)
+        # No files are kept with max_size=0.
+        self.assertEqual(len(self._get_filenames()), 0)
+
+        cache = SymmetryCache()
+        cache.get(self._atoms0)
+        cache.get(self._atoms1)
+        self.assertEqual(len(self._get_filenames()), 2)
+        size = os.path.getsize(os.path.join(
+            self._root, '{}.npz'.format(create_key(self._atoms1, 1e-5))))
+        os.utime(os.path.join(
+            self._root, '{}.npz'.format(create_key(self._atoms0, 1e-5))),
+            (0, 0))
+        cache = SymmetryCache(max_size=size)
+        cache.get(create_atoms(['Cu'] * 4, 1e-3))
+        self.assertNotIn(
+            '{}.npz'.format(create_key(self._atoms0, 1e-5)),
+            self._get_filenames())
+
+    def test_symprec(self):
+        atoms = create_atoms(['Cu'] * 4, 1e-3)
+        symmetry_data_tight = SymmetryCache().get(atoms, 1e-5)
+        symmetry_data_loose = SymmetryCache().get(atoms, 1e-2)
+        self.assertEqual(symmetry_data_loose['number'], 225)
+        self.assertLess(
+            len(symmetry_data_tight['rotations']),
+            len(symmetry_data_loose['rotations']))
+
+        # The Cartesian rotations must follow the operations found with
+        # the given symprec.
+        cell = atoms.get_cell()
+        positions = atoms.get_scaled_positions()
+        for symmetry_data in [symmetry_data_tight, symmetry_data_loose]:
+            rotations = symmetry_data['rotations']
+            rotations_cart = symmetry_data['rotations_cart']
+            self.assertEqual(len(rotations_cart), len(rotations))
+            for r, r_cart in zip(rotations, rotations_cart):
+                np.testing.assert_allclose(
+                    np.dot(positions, np.dot(cell, r_cart.T)),
+                    np.dot(np.dot(positions, r.T), cell), atol=1e-12)
+            mappings = symmetry_data['mappings']
+            mappings_inverse = symmetry_data['mappings_inverse']
+            for m, m_inv in zip(mappings, mappings_inverse):
+                np.testing.assert_array_equal(m[m_inv], np.arange(4))
+
+
+if __name__ == '__main__':
+    unittest.main()
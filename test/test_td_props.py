@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import unittest
+import numpy as np
+from scipy.integrate import quad
+from ph_analysis.debye.td_props import (
+    function_debye,
+    calculate_helmholtz_energy,
+    calculate_internal_energy,
+    calculate_entropy,
+    calculate_heat_capacity,
+    k_b,
+)
+
+
+class TestTDProps(unittest.TestCase):
+    def test_function_debye(self):
+        xs = np.array([1e-6, 0.5, 1.999, 2.0, 2.001, 5.0, 20.0, 100.0])
+        for n in [1, 2, 3, 4]:
+            values_ref = [
+                n / x ** n * quad(lambda t: t ** n / np.expm1(t), 0.0, x,
+                                  epsabs=0.0, epsrel=1e-13)[0]
+                for x in xs]
+            np.testing.assert_allclose(
+                function_debye(xs, n), values_ref, rtol=1e-12)
+        self.assertEqual(function_debye(0.0, 3), 1.0)
+        self.assertEqual(function_debye(np.inf, 3), 0.0)
+        values = function_debye(np.array([np.nan, 1.0]), 3)
+        self.assertTrue(np.isnan(values[0]))
+        np.testing.assert_allclose(
+            values[1], function_debye(1.0, 3), rtol=1e-12)
+
+    def test_zero_temperature(self):
+        debye = np.array([100.0, 300.0])
+        f = calculate_helmholtz_energy(0.0, debye)
+        np.testing.assert_allclose(f, 9.0 * k_b * debye / 8.0)
+        np.testing.assert_allclose(calculate_entropy(0.0, debye), 0.0)
+        np.testing.assert_allclose(calculate_heat_capacity(0.0, debye), 0.0)
+
+    def test_grid(self):
+        temperatures = np.linspace(10.0, 1000.0, 100)
+        debye = np.array([200.0, 400.0])[:, None]
+        f = calculate_helmholtz_energy(temperatures, debye)
+        u = calculate_internal_energy(temperatures, debye)
+        s = calculate_entropy(temperatures, debye)
+        cv = calculate_heat_capacity(temperatures, debye)
+        self.assertEqual(f.shape, (2, 100))
+        np.testing.assert_allclose(f, u - temperatures * s, atol=1e-12)
+        # Classical limit
+        np.testing.assert_allclose(cv[:, -1], 3.0 * k_b, rtol=1e-2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from phonopy.structure.atoms import PhonopyAtoms
+from ph_analysis.structure.displacements import Displacements
+from ph_analysis.structure.trajectory import (
+    RunningStatistics,
+    TrajectoryAnalyzer,
+    read_xdatcar,
+)
+
+
+def write_xdatcar(filename, cells, symbol_types, numbers, scaled_positions):
+    """Write XDATCAR in the variable-cell format."""
+    with open(filename, 'w') as f:
+        for i, (cell, positions) in enumerate(zip(cells, scaled_positions)):
+            f.write('test\n')
+            f.write('1.0\n')
+            for v in cell:
+                f.write('{:22.16f}{:22.16f}{:22.16f}\n'.format(*v))
+            f.write(' '.join(symbol_types) + '\n')
+            f.write(' '.join(str(n) for n in numbers) + '\n')
+            f.write('Direct configuration= {:5d}\n'.format(i + 1))
+            for p in positions:
+                f.write('{:20.16f}{:20.16f}{:20.16f}\n'.format(*p))
+
+
+class TestTrajectory(unittest.TestCase):
+    def setUp(self):
+        self._dirname = tempfile.mkdtemp()
+        rng = np.random.RandomState(0)
+        nframes = 7
+        symbols = ['Cu'] * 3 + ['Au'] * 2
+        self._atoms_ideal = PhonopyAtoms(
+            symbols=symbols,
+            cell=np.eye(3) * 5.0,
+            scaled_positions=rng.rand(5, 3))
+        self._cells = np.eye(3) * 5.0 + rng.rand(nframes, 3, 3) * 0.1
+        self._scaled_positions = (
+            self._atoms_ideal.get_scaled_positions() +
+            rng.randn(nframes, 5, 3) * 0.02)
+        self._filename = os.path.join(self._dirname, 'XDATCAR')
+        write_xdatcar(self._filename, self._cells, ['Cu', 'Au'], [3, 2],
+                      self._scaled_positions)
+
+    def tearDown(self):
+        shutil.rmtree(self._dirname)
+
+    def test_running_statistics(self):
+        rng = np.random.RandomState(1)
+        values = rng.rand(10, 4)
+        groups = np.array([0, 1, 1, 0])
+        statistics = RunningStatistics(2)
+        for i0 in range(0, 10, 3):
+            statistics.add_block(values[i0:i0 + 3], groups)
+        for g in range(2):
+            expected = values[:, groups == g]
+            self.assertAlmostEqual(
+                statistics.get_averages()[g], np.average(expected))
+            self.assertAlmostEqual(
+                statistics.get_standard_deviations()[g], np.std(expected))
+            self.assertAlmostEqual(
+                statistics.get_maxima()[g], np.max(expected))
+
+    def test_displacements(self):
+        analyzer = TrajectoryAnalyzer(self._atoms_ideal, block_size=3)
+        analyzer.run(read_xdatcar(self._filename))
+        self.assertEqual(analyzer.get_number_of_frames(), 7)
+
+        displacements = []
+        for cell, positions in zip(self._cells, self._scaled_positions):
+            atoms = PhonopyAtoms(
+                symbols=self._atoms_ideal.get_chemical_symbols(),
+                cell=cell,
+                scaled_positions=positions)
+            tmp = Displacements(atoms, self._atoms_ideal)
+            tmp.calculate_displacements()
+            displacements.append(tmp.get_data()['displacement'])
+        displacements = np.array(displacements)
+
+        data_stat = analyzer.get_data_stat('atom')
+        np.testing.assert_allclose(
+            data_stat[('displacement', 'avg.')],
+            np.average(displacements, axis=0))
+        data_stat = analyzer.get_data_stat('symbol')
+        np.testing.assert_allclose(
+            data_stat[('sad', 's.d.')],
+            [np.std(displacements[:, :3] ** 2),
+             np.std(displacements[:, 3:] ** 2)])
+
+
+if __name__ == '__main__':
+    unittest.main()
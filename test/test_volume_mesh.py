@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import unittest
+import numpy as np
+from phonopy.structure.atoms import PhonopyAtoms
+from ph_analysis.structure.volume_mesh import VolumeMesh
+
+
+class TestVolumeMesh(unittest.TestCase):
+    def setUp(self):
+        self._atoms = PhonopyAtoms(
+            symbols=['Cu', 'Au', 'Au', 'Au'],
+            cell=np.eye(3) * 4.0,
+            scaled_positions=[
+                [0.0, 0.0, 0.0],
+                [0.0, 0.5, 0.5],
+                [0.5, 0.0, 0.5],
+                [0.5, 0.5, 0.0],
+            ])
+
+    def test_fcc(self):
+        volume_mesh = VolumeMesh(self._atoms, [8, 8, 8])
+        volume_mesh.generate_atomic_volume()
+        volumes = volume_mesh.get_data()['volume']
+        np.testing.assert_allclose(volumes, 16.0)
+
+    def test_chunks(self):
+        # Results must not depend on the chunks and the threads.
+        atoms = self._atoms
+        atoms.set_scaled_positions(
+            atoms.get_scaled_positions() +
+            np.random.RandomState(0).rand(4, 3) * 0.1)
+        mesh = [9, 7, 11]
+        volume_mesh = VolumeMesh(atoms, mesh)
+        volume_mesh.generate_atomic_volume()
+        volumes = volume_mesh.get_data()['volume']
+        volume_mesh = VolumeMesh(atoms, mesh, max_elements=100, max_workers=4)
+        volume_mesh.generate_atomic_volume()
+        np.testing.assert_array_equal(
+            volume_mesh.get_data()['volume'], volumes)
+        self.assertAlmostEqual(np.sum(volumes), 64.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import itertools
+import unittest
+import numpy as np
+from scipy.spatial import ConvexHull, Voronoi
+from phonopy.structure.atoms import PhonopyAtoms
+from ph_analysis.structure.volume_voronoi import VolumeVoronoi
+
+
+def calculate_volumes_convex_hull(atoms):
+    """Previous implementation with all the 27 cells."""
+    natoms = atoms.get_number_of_atoms()
+    expansion = np.array(list(itertools.product([0, 1, -1], repeat=3)))
+    scaled_positions = np.reshape(
+        atoms.get_scaled_positions()[None, :, :] + expansion[:, None, :],
+        (-1, 3))
+    voronoi = Voronoi(np.dot(scaled_positions, atoms.get_cell()))
+    volumes = []
+    for i in range(natoms):
+        region = voronoi.regions[voronoi.point_region[i]]
+        volumes.append(ConvexHull(voronoi.vertices[region]).volume)
+    return np.array(volumes)
+
+
+class TestVolumeVoronoi(unittest.TestCase):
+    def test_fcc(self):
+        atoms = PhonopyAtoms(
+            symbols=['Cu'] * 4,
+            cell=np.eye(3) * 4.0,
+            scaled_positions=[
+                [0.0, 0.0, 0.0],
+                [0.0, 0.5, 0.5],
+                [0.5, 0.0, 0.5],
+                [0.5, 0.5, 0.0],
+            ])
+        volume_voronoi = VolumeVoronoi(atoms)
+        volume_voronoi.generate_atomic_volume()
+        np.testing.assert_allclose(
+            volume_voronoi.get_data()['volume'], 16.0)
+
+    def test_random(self):
+        cell = np.array([
+            [4.0, 0.3, 0.0],
+            [0.2, 5.0, 0.0],
+            [0.0, 0.1, 6.0],
+        ])
+        scaled_positions = np.random.RandomState(0).rand(30, 3)
+        atoms = PhonopyAtoms(
+            symbols=['Cu', 'Au'] * 15,
+            cell=cell,
+            scaled_positions=scaled_positions)
+        # A small cutoff must be increased automatically.
+        volume_voronoi = VolumeVoronoi(atoms, cutoff=0.5)
+        volume_voronoi.generate_atomic_volume()
+        np.testing.assert_allclose(
+            volume_voronoi.get_data()['volume'],
+            calculate_volumes_convex_hull(atoms))
+
+
+if __name__ == '__main__':
+    unittest.main()